@@ -0,0 +1,93 @@
+# benchmarks/analytics_engines.py
+"""Compare the ORM and DuckDB read paths on the analytical report queries.
+
+    python -m benchmarks.analytics_engines [orders] [seed] [--data-dir DIR] [--repeat 3]
+
+Generates (or reuses from --data-dir) a database of `orders` orders with
+benchmarks.generate_data, then runs the report queries three ways: through the ORM on SQLite, on DuckDB reading
+the live SQLite file, and on DuckDB reading a snapshot. Each query runs
+`repeat` times per engine, uncached, and the best time is reported along
+with the row count and the speedup over the ORM. Row counts must agree.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from benchmarks.generate_data import DATA_END
+from benchmarks.page_suite import database_for
+from database import Database
+from utils import reports
+from utils.analytics import DuckDBReader
+
+END = DATA_END.date()
+YEAR_AGO = END - timedelta(days=365)
+ALL_TIME = END - timedelta(days=3650)
+
+# (name, query builder) for the report queries report_all() sends to DuckDB,
+# then stock levels, the all-time group-bys the rollups answer and one
+# indexed lookup, which stay on SQLite
+QUERIES = [
+    ("sales_detail_30_days", lambda s: reports.sales_detail_query(s, END - timedelta(days=30), END)),
+    ("sales_detail_1_year", lambda s: reports.sales_detail_query(s, YEAR_AGO, END)),
+    ("sales_detail_cash_1_year", lambda s: reports.sales_detail_query(s, YEAR_AGO, END, payment_mode="Cash")),
+    ("transaction_summary_1_year", lambda s: reports._labelled(
+        reports.transaction_summary_query(s, YEAR_AGO, END), reports.TRANSACTION_COLUMNS)),
+    ("stock_levels", lambda s: reports._labelled(reports.stock_levels_query(s), reports.STOCK_COLUMNS)),
+    ("raw_sales_totals_all_time", lambda s: reports.sales_totals_query(s, ALL_TIME, END)),
+    ("raw_daily_sales_all_time", lambda s: reports.daily_sales_query(s, ALL_TIME, END)),
+    ("sales_detail_one_customer", lambda s: reports.sales_detail_query(s, ALL_TIME, END, customer_id=1)),
+]
+
+
+def best_time(run, repeat):
+    best, rows = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = run()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(rows)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Compare the ORM and DuckDB report read paths.")
+    parser.add_argument("orders", nargs="?", type=int, default=100_000)
+    parser.add_argument("seed", nargs="?", type=int, default=42)
+    parser.add_argument("--data-dir", default=None, help="keep generated databases here for reuse")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv[1:])
+
+    with tempfile.TemporaryDirectory() as scratch:
+        path = database_for(args.orders, args.seed, args.data_dir or scratch)
+        db = Database(f"sqlite:///{path}", query_cache_bytes=0)
+        db.migrate()
+        live = DuckDBReader(str(path))
+        snapshot = DuckDBReader(str(path), snapshot_path=os.path.join(scratch, "analytics.duckdb"),
+                                snapshot_max_age=3600)
+        started = time.perf_counter()
+        snapshot.refresh_snapshot()
+        print(f"orders={args.orders} snapshot_build_s={time.perf_counter() - started:.3f}")
+
+        session = db.get_session()
+        failed = False
+        try:
+            for name, build in QUERIES:
+                query = build(session)
+                orm_s, orm_rows = best_time(query.all, args.repeat)
+                live_s, live_rows = best_time(lambda: live.all(query), args.repeat)
+                snap_s, snap_rows = best_time(lambda: snapshot.all(query), args.repeat)
+                mismatch = len({orm_rows, live_rows, snap_rows}) > 1
+                failed = failed or mismatch
+                print(f"query={name} rows={orm_rows} orm_s={orm_s:.4f} duckdb_live_s={live_s:.4f} "
+                      f"duckdb_snapshot_s={snap_s:.4f} live_speedup={orm_s / live_s:.1f}x "
+                      f"snapshot_speedup={orm_s / snap_s:.1f}x" + (" ROW_COUNT_MISMATCH" if mismatch else ""))
+        finally:
+            session.close()
+            db.engine.dispose()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,140 @@
+# benchmarks/generate_data.py
+"""Deterministic synthetic data for benchmarks.
+
+    python -m benchmarks.generate_data <db_url> [orders] [seed]
+
+Fills an empty database with customers, items, orders, order lines and one
+bill per order. The same `orders` and `seed` always produce the same rows.
+Volumes scale with the order count: one customer per 10 orders, one item
+per 20 orders (at most 20,000), and 1-5 lines per order (3 on average).
+Orders are spread evenly over the two years ending DATA_END, in id order.
+The customer ledger and daily sales rollups are then built from the rows
+in one pass each, as the migrations do for existing databases.
+"""
+import random
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from database import Customer, Database, Item, Order, OrderItem, Transaction
+from utils.ledger import backfill_ledger
+from utils.rollups import rebuild_rollups
+
+DATA_END = datetime(2025, 12, 31, 20, 0)
+DATA_SPAN = timedelta(days=730)
+BATCH_ORDERS = 20_000
+PAYMENT_MODES = ["Cash", "Credit", "Cheque"]
+PAYMENT_WEIGHTS = [6, 3, 1]
+ORDER_STATUSES = ["Completed", "Pending", "Cancelled"]
+STATUS_WEIGHTS = [85, 12, 3]
+
+FIRST_NAMES = ["Ali", "Sara", "Ahmed", "Fatima", "Usman", "Ayesha", "Bilal", "Hina", "Hamza", "Zainab",
+               "Imran", "Nadia", "Kamran", "Sana", "Tariq", "Mehwish", "Faisal", "Rabia", "Adnan", "Saima"]
+LAST_NAMES = ["Khan", "Ahmed", "Malik", "Hussain", "Sheikh", "Qureshi", "Butt", "Chaudhry", "Raza", "Iqbal"]
+CITIES = ["Lahore", "Karachi", "Islamabad", "Faisalabad", "Multan", "Peshawar", "Quetta", "Sialkot"]
+PRODUCT_WORDS = ["Steel", "Copper", "Plastic", "Heavy", "Mini", "Pro", "Classic", "Smart", "Eco", "Ultra"]
+PRODUCT_KINDS = ["Bolt", "Pipe", "Valve", "Cable", "Switch", "Bracket", "Hinge", "Panel", "Filter", "Pump",
+                 "Gasket", "Clamp", "Nozzle", "Bearing", "Fuse"]
+
+
+def volumes(orders):
+    """(customers, items) generated for `orders` orders"""
+    return max(50, orders // 10), max(100, min(orders // 20, 20_000))
+
+
+def _customers(rng, count):
+    for customer_id in range(1, count + 1):
+        yield {
+            "id": customer_id,
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {customer_id}",
+            "phone": f"03{rng.randrange(0, 10**9):09d}",
+            "address": f"House {rng.randrange(1, 999)}, Street {rng.randrange(1, 99)}, {rng.choice(CITIES)}",
+        }
+
+
+def _items(rng, count):
+    for item_id in range(1, count + 1):
+        cost = round(rng.uniform(20, 5000), 2)
+        yield {
+            "id": item_id,
+            "name": f"{rng.choice(PRODUCT_WORDS)} {rng.choice(PRODUCT_KINDS)} {item_id}",
+            "quantity": rng.choice([0, 2, 4]) if rng.random() < 0.05 else rng.randrange(6, 500),
+            "cost_price": cost,
+            "selling_price": round(cost * rng.uniform(1.1, 1.6), 2),
+        }
+
+
+def _order_batches(rng, orders, customers, item_prices):
+    """Yield (orders, lines, bills) row lists, BATCH_ORDERS orders at a time"""
+    start = DATA_END - DATA_SPAN
+    step = DATA_SPAN / orders
+    line_id = 0
+    for first in range(1, orders + 1, BATCH_ORDERS):
+        order_rows, line_rows, bill_rows = [], [], []
+        for order_id in range(first, min(first + BATCH_ORDERS, orders + 1)):
+            date = start + step * order_id
+            customer_id = rng.randrange(1, customers + 1)
+            total = 0.0
+            for _ in range(rng.choice([1, 1, 2, 3, 3, 4, 5, 5])):
+                item_id = rng.randrange(1, len(item_prices) + 1)
+                quantity = rng.randrange(1, 10)
+                price = item_prices[item_id - 1]
+                line_id += 1
+                line_rows.append({"id": line_id, "order_id": order_id, "item_id": item_id,
+                                  "quantity": quantity, "price": price})
+                total += quantity * price
+            total = round(total, 2)
+            mode = rng.choices(PAYMENT_MODES, PAYMENT_WEIGHTS)[0]
+            received = round(total * rng.uniform(0, 1), 2) if mode == "Credit" else total
+            order_rows.append({"id": order_id, "customer_id": customer_id, "date": date, "total_amount": total,
+                               "status": rng.choices(ORDER_STATUSES, STATUS_WEIGHTS)[0]})
+            bill_rows.append({"id": order_id, "bill_no": str(order_id), "order_id": order_id, "date": date,
+                              "customer_id": customer_id, "party_name": f"Customer {customer_id}",
+                              "address": "N/A", "mode": mode,
+                              "cheque_no": f"CHQ{order_id:08d}" if mode == "Cheque" else None,
+                              "issue_amount": total, "received": received, "balance": round(total - received, 2)})
+        yield order_rows, line_rows, bill_rows
+
+
+def generate(db, orders, seed=42, progress=None):
+    """Fill `db` (migrated and empty) with `orders` orders and their customers and items"""
+    rng = random.Random(seed)
+    customer_count, item_count = volumes(orders)
+    customers = list(_customers(rng, customer_count))
+    items = list(_items(rng, item_count))
+    item_prices = [item["selling_price"] for item in items]
+
+    with db.engine.begin() as conn:
+        conn.execute(insert(Customer), customers)
+        conn.execute(insert(Item), items)
+
+    done = 0
+    for order_rows, line_rows, bill_rows in _order_batches(rng, orders, customer_count, item_prices):
+        with db.engine.begin() as conn:
+            conn.execute(insert(Order), order_rows)
+            conn.execute(insert(OrderItem), line_rows)
+            conn.execute(insert(Transaction), bill_rows)
+        done += len(order_rows)
+        if progress:
+            progress(done, orders)
+
+    with db.engine.begin() as conn:
+        backfill_ledger(conn)
+        rebuild_rollups(conn)
+    return {"orders": orders, "customers": customer_count, "items": item_count, "seed": seed}
+
+
+def main(argv):
+    if len(argv) < 2:
+        print(__doc__)
+        return 2
+    orders = int(argv[2]) if len(argv) > 2 else 10_000
+    seed = int(argv[3]) if len(argv) > 3 else 42
+    db = Database(argv[1])
+    db.migrate()
+    summary = generate(db, orders, seed, progress=lambda done, total: print(f"{done}/{total} orders", end="\r"))
+    print(f"\nGenerated {summary}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,106 @@
+# benchmarks/login_throughput.py
+"""Measure login throughput and page responsiveness during a login burst.
+
+    python -m benchmarks.login_throughput [users] [rounds]
+
+Creates `users` accounts (40 by default) hashed at `rounds` (default
+config.BCRYPT_ROUNDS) in a temporary database, then logs them all in at
+once from one thread each, the way simultaneous script runs would. While
+the burst runs, a separate thread stands in for other users' page reruns
+by doing a small pure-Python step every millisecond and recording the
+longest stall between steps. Reports logins per second, p50/p95 login
+latency and that stall, then repeats the burst with wrong passwords past
+the throttle limit to show that throttled attempts cost no hashing.
+"""
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import config
+from database import Database, User
+from utils.auth import FailureThrottle, authenticate, hash_password
+
+
+def burst(db, usernames, password, throttle):
+    latencies = []
+    lock = threading.Lock()
+
+    def login(username):
+        started = time.perf_counter()
+        try:
+            authenticate(db, username, password, throttle)
+        except Exception:
+            pass
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    stalls = []
+    done = threading.Event()
+
+    def page_rerun():
+        last = time.perf_counter()
+        while not done.is_set():
+            sum(range(2000))
+            time.sleep(0.001)
+            now = time.perf_counter()
+            stalls.append(now - last)
+            last = now
+
+    heartbeat = threading.Thread(target=page_rerun)
+    heartbeat.start()
+    threads = [threading.Thread(target=login, args=(u,)) for u in usernames]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    heartbeat.join()
+
+    latencies.sort()
+    return {
+        "logins": len(usernames),
+        "seconds": elapsed,
+        "logins_per_second": len(usernames) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "max_stall_ms": max(stalls) * 1000,
+    }
+
+
+def report(label, result):
+    print(f"case={label} " + " ".join(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}"
+                                      for k, v in result.items()))
+
+
+def main(argv):
+    users = int(argv[1]) if len(argv) > 1 else 40
+    rounds = int(argv[2]) if len(argv) > 2 else config.BCRYPT_ROUNDS
+    print(f"workers={config.AUTH_WORKERS} rounds={rounds}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = Database(f"sqlite:///{workdir}/bench.db")
+        db.migrate()
+        hashed = hash_password("correct horse", rounds)
+        session = db.get_session()
+        usernames = [f"user{i}" for i in range(users)]
+        session.add_all([User(username=u, password=hashed) for u in usernames])
+        session.commit()
+        session.close()
+
+        throttle = FailureThrottle(config.LOGIN_MAX_FAILURES, config.LOGIN_FAILURE_WINDOW)
+        report("valid", burst(db, usernames, "correct horse", throttle))
+
+        # Use up every account's failure budget, then time a burst that is refused up front
+        for _ in range(config.LOGIN_MAX_FAILURES):
+            for username in usernames:
+                throttle.record_failure(username)
+        report("throttled", burst(db, usernames, "wrong", throttle))
+        db.engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,183 @@
+# benchmarks/page_interactions.py
+"""Count the SQL statements each widget interaction costs on the pages split into fragments.
+
+    python -m benchmarks.page_interactions [orders] [seed] [--data-dir DIR]
+
+Generates (or reuses from --data-dir) a database of `orders` orders with
+benchmarks.generate_data. Each scenario opens a page on one of its tabs
+with Streamlit's AppTest, logged in, then performs one interaction (a
+click, a search, a page turn) with the query cache cleared and counts the
+statements it runs and their time.
+
+AppTest always reruns the whole script, while a live server reruns only
+the fragment a widget belongs to. So every statement is also attributed to
+the st.fragment function it ran in, and for an interaction with a widget
+inside a fragment the statements of that fragment are what the server
+runs. Both are printed: `full_rerun_*` for the whole script and
+`interaction_*` for what the interaction really costs. On a tree
+without fragments the two are the same, which makes the script usable for
+before/after comparisons across commits.
+"""
+import argparse
+import functools
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from sqlalchemy import event
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+from benchmarks.generate_data import DATA_END
+from benchmarks.page_suite import ROOT, database_for, use_database
+from utils.session import get_database
+
+
+# --- Scenarios: (name, script, open tab, interaction, fragment owning the widget) ---
+# The page is opened on the tab or report (a (key, label) pair, or None for
+# the first one), then interaction(at) runs it once more; None measures the
+# opening run
+def _type(key, text):
+    return lambda at: at.text_input(key=key).input(text).run()
+
+
+def _click(key):
+    return lambda at: at.button(key=key).click().run()
+
+
+def _set_page(key, page):
+    return lambda at: at.number_input(key=key).set_value(page).run()
+
+
+def _add_to_order(at):
+    at.number_input(key="add_item_to_order_qty").set_value(1)
+    at.button(key="add_product_to_order_list").click().run()
+
+
+def _filter_orders(at):
+    at.date_input(key="orders_filter_start").set_value((DATA_END - timedelta(days=30)).date()).run()
+
+
+SCENARIOS = [
+    ("products_open", "pages/2_Products.py", None, None, None),
+    ("products_grid_search", "pages/2_Products.py", None, _type("products_grid_search", "a"), "products_list"),
+    ("products_grid_page", "pages/2_Products.py", None, _set_page("products_grid_page", 2), "products_list"),
+    ("products_edit_search", "pages/2_Products.py", ("products_tabs", "Edit/Delete Product"),
+     _type("select_product_edit_delete_search", "a"), "edit_product"),
+    ("customers_open", "pages/3_Customers.py", None, None, None),
+    ("customers_grid_search", "pages/3_Customers.py", None, _type("customers_grid_search", "a"), "customers_list"),
+    ("customers_statement_pick", "pages/3_Customers.py", ("customers_tabs", "Account Statement"),
+     _type("select_customer_statement_search", "1"), "account_statement"),
+    ("orders_open", "pages/4_Orders.py", None, None, None),
+    ("orders_product_search", "pages/4_Orders.py", None, _type("add_item_to_order_product_search", "a"),
+     "create_order"),
+    ("orders_add_to_cart", "pages/4_Orders.py", None, _add_to_order, "create_order"),
+    ("orders_next_page", "pages/4_Orders.py", ("orders_tabs", "View All Orders"), _click("orders_next_page"),
+     "order_list"),
+    ("orders_filter_dates", "pages/4_Orders.py", ("orders_tabs", "View All Orders"), _filter_orders, "order_list"),
+    ("sales_history_customer_search", "pages/5_Sales_History.py", None, _type("sales_hist_customer_search", "a"),
+     "customer_filter"),
+    ("sales_history_report", "pages/5_Sales_History.py", None, _click("generate_sales_report_button"),
+     "sales_report"),
+    ("reports_transactions", "pages/6_Reports.py", ("main_reports_select", "Transaction Summary"),
+     _click("generate_transaction_summary_button"), "transaction_summary_report"),
+]
+
+
+class FragmentQueryCounter:
+    """Counts statements and their time on one engine, in all and per st.fragment function they ran in"""
+
+    def __init__(self, engine):
+        self._local = threading.local()
+        self.reset()
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    def reset(self):
+        self.total = [0, 0.0]
+        self.by_fragment = {}  # function name: [statements, seconds]
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("benchmark_started", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["benchmark_started"].pop()
+        for totals in [self.total] + [self.by_fragment[name] for name in set(getattr(self._local, 'fragments', ()))]:
+            totals[0] += 1
+            totals[1] += seconds
+
+    def track(self, fragment):
+        """Wrap st.fragment so each fragment's statements are counted under its function name"""
+        counter = self
+
+        def tracking_fragment(func=None, **kwargs):
+            if func is None:
+                return lambda f: tracking_fragment(f, **kwargs)
+
+            @functools.wraps(func)
+            def run(*args, **kw):
+                counter.by_fragment.setdefault(func.__name__, [0, 0.0])
+                stack = counter._local.__dict__.setdefault('fragments', [])
+                stack.append(func.__name__)
+                try:
+                    return func(*args, **kw)
+                finally:
+                    stack.pop()
+            return fragment(run, **kwargs)
+        return tracking_fragment
+
+
+def run_scenario(db, counter, script, tab, interaction, fragment):
+    at = AppTest.from_file(str(ROOT / script), default_timeout=900)
+    at.session_state["logged_in"] = True
+    at.session_state["current_user"] = "benchmark"
+
+    def run(step):
+        # AppTest does not keep the open tab between runs, so select it for each one
+        if tab:
+            at.session_state[tab[0]] = tab[1]
+        step(at)
+
+    if interaction:
+        run(lambda at: at.run())
+    db.cache.clear()
+    st.cache_data.clear()
+    counter.reset()
+    run(interaction or (lambda at: at.run()))
+    errors = [str(e.value) for e in at.exception]
+    scoped = counter.by_fragment.get(fragment) if fragment else None
+    queries, seconds = counter.total if scoped is None else scoped
+    return {"full_rerun_queries": counter.total[0], "full_rerun_sql_ms": counter.total[1] * 1000,
+            "interaction_queries": queries, "interaction_sql_ms": seconds * 1000, "errors": errors}
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Count the SQL statements per widget interaction.")
+    parser.add_argument("orders", nargs="?", type=int, default=10_000)
+    parser.add_argument("seed", nargs="?", type=int, default=42)
+    parser.add_argument("--data-dir", default=None, help="keep generated databases here for reuse")
+    args = parser.parse_args(argv[1:])
+
+    failed = False
+    original_fragment = st.fragment
+    with tempfile.TemporaryDirectory() as scratch:
+        db = use_database(database_for(args.orders, args.seed, args.data_dir or scratch))
+        counter = FragmentQueryCounter(db.engine)
+        st.fragment = counter.track(original_fragment)
+        try:
+            for name, script, tab, interaction, fragment in SCENARIOS:
+                result = run_scenario(db, counter, script, tab, interaction, fragment)
+                failed = failed or bool(result["errors"])
+                print(f"scenario={name} full_rerun_queries={result['full_rerun_queries']} "
+                      f"full_rerun_sql_ms={result['full_rerun_sql_ms']:.1f} "
+                      f"interaction_queries={result['interaction_queries']} "
+                      f"interaction_sql_ms={result['interaction_sql_ms']:.1f} errors={len(result['errors'])}")
+        finally:
+            st.fragment = original_fragment
+            db.engine.dispose()
+            get_database.clear()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,226 @@
+# benchmarks/page_suite.py
+"""Time every page headlessly at several data volumes.
+
+    python -m benchmarks.page_suite [--scales 10000,100000,1000000] [--seed 42]
+                                    [--data-dir DIR] [--out results.json]
+                                    [--baseline old.json] [--tolerance 1.25]
+
+For each scale, a database is generated with benchmarks.generate_data (or
+reused from --data-dir, where generated files are kept by scale and seed).
+Each scenario then runs a page with Streamlit's AppTest, logged in, clicking
+through its report. Every scenario runs twice, first with empty caches
+(cold) and again straight after (warm). For each run the suite records
+wall time, the number of SQL statements and the time spent in them.
+
+Results are written as JSON. With --baseline, scenarios slower than
+`tolerance` times the baseline (and by more than 50ms) are listed, and
+the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+import streamlit as st
+from sqlalchemy import event, func, select
+from streamlit.testing.v1 import AppTest
+import config
+from benchmarks.generate_data import DATA_END, generate
+from database import Database, Order
+from utils.session import get_database
+
+ROOT = Path(__file__).resolve().parent.parent
+REPORT_END = DATA_END.date()
+REPORT_START = (DATA_END - timedelta(days=30)).date()
+MIN_REGRESSION_SECONDS = 0.05
+
+
+# --- Scenarios: (name, script, steps after the first run) ---
+def _sales_report(at):
+    at.date_input(key="sales_hist_start").set_value(REPORT_START)
+    at.date_input(key="sales_hist_end").set_value(REPORT_END)
+    at.button(key="generate_sales_report_button").click().run()
+
+
+def _report(kind):
+    def steps(at):
+        at.selectbox(key="main_reports_select").set_value(kind).run()
+        if kind == "Transaction Summary":
+            at.date_input(key="report_start_trans").set_value(REPORT_START)
+            at.date_input(key="report_end_trans").set_value(REPORT_END)
+            next(b for b in at.button if b.label == "Generate Transaction Summary").click().run()
+    return steps
+
+
+def _orders_next_page(at):
+    # AppTest does not keep the open tab between runs, so select it for each one
+    at.session_state["orders_tabs"] = "View All Orders"
+    at.run()
+    at.session_state["orders_tabs"] = "View All Orders"
+    at.button(key="orders_next_page").click().run()
+
+
+SCENARIOS = [
+    ("home", "main.py", None),
+    ("dashboard", "pages/1_Dashboard.py", None),
+    ("products", "pages/2_Products.py", None),
+    ("customers", "pages/3_Customers.py", None),
+    ("orders", "pages/4_Orders.py", None),
+    ("orders_next_page", "pages/4_Orders.py", _orders_next_page),
+    ("sales_history_30_days", "pages/5_Sales_History.py", _sales_report),
+    ("reports_stock_levels", "pages/6_Reports.py", _report("Stock Levels")),
+    ("reports_low_stock", "pages/6_Reports.py", _report("Low Stock")),
+    ("reports_transactions_30_days", "pages/6_Reports.py", _report("Transaction Summary")),
+]
+
+
+class QueryCounter:
+    """Counts statements and the time spent executing them on one engine"""
+
+    def __init__(self, engine):
+        self.queries = 0
+        self.seconds = 0.0
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("benchmark_started", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        self.seconds += time.perf_counter() - conn.info["benchmark_started"].pop()
+        self.queries += 1
+
+    def reset(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+def run_scenario(script, steps, counter):
+    counter.reset()
+    at = AppTest.from_file(str(ROOT / script), default_timeout=900)
+    at.session_state["logged_in"] = True
+    at.session_state["current_user"] = "benchmark"
+    started = time.perf_counter()
+    at.run()
+    if steps:
+        steps(at)
+    elapsed = time.perf_counter() - started
+    errors = [str(e.value) for e in at.exception] + [e.value for e in at.error]
+    return {"seconds": round(elapsed, 4), "queries": counter.queries,
+            "sql_seconds": round(counter.seconds, 4), "errors": errors}
+
+
+# --- Data ---
+def database_for(scale, seed, data_dir):
+    """Path of a generated database for (scale, seed), generating it if needed"""
+    path = Path(data_dir) / f"orders_{scale}_seed_{seed}.db"
+    if not path.exists():
+        partial = path.with_suffix(".partial")
+        for leftover in Path(data_dir).glob(partial.name + "*"):
+            leftover.unlink()
+        db = Database(f"sqlite:///{partial}")
+        db.migrate()
+        started = time.perf_counter()
+        generate(db, scale, seed)
+        with db.engine.connect() as conn:
+            assert conn.scalar(select(func.count(Order.id))) == scale
+        db.engine.dispose()
+        partial.rename(path)
+        print(f"generated {scale} orders in {time.perf_counter() - started:.1f}s -> {path}", file=sys.stderr)
+    return path
+
+
+def use_database(path):
+    """Point the pages at `path` and return the Database they will share"""
+    config.DATABASE_URL = f"sqlite:///{path}"
+    get_database.clear()
+    return get_database()
+
+
+def metadata(seed):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit or None,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "streamlit": st.__version__,
+        "platform": platform.platform(),
+        "seed": seed,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return the (scale, scenario, run, before, after) rows slower than the baseline"""
+    before = {(r["scale"], r["scenario"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = before.get((result["scale"], result["scenario"]))
+        if old is None:
+            continue
+        for run in ("cold", "warm"):
+            old_seconds, new_seconds = old[run]["seconds"], result[run]["seconds"]
+            if new_seconds > old_seconds * tolerance and new_seconds - old_seconds > MIN_REGRESSION_SECONDS:
+                regressions.append((result["scale"], result["scenario"], run, old_seconds, new_seconds))
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Time every page at several data volumes.")
+    parser.add_argument("--scales", default="10000,100000,1000000")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default=None, help="keep generated databases here for reuse")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    args = parser.parse_args(argv[1:])
+    out = os.path.abspath(args.out)
+    baseline = args.baseline and os.path.abspath(args.baseline)
+    data_dir = args.data_dir and os.path.abspath(args.data_dir)
+
+    os.chdir(ROOT)
+    scales = [int(s) for s in args.scales.split(",")]
+    results = []
+    with tempfile.TemporaryDirectory() as scratch:
+        data_dir = data_dir or scratch
+        os.makedirs(data_dir, exist_ok=True)
+        for scale in scales:
+            db = use_database(database_for(scale, args.seed, data_dir))
+            counter = QueryCounter(db.engine)
+            for name, script, steps in SCENARIOS:
+                db.cache.clear()
+                st.cache_data.clear()
+                cold = run_scenario(script, steps, counter)
+                warm = run_scenario(script, steps, counter)
+                results.append({"scale": scale, "scenario": name, "cold": cold, "warm": warm})
+                print(f"scale={scale} scenario={name} cold_s={cold['seconds']:.3f} warm_s={warm['seconds']:.3f} "
+                      f"queries={cold['queries']}/{warm['queries']} sql_s={cold['sql_seconds']:.3f} "
+                      f"errors={len(cold['errors']) + len(warm['errors'])}")
+            db.engine.dispose()
+        get_database.clear()
+
+    with open(out, "w") as f:
+        json.dump({"meta": metadata(args.seed), "results": results}, f, indent=2)
+    print(f"wrote {out}")
+
+    failed = any(r["cold"]["errors"] or r["warm"]["errors"] for r in results)
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for scale, scenario, run, old_seconds, new_seconds in regressions:
+            print(f"REGRESSION scale={scale} scenario={scenario} run={run} {old_seconds:.3f}s -> {new_seconds:.3f}s")
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
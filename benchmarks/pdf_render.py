@@ -0,0 +1,64 @@
+# benchmarks/pdf_render.py
+"""Benchmark the PDF table renderer on a large sales report.
+
+    python -m benchmarks.pdf_render [rows] [max_seconds] [max_peak_mb]
+
+Builds a synthetic typed sales frame (50,000 lines by default), renders it
+with utils.pdf.table_pdf and reports wall time, peak Python memory and
+output size (timing and memory are measured on separate passes). Exits with status 1 if either bound is exceeded.
+"""
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from utils.pdf import table_pdf, SALES_PDF_COLUMNS
+
+
+def sales_frame(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    quantity = rng.integers(1, 20, rows)
+    price = rng.uniform(10, 5000, rows).round(2)
+    order_total = (quantity * price * rng.uniform(1, 3, rows)).round(2)
+    received = (order_total * rng.uniform(0, 1, rows)).round(2)
+    return pd.DataFrame({
+        "Bill No": np.arange(1, rows + 1).astype(str),
+        "Order ID": np.arange(1, rows + 1),
+        "Order Date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 24 * 60, rows), unit="m"),
+        "Customer Name": [f"Customer {i}" for i in rng.integers(1, 5000, rows)],
+        "Customer Phone": [f"0300{i:07d}" for i in rng.integers(0, 9999999, rows)],
+        "Product Name": [f"Product number {i}" for i in rng.integers(1, 60000, rows)],
+        "Quantity Sold": quantity,
+        "Total Item Revenue": quantity * price,
+        "Order Total Amount": order_total,
+        "Amount Received": received,
+        "Balance Amount": order_total - received,
+    })
+
+
+def main(argv):
+    rows = int(argv[1]) if len(argv) > 1 else 50_000
+    max_seconds = float(argv[2]) if len(argv) > 2 else 30.0
+    max_peak_mb = float(argv[3]) if len(argv) > 3 else 512.0
+
+    frame = sales_frame(rows)
+    started = time.perf_counter()
+    pdf_bytes = table_pdf("Sales Report", "Benchmark", SALES_PDF_COLUMNS, frame)
+    elapsed = time.perf_counter() - started
+
+    # Second pass for memory; tracing slows rendering down too much to time it
+    tracemalloc.start()
+    table_pdf("Sales Report", "Benchmark", SALES_PDF_COLUMNS, frame)
+    peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+
+    print(f"rows={rows} seconds={elapsed:.2f} rows_per_second={rows / elapsed:.0f} "
+          f"peak_mb={peak_mb:.1f} pdf_mb={len(pdf_bytes) / 2**20:.1f}")
+    if elapsed > max_seconds or peak_mb > max_peak_mb:
+        print(f"FAIL: bounds are {max_seconds}s and {max_peak_mb} MB")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,104 @@
+# benchmarks/sales_export.py
+"""Check that sales exports run in flat memory whatever the date range.
+
+    python -m benchmarks.sales_export [orders] [max_ratio]
+
+Seeds a temporary SQLite database with `orders` orders of two lines each
+(100,000 by default) spread over five years, then exports one day, one year
+and the whole range in each format with the sales export job's runner, into
+a temporary file. Reports wall time and peak Python memory
+per run, and exits with status 1 if the five-year peak is more than
+`max_ratio` times the one-year peak (both ranges span many chunks, so the
+peak should be set by the chunk size alone).
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from sqlalchemy import insert
+from database import Database, Customer, Item, Order, OrderItem, Transaction
+from utils.export import EXPORT_FORMATS
+from utils.jobs import run_sales_export
+
+START = datetime(2020, 1, 1)
+
+
+def seed(db, orders):
+    step = timedelta(days=5 * 365) / orders
+    session = db.get_session()
+    try:
+        session.execute(insert(Item), [dict(name=f"Item {i}", quantity=1000, cost_price=1.0, selling_price=2.0)
+                                       for i in range(1, 101)])
+        session.execute(insert(Customer), [dict(name=f"Customer {i}", phone=f"0300{i:07d}", address=f"Street {i}")
+                                           for i in range(1, 101)])
+        session.execute(insert(Order), [dict(id=i, customer_id=i % 100 + 1, date=START + step * i,
+                                             total_amount=4.0, status="Completed") for i in range(1, orders + 1)])
+        session.execute(insert(OrderItem), [dict(order_id=i // 2 + 1, item_id=i % 100 + 1, quantity=1, price=2.0)
+                                            for i in range(orders * 2)])
+        session.execute(insert(Transaction), [dict(bill_no=str(i), order_id=i, date=START + step * i,
+                                                   customer_id=i % 100 + 1, party_name=f"Customer {i % 100 + 1}",
+                                                   address="Street", mode="Cash", issue_amount=4.0,
+                                                   received=4.0, balance=0.0) for i in range(1, orders + 1)])
+        session.commit()
+    finally:
+        session.close()
+
+
+def export(db, export_format, end_date):
+    """Run the export as a worker would and return its file, rewound"""
+    params = {'format': export_format, 'start_date': START.date().isoformat(), 'end_date': end_date.isoformat(),
+              'filters': {}}
+    out = tempfile.TemporaryFile()
+    session = db.get_session()
+    try:
+        run_sales_export(session, params, out, lambda progress=None, message=None: None)
+    finally:
+        session.close()
+    out.seek(0)
+    return out
+
+
+def measure(db, export_format, end_date):
+    started = time.perf_counter()
+    export(db, export_format, end_date).close()
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    out = export(db, export_format, end_date)
+    peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    size_mb = os.fstat(out.fileno()).st_size / 2**20
+    out.close()
+    return elapsed, peak_mb, size_mb
+
+
+def main(argv):
+    orders = int(argv[1]) if len(argv) > 1 else 100_000
+    max_ratio = float(argv[2]) if len(argv) > 2 else 1.5
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = Database(f"sqlite:///{workdir}/bench.db")
+        db.migrate()
+        seed(db, orders)
+
+        failed = False
+        for export_format in EXPORT_FORMATS:
+            peaks = {}
+            for label, end_date in (("one_day", START.date()), ("one_year", date(2020, 12, 31)),
+                                    ("five_years", date(2025, 12, 31))):
+                elapsed, peak_mb, size_mb = measure(db, export_format, end_date)
+                peaks[label] = peak_mb
+                print(f"format={export_format} range={label} seconds={elapsed:.2f} "
+                      f"peak_mb={peak_mb:.1f} file_mb={size_mb:.1f}")
+            growth = peaks["five_years"] / peaks["one_year"]
+            if growth > max_ratio:
+                print(f"FAIL: {export_format} peak grew {growth:.2f}x from one year to five (bound {max_ratio}x)")
+                failed = True
+        db.engine.dispose()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
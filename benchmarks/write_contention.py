@@ -0,0 +1,145 @@
+# benchmarks/write_contention.py
+"""Finalize orders from several processes at once against one SQLite file.
+
+    python -m benchmarks.write_contention [--processes 4] [--threads 4]
+                                          [--orders 100] [--busy-timeout-ms 5000]
+
+Each of `processes` server stand-ins runs `threads` threads, and every
+thread finalizes `orders` orders as fast as it can. The run is repeated
+for three write paths:
+
+* plain: a plain session committed once, with no BEGIN IMMEDIATE and no
+  retry, the way writes were made before Database.run_write;
+* immediate: run_write, with BEGIN IMMEDIATE and jittered retries;
+* queue: run_write with INVENTORY_SQLITE_WRITE_QUEUE=1, so each process
+  sends its writes through a single writer thread.
+
+Reports orders per second, failed orders ("database is locked"), order
+latency percentiles and run_write's retries and lock wait, one line per
+path. A short --busy-timeout-ms makes the difference between the paths
+easier to see.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from sqlalchemy.exc import OperationalError
+
+CUSTOMERS = 50
+ITEMS = 200
+
+
+def _seed(url):
+    from database import Customer, Database, Item
+    db = Database(url)
+    db.migrate()
+    session = db.get_session()
+    session.add_all([Customer(name=f"Customer {i}", phone=f"0300{i:07d}", address="Street") for i in range(CUSTOMERS)])
+    session.add_all([Item(name=f"Item {i}", quantity=10 ** 9, cost_price=10, selling_price=15) for i in range(ITEMS)])
+    session.commit()
+    session.close()
+    db.engine.dispose()
+
+
+def _plain_write(db, work):
+    session = db.get_session()
+    try:
+        result = work(session)
+        session.commit()
+        return result
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def _run_process(args):
+    """One server process: `threads` threads finalizing `orders` orders each"""
+    path, threads, orders, seed = args
+    from database import Database
+    from utils.orders import finalize_order
+    db = Database(path, query_cache_bytes=0)
+    if os.environ.get('BENCH_WRITE_PATH') == 'plain':
+        db.run_write = lambda work: _plain_write(db, work)
+
+    latencies, failures = [], [0]
+    lock = threading.Lock()
+
+    def cashier(n):
+        rng = random.Random(seed * 1000 + n)
+        for _ in range(orders):
+            lines = [{'item_id': rng.randint(1, ITEMS), 'quantity': rng.randint(1, 3), 'selling_price_at_order': 15.0}
+                     for _ in range(rng.randint(1, 4))]
+            for line in lines:
+                line['total_price'] = line['quantity'] * 15.0
+            started = time.perf_counter()
+            try:
+                finalize_order(db, rng.randint(1, CUSTOMERS), lines, "Completed", "Cash", 0.0)
+            except OperationalError:
+                with lock:
+                    failures[0] += 1
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=cashier, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    db.engine.dispose()
+    return latencies, failures[0], db.write_stats.snapshot()
+
+
+def run(write_path, url, processes, threads, orders):
+    os.environ['BENCH_WRITE_PATH'] = write_path
+    os.environ['INVENTORY_SQLITE_WRITE_QUEUE'] = '1' if write_path == 'queue' else ''
+    # Spawned processes import config afresh, so they see the variables set above
+    with multiprocessing.get_context('spawn').Pool(processes) as pool:
+        started = time.perf_counter()
+        results = pool.map(_run_process, [(url, threads, orders, seed) for seed in range(processes)])
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    failures = sum(result[1] for result in results)
+    stats = [result[2] for result in results]
+    return {
+        "orders": len(latencies),
+        "failed": failures,
+        "orders_per_second": (len(latencies) - failures) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "retries": sum(s['retries'] for s in stats),
+        "lock_wait_p95_ms": max(s['p95_wait'] for s in stats) * 1000,
+        "queue_seconds": sum(s['queue_seconds'] for s in stats),
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Finalize orders from several processes against one SQLite file.")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--orders", type=int, default=100, help="orders per thread")
+    parser.add_argument("--busy-timeout-ms", type=int, default=5000)
+    args = parser.parse_args(argv[1:])
+    os.environ['INVENTORY_SQLITE_BUSY_TIMEOUT'] = str(args.busy_timeout_ms)
+    print(f"processes={args.processes} threads={args.threads} orders_per_thread={args.orders} "
+          f"busy_timeout_ms={args.busy_timeout_ms}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for write_path in ("plain", "immediate", "queue"):
+            url = f"sqlite:///{workdir}/{write_path}.db"
+            _seed(url)
+            result = run(write_path, url, args.processes, args.threads, args.orders)
+            print(f"path={write_path} " + " ".join(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}"
+                                                   for k, v in result.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,74 @@
+# config.py
+"""Runtime configuration, read from environment variables with sensible defaults"""
+import os
+
+# Any SQLAlchemy URL; SQLite is the default deployment
+DATABASE_URL = os.environ.get('INVENTORY_DATABASE_URL', 'sqlite:///inventory.db')
+
+# Connection pool shared by every browser session in the server process
+POOL_SETTINGS = {
+    'pool_size': int(os.environ.get('INVENTORY_DB_POOL_SIZE', 10)),
+    'max_overflow': int(os.environ.get('INVENTORY_DB_MAX_OVERFLOW', 20)),
+    'pool_timeout': int(os.environ.get('INVENTORY_DB_POOL_TIMEOUT', 30)),
+    'pool_recycle': int(os.environ.get('INVENTORY_DB_POOL_RECYCLE', 3600)),
+}
+
+# PRAGMAs applied to every new SQLite connection (ignored for other databases)
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('INVENTORY_SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('INVENTORY_SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'cache_size': int(os.environ.get('INVENTORY_SQLITE_CACHE_SIZE', -20000)),  # negative = KiB
+    'mmap_size': int(os.environ.get('INVENTORY_SQLITE_MMAP_SIZE', 268435456)),
+    'busy_timeout': int(os.environ.get('INVENTORY_SQLITE_BUSY_TIMEOUT', 5000)),  # milliseconds
+}
+
+# Write transactions (Database.run_write): attempts after SQLITE_BUSY outlasts
+# busy_timeout, the jittered backoff between them, and whether this process
+# sends its writes one at a time through a single writer thread
+SQLITE_WRITE_RETRIES = int(os.environ.get('INVENTORY_SQLITE_WRITE_RETRIES', 4))
+SQLITE_RETRY_BASE_MS = float(os.environ.get('INVENTORY_SQLITE_RETRY_BASE_MS', 50))
+SQLITE_RETRY_MAX_MS = float(os.environ.get('INVENTORY_SQLITE_RETRY_MAX_MS', 2000))
+SQLITE_WRITE_QUEUE = os.environ.get('INVENTORY_SQLITE_WRITE_QUEUE', '').lower() in ('1', 'true', 'yes')
+
+# Memory cap for the shared read query cache (utils/query_cache.py); 0 disables it
+QUERY_CACHE_MAX_BYTES = int(float(os.environ.get('INVENTORY_QUERY_CACHE_MB', 64)) * 1024 * 1024)
+
+# Authentication: bcrypt cost for new and upgraded hashes, hashing threads per
+# process, and failed logins allowed per username within the window
+BCRYPT_ROUNDS = int(os.environ.get('INVENTORY_BCRYPT_ROUNDS', 12))
+AUTH_WORKERS = int(os.environ.get('INVENTORY_AUTH_WORKERS', min(4, os.cpu_count() or 1)))
+LOGIN_MAX_FAILURES = int(os.environ.get('INVENTORY_LOGIN_MAX_FAILURES', 5))
+LOGIN_FAILURE_WINDOW = int(os.environ.get('INVENTORY_LOGIN_FAILURE_WINDOW', 300))  # seconds
+
+# Opt-in per-rerun query profiler (utils/profiler.py): sidebar panel plus a
+# log of statements slower than SLOW_QUERY_MS
+PROFILE_QUERIES = os.environ.get('INVENTORY_PROFILE_QUERIES', '').lower() in ('1', 'true', 'yes')
+SLOW_QUERY_MS = float(os.environ.get('INVENTORY_SLOW_QUERY_MS', 200))
+SLOW_QUERY_LOG = os.environ.get('INVENTORY_SLOW_QUERY_LOG', 'slow_queries.log')
+
+# Optional DuckDB engine for the analytical reports (utils/analytics.py):
+# 'sqlite' runs them through the ORM, 'duckdb' through an embedded DuckDB
+# reading a snapshot file refreshed every MAX_AGE seconds, or the live SQLite
+# file when SNAPSHOT is set to ''
+ANALYTICS_ENGINE = os.environ.get('INVENTORY_ANALYTICS_ENGINE', 'sqlite').lower()
+ANALYTICS_SNAPSHOT = os.environ.get('INVENTORY_ANALYTICS_SNAPSHOT', 'analytics.duckdb')
+ANALYTICS_SNAPSHOT_MAX_AGE = int(os.environ.get('INVENTORY_ANALYTICS_SNAPSHOT_MAX_AGE', 300))
+
+# Background jobs (utils/jobs.py): worker processes started with the app
+# (0 = run `python -m utils.jobs worker` separately), where finished files are
+# kept and for how long, how long a finished file is handed out again for
+# the same request, and how often workers and pages poll the jobs table
+JOB_WORKERS = int(os.environ.get('INVENTORY_JOB_WORKERS', 2))
+JOB_OUTPUT_DIR = os.environ.get('INVENTORY_JOB_OUTPUT_DIR', 'job_output')
+JOB_RETENTION_HOURS = float(os.environ.get('INVENTORY_JOB_RETENTION_HOURS', 24))
+JOB_REUSE_SECONDS = int(os.environ.get('INVENTORY_JOB_REUSE_SECONDS', 300))
+JOB_POLL_SECONDS = float(os.environ.get('INVENTORY_JOB_POLL_SECONDS', 1))  # idle workers
+JOB_UI_POLL_SECONDS = float(os.environ.get('INVENTORY_JOB_UI_POLL_SECONDS', 2))  # pages with unfinished jobs
+JOB_STALE_SECONDS = int(os.environ.get('INVENTORY_JOB_STALE_SECONDS', 60))  # no heartbeat: worker died
+JOB_MAX_ATTEMPTS = int(os.environ.get('INVENTORY_JOB_MAX_ATTEMPTS', 2))
+
+# Stock reservations (utils/reservations.py): how long units added to a cart
+# stay held without further activity on it, and how often job workers delete
+# expired holds
+RESERVATION_TTL_SECONDS = int(os.environ.get('INVENTORY_RESERVATION_TTL_SECONDS', 900))
+RESERVATION_SWEEP_SECONDS = int(os.environ.get('INVENTORY_RESERVATION_SWEEP_SECONDS', 60))
@@ -1,58 +1,86 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Text, DateTime, ForeignKey
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, Text, Date, DateTime, ForeignKey, Index
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
+import config
+from utils.query_cache import QueryCache, SharedVersions
+from utils import analytics
 
 # Create the base class
 Base = declarative_base()
 
+# Reorder level given to items that do not set their own
+DEFAULT_REORDER_LEVEL = 5
+
 class Customer(Base):
     """Customers table model"""
     __tablename__ = 'customers'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    name = Column(String(100), nullable=False)
+    name = Column(String(100), nullable=False, index=True)
     phone = Column(String(20), nullable=False)
     address = Column(Text, nullable=False)
 
     # Relationships - ADD cascade="all, delete-orphan"
     orders = relationship("Order", back_populates="customer", cascade="all, delete-orphan")
     transactions = relationship("Transaction", back_populates="customer", cascade="all, delete-orphan")
+    ledger_entries = relationship("LedgerEntry", back_populates="customer", cascade="all, delete-orphan")
+    account = relationship("CustomerBalance", back_populates="customer", uselist=False, cascade="all, delete-orphan")
 
 class Item(Base):
     """Items table model"""
     __tablename__ = 'items'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    name = Column(String(100), nullable=False)
-    quantity = Column(Integer, nullable=False, default=0)
+    name = Column(String(100), nullable=False, index=True)
+    quantity = Column(Integer, nullable=False, default=0, index=True)
     cost_price = Column(Float, nullable=False)
     selling_price = Column(Float, nullable=False)
+    reorder_level = Column(Integer, nullable=False, default=DEFAULT_REORDER_LEVEL,
+                           server_default=str(DEFAULT_REORDER_LEVEL))  # Low stock at or below this quantity
+    reorder_quantity = Column(Integer)  # Usual amount to order when restocking, if known
+
+    # Reorder queue: a partial index holding only the items at or below their
+    # reorder level, so the low stock report never reads the rest of the catalog
+    __table_args__ = (
+        Index('ix_items_reorder', quantity, sqlite_where=quantity <= reorder_level,
+              postgresql_where=quantity <= reorder_level),
+    )
 
     # Relationships - ADD cascade="all, delete-orphan"
     order_items = relationship("OrderItem", back_populates="item", cascade="all, delete-orphan")
+    reservations = relationship("StockReservation", cascade="all, delete-orphan")
 
 class Order(Base):
     """Orders table model"""
     __tablename__ = 'orders'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    customer_id = Column(Integer, ForeignKey('customers.id', ondelete='CASCADE'), nullable=False)
-    date = Column(DateTime, default=datetime.utcnow)
+    customer_id = Column(Integer, ForeignKey('customers.id', ondelete='CASCADE'), nullable=False, index=True)
+    date = Column(DateTime, default=datetime.utcnow, index=True)
     total_amount = Column(Float, nullable=False)
     status = Column(String(20), default="Pending")
 
     # Relationships
     customer = relationship("Customer", back_populates="orders")
     order_items = relationship("OrderItem", back_populates="order")
+    transaction = relationship("Transaction", back_populates="order", uselist=False)
 
 class OrderItem(Base):
     """Order items table model"""
     __tablename__ = 'order_items'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    order_id = Column(Integer, ForeignKey('orders.id', ondelete='CASCADE'), nullable=False)
-    item_id = Column(Integer, ForeignKey('items.id', ondelete='CASCADE'), nullable=False)
+    order_id = Column(Integer, ForeignKey('orders.id', ondelete='CASCADE'), nullable=False, index=True)
+    item_id = Column(Integer, ForeignKey('items.id', ondelete='CASCADE'), nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
     price = Column(Float, nullable=False)  # Actual selling price at time of order
 
@@ -66,8 +94,9 @@ class Transaction(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     bill_no = Column(String(50), unique=True, nullable=False) # This is a String
-    date = Column(DateTime, default=datetime.utcnow)
-    customer_id = Column(Integer, ForeignKey('customers.id', ondelete='CASCADE'), nullable=False)
+    order_id = Column(Integer, ForeignKey('orders.id', ondelete='CASCADE'), unique=True, index=True) # Bill for this order, if any
+    date = Column(DateTime, default=datetime.utcnow, index=True)
+    customer_id = Column(Integer, ForeignKey('customers.id', ondelete='CASCADE'), nullable=False, index=True)
     party_name = Column(String(100), nullable=False)
     address = Column(Text, nullable=False)
     mode = Column(String(20), nullable=False)  # e.g., 'Cash', 'Credit', 'Cheque'
@@ -79,6 +108,7 @@ class Transaction(Base):
 
     # Relationships
     customer = relationship("Customer", back_populates="transactions")
+    order = relationship("Order", back_populates="transaction")
 
 class User(Base):
     """Users table model for authentication"""
@@ -88,17 +118,312 @@ class User(Base):
     username = Column(String(50), unique=True, nullable=False)
     password = Column(String(255), nullable=False) # Store hashed passwords
 
+class InventorySummary(Base):
+    """Running stock totals for the dashboard, kept current by triggers on items"""
+    __tablename__ = 'inventory_summary'
+
+    id = Column(Integer, primary_key=True)  # Single row, id = 1
+    total_products = Column(Integer, nullable=False, default=0)
+    total_units = Column(Integer, nullable=False, default=0)
+    low_stock_items = Column(Integer, nullable=False, default=0)
+
+class LedgerEntry(Base):
+    """Customer account ledger: one row per bill or payment, with the balance after it"""
+    __tablename__ = 'ledger_entries'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    customer_id = Column(Integer, ForeignKey('customers.id', ondelete='CASCADE'), nullable=False)
+    date = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    entry_type = Column(String(20), nullable=False)  # 'Bill' or 'Payment'
+    order_id = Column(Integer, ForeignKey('orders.id', ondelete='CASCADE'), index=True)  # Order billed or paid at sale
+    reference = Column(String(50))  # Bill number, cheque number, receipt...
+    mode = Column(String(20))  # Payment mode, for payments
+    debit = Column(Float, nullable=False, default=0.0)
+    credit = Column(Float, nullable=False, default=0.0)
+    balance = Column(Float, nullable=False)  # Customer's running balance after this entry
+
+    # A customer's statement reads its entries in date order
+    __table_args__ = (
+        Index('ix_ledger_entries_customer_date', customer_id, date, id),
+    )
+
+    customer = relationship("Customer", back_populates="ledger_entries")
+
+class CustomerBalance(Base):
+    """Current balance per customer, moved in the same transaction as each ledger entry"""
+    __tablename__ = 'customer_balances'
+
+    customer_id = Column(Integer, ForeignKey('customers.id', ondelete='CASCADE'), primary_key=True)
+    balance = Column(Float, nullable=False, default=0.0)
+    last_entry_date = Column(DateTime)
+
+    customer = relationship("Customer", back_populates="account")
+
+class DailyItemSales(Base):
+    """Sales per item per day, added to as each order is finalized"""
+    __tablename__ = 'daily_item_sales'
+
+    item_id = Column(Integer, primary_key=True)  # Not a foreign key: rollups are derived data, see utils.rollups
+    day = Column(Date, primary_key=True, index=True)
+    count = Column(Integer, nullable=False, default=0)  # Order lines
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    cost = Column(Float, nullable=False, default=0.0)  # At the cost price when sold
+
+class DailyCustomerSales(Base):
+    """Sales per customer per day, added to as each order is finalized"""
+    __tablename__ = 'daily_customer_sales'
+
+    customer_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    count = Column(Integer, nullable=False, default=0)  # Orders
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    cost = Column(Float, nullable=False, default=0.0)
+
+class DailyPaymentModeSales(Base):
+    """Sales per payment mode per day ('N/A' for orders without a bill), added to as each order is finalized"""
+    __tablename__ = 'daily_payment_mode_sales'
+
+    day = Column(Date, primary_key=True)
+    mode = Column(String(20), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)  # Orders
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    cost = Column(Float, nullable=False, default=0.0)
+
+class Job(Base):
+    """Background report and export jobs, run by the worker processes in utils.jobs"""
+    __tablename__ = 'jobs'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String(30), nullable=False)  # Key of utils.jobs.JOB_KINDS
+    params = Column(Text, nullable=False)  # JSON
+    status = Column(String(10), nullable=False, default='queued')  # queued, running, done or failed
+    progress = Column(Float)  # 0..1 while running, NULL when the job cannot tell
+    message = Column(String(200))
+    attempts = Column(Integer, nullable=False, default=0)
+    requested_by = Column(String(50))
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)  # Last progress report from the worker running it
+    finished_at = Column(DateTime)
+    result_path = Column(String(255))
+    file_name = Column(String(100))
+    mime = Column(String(100))
+    error = Column(Text)
+
+    # Workers look for the oldest queued job; the UI for one user's recent jobs
+    __table_args__ = (
+        Index('ix_jobs_status', status, id),
+        Index('ix_jobs_requested_by', requested_by, id),
+    )
+
+class StockReservation(Base):
+    """Units held for an open cart until it is finalized, the line is removed or the hold expires"""
+    __tablename__ = 'stock_reservations'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    cart_id = Column(String(32), nullable=False)  # Random token of one browser session's cart
+    item_id = Column(Integer, ForeignKey('items.id', ondelete='CASCADE'), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+    # Available-to-sell sums an item's unexpired holds from the covering item
+    # index alone; a cart has one row per item; the sweeper deletes by expiry
+    __table_args__ = (
+        Index('ix_stock_reservations_item', item_id, expires_at, cart_id, quantity),
+        Index('ix_stock_reservations_cart', cart_id, item_id, unique=True),
+        Index('ix_stock_reservations_expires', expires_at),
+    )
+
+# --- Write coordination ---
+# SQLITE_BUSY and its extended codes (BUSY_RECOVERY, BUSY_SNAPSHOT, BUSY_TIMEOUT) share the low byte 5
+_SQLITE_BUSY = 5
+
+def is_busy_error(error):
+    """True if `error` is SQLite reporting the database locked by another connection"""
+    orig = getattr(error, 'orig', error)
+    if not isinstance(orig, sqlite3.OperationalError):
+        return False
+    code = getattr(orig, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff == _SQLITE_BUSY
+    return 'database is locked' in str(orig)
+
+class WriteStats:
+    """Lock wait of the write transactions run through Database.run_write in this process"""
+
+    def __init__(self, recent=1000):
+        self.writes = 0
+        self.retries = 0
+        self.failures = 0  # writes that gave up after SQLITE_WRITE_RETRIES
+        self.wait_seconds = 0.0  # waiting for the write lock, including backoff
+        self.queue_seconds = 0.0  # waiting for the single writer thread, when it is on
+        self.max_wait = 0.0
+        self._recent = deque(maxlen=recent)
+        self._lock = threading.Lock()
+
+    def record(self, wait, queued, retries, failed=False):
+        with self._lock:
+            self.writes += 1
+            self.retries += retries
+            self.failures += failed
+            self.wait_seconds += wait
+            self.queue_seconds += queued
+            self.max_wait = max(self.max_wait, wait)
+            self._recent.append(wait)
+
+    def snapshot(self):
+        """Counters, plus median and 95th percentile lock wait over the last `recent` writes"""
+        with self._lock:
+            recent = sorted(self._recent)
+            return {
+                'writes': self.writes,
+                'retries': self.retries,
+                'failures': self.failures,
+                'wait_seconds': self.wait_seconds,
+                'queue_seconds': self.queue_seconds,
+                'max_wait': self.max_wait,
+                'p50_wait': recent[len(recent) // 2] if recent else 0.0,
+                'p95_wait': recent[int(len(recent) * 0.95)] if recent else 0.0,
+            }
+
+_writing = threading.local()
+
 # Database connection and session management
 class Database:
-    def __init__(self, db_url='sqlite:///inventory.db'):
-        self.engine = create_engine(db_url)
+    def __init__(self, db_url=None, pool_settings=None, sqlite_pragmas=None, query_cache_bytes=None):
+        url = make_url(db_url or config.DATABASE_URL)
+        is_sqlite = url.get_backend_name() == 'sqlite'
+
+        # In-memory SQLite uses a single-connection pool that takes no sizing options
+        engine_options = {}
+        in_memory = is_sqlite and url.database in (None, '', ':memory:')
+        if not in_memory:
+            engine_options.update(config.POOL_SETTINGS if pool_settings is None else pool_settings)
+
+        self.engine = create_engine(url, **engine_options)
         self.Session = sessionmaker(bind=self.engine)
 
+        # Read results shared across sessions, invalidated by commits made through self.Session
+        # here and, through the table_versions table, in other processes on the same file
+        self.cache = QueryCache(config.QUERY_CACHE_MAX_BYTES if query_cache_bytes is None else query_cache_bytes,
+                                shared=None if in_memory else SharedVersions(self.engine))
+        self.cache.install(self.Session)
+
+        # Optional DuckDB engine for the scan-heavy reports; None means they use the ORM
+        self.analytics = analytics.reader_for(url)
+        if self.analytics is not None:
+            analytics.install(self.analytics, self.Session)
+
+        # Write transactions take SQLite's write lock up front (see run_write)
+        self.is_sqlite = is_sqlite
+        self.write_engine = self.engine.execution_options(write_transaction=True)
+        self.write_stats = WriteStats()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer") \
+            if config.SQLITE_WRITE_QUEUE and is_sqlite else None
+
+        if is_sqlite:
+            self._apply_sqlite_pragmas(config.SQLITE_PRAGMAS if sqlite_pragmas is None else sqlite_pragmas)
+            self._begin_writes_immediately()
+
+    def _apply_sqlite_pragmas(self, pragmas):
+        """Run the configured PRAGMAs on every new pooled connection.
+
+        busy_timeout goes first: switching journal_mode needs the lock, and
+        must wait for it while another process is migrating or writing.
+        """
+        @event.listens_for(self.engine, "connect")
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in sorted(pragmas.items(), key=lambda pragma: pragma[0] != 'busy_timeout'):
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    def _begin_writes_immediately(self):
+        """Open write transactions with BEGIN IMMEDIATE instead of the driver's deferred BEGIN.
+
+        A deferred transaction that reads first and then writes cannot wait
+        for the lock: if another connection committed meanwhile, its snapshot
+        is stale and SQLite fails it at once with "database is locked".
+        BEGIN IMMEDIATE takes the write lock before the first read, and waits
+        up to busy_timeout for it.
+        """
+        @event.listens_for(self.engine, "begin")
+        def begin_immediate(conn):
+            if conn.get_execution_options().get('write_transaction'):
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    def _write_once(self, work):
+        """One attempt: (result, seconds waited for the write lock)"""
+        session = self.Session(bind=self.write_engine)
+        _writing.active = True
+        try:
+            started = time.perf_counter()
+            session.connection()  # BEGIN IMMEDIATE
+            waited = time.perf_counter() - started
+            result = work(session)
+            session.commit()
+            return result, waited
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            _writing.active = False
+            session.close()
+
+    def _write_with_retries(self, work, submitted):
+        queued = time.perf_counter() - submitted
+        wait = 0.0
+        for attempt in range(config.SQLITE_WRITE_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                result, waited = self._write_once(work)
+            except OperationalError as e:
+                busy = self.is_sqlite and is_busy_error(e)
+                wait += time.perf_counter() - started  # a busy attempt spent busy_timeout waiting
+                if not busy or attempt == config.SQLITE_WRITE_RETRIES:
+                    self.write_stats.record(wait, queued, attempt, failed=busy)
+                    raise
+                # Full jitter, so writers that timed out together do not retry together
+                backoff = random.uniform(0, min(config.SQLITE_RETRY_MAX_MS,
+                                                config.SQLITE_RETRY_BASE_MS * 2 ** attempt) / 1000)
+                time.sleep(backoff)
+                wait += backoff
+                continue
+            self.write_stats.record(wait + waited, queued, attempt)
+            return result
+
+    def run_write(self, work):
+        """Run `work(session)` in a write transaction, commit it and return what `work` returned.
+
+        On SQLite the transaction starts with BEGIN IMMEDIATE. If the lock is
+        still taken after busy_timeout, the whole transaction is retried up to
+        SQLITE_WRITE_RETRIES times with jittered exponential backoff, so
+        `work` must only touch the database through `session`. With
+        SQLITE_WRITE_QUEUE on, this process's writes run one at a time on a
+        single writer thread and only that thread ever waits for the lock.
+        Exceptions raised by `work` roll the transaction back and propagate.
+        """
+        if getattr(_writing, 'active', False):
+            raise RuntimeError("run_write() called inside another write transaction")
+        submitted = time.perf_counter()
+        if self._writer is None:
+            return self._write_with_retries(work, submitted)
+        return self._writer.submit(self._write_with_retries, work, submitted).result()
+
     def create_tables(self):
         """Create all tables in the database"""
         Base.metadata.create_all(self.engine)
         print("All tables created successfully!")
 
+    def migrate(self):
+        """Bring the schema up to date by applying any pending migrations"""
+        from migrations import run_migrations
+        return run_migrations(self.engine)
+
     def get_session(self):
         """Return a new database session"""
         return self.Session()
@@ -106,7 +431,8 @@ class Database:
 # Example usage (this part is for testing database.py standalone, not part of Streamlit app)
 if __name__ == "__main__":
     db = Database()
-    db.create_tables()
+    applied = db.migrate()
+    print(f"Applied {len(applied)} migration(s).")
 
     # Test connection
     session = db.get_session()
@@ -1,18 +1,14 @@
 import streamlit as st
-import bcrypt
-from database import Database, User
+from database import User
+from utils.auth import authenticate, hash_password, LoginThrottled
+from utils.profiler import profile_panel
+from utils.session import initialize_session
 
-# --- Initialize database only once ---
-if 'db' not in st.session_state:
-    st.session_state['db'] = Database('sqlite:///inventory.db')
-    st.session_state['db'].create_tables()
+# --- Shared database and persistent authentication state ---
+initialize_session()
 
 db = st.session_state['db']
 
-# --- Persistent Authentication State ---
-st.session_state.logged_in = st.session_state.get('logged_in', False)
-st.session_state.current_user = st.session_state.get('current_user', None)
-
 # --- Global CSS ---
 st.markdown(
     """
@@ -32,13 +28,6 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# --- Utility Functions ---
-def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-def check_password(password, hashed_password):
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
-
 # --- Login/Signup Page ---
 def login_page():
     st.title("Inventory Management System - Login/Signup")
@@ -57,11 +46,14 @@ def login_page():
                                  on_change=lambda: st.session_state.__setitem__('login_password_value', st.session_state.login_password))
 
         if st.button("Login", key="login_button"):
-            session = db.get_session()
-            user = session.query(User).filter_by(username=username).first()
-            session.close()
-
-            if user and check_password(password, user.password):
+            login_error = "Invalid username or password"
+            try:
+                logged_in = authenticate(db, username, password)
+            except LoginThrottled as e:
+                logged_in = False
+                login_error = f"Too many failed login attempts. Try again in {e.retry_after} seconds."
+
+            if logged_in:
                 st.session_state.logged_in = True
                 st.session_state.current_user = username
                 st.success("Logged in successfully!")
@@ -70,7 +62,7 @@ def login_page():
                 st.session_state.login_password_value = ""
                 st.rerun()
             else:
-                st.error("Invalid username or password")
+                st.error(login_error)
 
     with signup_tab:
         st.subheader("Create a new account")
@@ -94,17 +86,18 @@ def login_page():
             elif len(new_password) < 6:
                 st.error("Password must be at least 6 characters long.")
             else:
-                session = db.get_session()
-                existing_user = session.query(User).filter_by(username=new_username).first()
-                if existing_user:
+                hashed_pw = hash_password(new_password)
+
+                def create_user(write):
+                    # Checked inside the write transaction, so two sign-ups cannot both take the name
+                    if write.query(User.id).filter_by(username=new_username).first() is not None:
+                        return False
+                    write.add(User(username=new_username, password=hashed_pw))
+                    return True
+
+                if not db.run_write(create_user):
                     st.error("Username already exists. Please choose a different one.")
-                    session.close()
                 else:
-                    hashed_pw = hash_password(new_password)
-                    new_user = User(username=new_username, password=hashed_pw)
-                    session.add(new_user)
-                    session.commit()
-                    session.close()
                     st.success("Account created successfully! You can now log in.")
                     # Clear fields
                     st.session_state.signup_username_value = ""
@@ -125,3 +118,5 @@ else:
         for key in keys_to_clear:
             del st.session_state[key]
         st.rerun()
+
+profile_panel()
\ No newline at end of file
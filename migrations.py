@@ -0,0 +1,294 @@
+# migrations.py
+"""Versioned schema migrations for the inventory database.
+
+Every entry in MIGRATIONS is a (version, name, function) tuple. Applied
+versions are recorded in the `schema_migrations` table, so each migration
+runs exactly once per database file. Migrations are written to be
+idempotent, because a brand new database gets the full current schema from
+migration 1 and later steps must then be no-ops.
+
+Run `python migrations.py [db_url]` to apply pending migrations by hand.
+"""
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import Table, Column, Integer, String, DateTime, MetaData, select, insert, inspect, text
+from sqlalchemy.exc import OperationalError
+import config
+from database import Base, DEFAULT_REORDER_LEVEL, is_busy_error
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    'schema_migrations', migration_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+# --- Helpers ---
+def _create_indexes(conn, *names):
+    """Create the named indexes declared on the models, skipping existing ones"""
+    declared = {index.name: index for table in Base.metadata.tables.values() for index in table.indexes}
+    for name in names:
+        declared[name].create(conn, checkfirst=True)
+
+
+def _add_column(conn, table_name, column_name, ddl):
+    """ALTER TABLE ... ADD COLUMN unless the column is already there"""
+    if column_name not in {c['name'] for c in inspect(conn).get_columns(table_name)}:
+        conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl}"))
+
+
+# --- Migrations ---
+def _initial_schema(conn):
+    Base.metadata.create_all(conn)
+
+
+def _secondary_indexes(conn):
+    _create_indexes(
+        conn,
+        'ix_items_quantity',
+        'ix_orders_customer_id',
+        'ix_orders_date',
+        'ix_order_items_order_id',
+        'ix_order_items_item_id',
+        'ix_transactions_date',
+        'ix_transactions_customer_id',
+    )
+
+
+def _transaction_order_fk(conn):
+    _add_column(conn, 'transactions', 'order_id', "INTEGER REFERENCES orders (id) ON DELETE CASCADE")
+    _create_indexes(conn, 'ix_transactions_order_id')
+    # Bills written by the Orders page carry the order id as their bill number
+    conn.execute(text("""
+        UPDATE transactions
+        SET order_id = CAST(bill_no AS INTEGER)
+        WHERE order_id IS NULL
+          AND bill_no != '' AND bill_no NOT GLOB '*[^0-9]*'
+          AND EXISTS (SELECT 1 FROM orders WHERE orders.id = CAST(transactions.bill_no AS INTEGER))
+    """))
+
+
+def _summary_triggers(conn, low_stock):
+    """(Re)create the items triggers that keep inventory_summary current.
+
+    `low_stock` is the SQL test for one row, with {row} standing for NEW or OLD.
+    """
+    new_low, old_low = low_stock.format(row='NEW'), low_stock.format(row='OLD')
+    for trigger in ('insert', 'update', 'delete'):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS trg_items_summary_{trigger}"))
+    conn.execute(text(f"""
+        CREATE TRIGGER trg_items_summary_insert AFTER INSERT ON items
+        BEGIN
+            UPDATE inventory_summary SET
+                total_products = total_products + 1,
+                total_units = total_units + NEW.quantity,
+                low_stock_items = low_stock_items + ({new_low})
+            WHERE id = 1;
+        END
+    """))
+    # Once the level is per item (migration 7), changing it can move an item in or out of low stock
+    watched = "quantity, reorder_level" if "reorder_level" in low_stock else "quantity"
+    conn.execute(text(f"""
+        CREATE TRIGGER trg_items_summary_update AFTER UPDATE OF {watched} ON items
+        BEGIN
+            UPDATE inventory_summary SET
+                total_units = total_units + NEW.quantity - OLD.quantity,
+                low_stock_items = low_stock_items + ({new_low}) - ({old_low})
+            WHERE id = 1;
+        END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER trg_items_summary_delete AFTER DELETE ON items
+        BEGIN
+            UPDATE inventory_summary SET
+                total_products = total_products - 1,
+                total_units = total_units - OLD.quantity,
+                low_stock_items = low_stock_items - ({old_low})
+            WHERE id = 1;
+        END
+    """))
+
+
+def _inventory_summary(conn):
+    from utils.inventory import ensure_summary_row
+    Base.metadata.tables['inventory_summary'].create(conn, checkfirst=True)
+    # Low stock meant quantity <= 5 until migration 7 gave every item its own level
+    _summary_triggers(conn, "{row}.quantity <= 5")
+    # The totals are computed by migration 7, which adds the reorder levels they read
+    ensure_summary_row(conn)
+
+
+def _name_indexes(conn):
+    # Sorting the product and customer grids by name
+    _create_indexes(conn, 'ix_items_name', 'ix_customers_name')
+
+
+def _name_search(conn):
+    # External-content FTS5 indexes: they store only the index and read the
+    # text back from items / customers, kept in sync by the triggers below.
+    for table, columns in (('items', ['name']), ('customers', ['name', 'phone'])):
+        fts = f"{table}_fts"
+        cols = ", ".join(columns)
+        new_values = ", ".join(f"NEW.{c}" for c in columns)
+        old_values = ", ".join(f"OLD.{c}" for c in columns)
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{cols}, content='{table}', content_rowid='id', prefix='2 3')"
+        ))
+        conn.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO {fts} (rowid, {cols}) VALUES (NEW.id, {new_values});
+            END
+        """))
+        conn.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', OLD.id, {old_values});
+            END
+        """))
+        conn.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE OF {cols} ON {table}
+            BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', OLD.id, {old_values});
+                INSERT INTO {fts} (rowid, {cols}) VALUES (NEW.id, {new_values});
+            END
+        """))
+        conn.execute(text(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')"))
+
+
+def _reorder_levels(conn):
+    from utils.inventory import rebuild_summary
+    _add_column(conn, 'items', 'reorder_level', f"INTEGER NOT NULL DEFAULT {DEFAULT_REORDER_LEVEL}")
+    _add_column(conn, 'items', 'reorder_quantity', "INTEGER")
+    _create_indexes(conn, 'ix_items_reorder')
+    _summary_triggers(conn, "{row}.quantity <= {row}.reorder_level")
+    rebuild_summary(conn)
+
+
+def _customer_ledger(conn):
+    from utils.ledger import backfill_ledger
+    for table in ('ledger_entries', 'customer_balances'):
+        Base.metadata.tables[table].create(conn, checkfirst=True)
+    _create_indexes(conn, 'ix_ledger_entries_date', 'ix_ledger_entries_order_id', 'ix_ledger_entries_customer_date')
+    # Post every existing bill, and the payment taken with it
+    backfill_ledger(conn)
+
+
+def _daily_rollups(conn):
+    from utils.rollups import rebuild_rollups
+    for table in ('daily_item_sales', 'daily_customer_sales', 'daily_payment_mode_sales'):
+        Base.metadata.tables[table].create(conn, checkfirst=True)
+    _create_indexes(conn, 'ix_daily_item_sales_day', 'ix_daily_customer_sales_day')
+    rebuild_rollups(conn)
+
+
+def _jobs(conn):
+    Base.metadata.tables['jobs'].create(conn, checkfirst=True)
+    _create_indexes(conn, 'ix_jobs_status', 'ix_jobs_requested_by')
+
+
+def _stock_reservations(conn):
+    Base.metadata.tables['stock_reservations'].create(conn, checkfirst=True)
+    _create_indexes(conn, 'ix_stock_reservations_item', 'ix_stock_reservations_cart', 'ix_stock_reservations_expires')
+
+
+def _table_versions(conn):
+    from utils.query_cache import table_versions
+    table_versions.create(conn, checkfirst=True)
+
+
+MIGRATIONS = [
+    (1, "initial schema", _initial_schema),
+    (2, "secondary indexes on join and filter columns", _secondary_indexes),
+    (3, "transactions.order_id foreign key backfilled from bill_no", _transaction_order_fk),
+    (4, "inventory summary table maintained by item triggers", _inventory_summary),
+    (5, "name indexes on items and customers", _name_indexes),
+    (6, "full-text search on item names and customer names and phones", _name_search),
+    (7, "per-item reorder levels with a partial index as the reorder queue", _reorder_levels),
+    (8, "customer ledger and balances posted from existing bills", _customer_ledger),
+    (9, "daily sales rollups by item, customer and payment mode", _daily_rollups),
+    (10, "background job queue for reports and exports", _jobs),
+    (11, "time-limited stock reservations for open carts", _stock_reservations),
+    (12, "table versions shared by the query caches of all server processes", _table_versions),
+]
+
+
+# --- Runner ---
+def applied_versions(conn):
+    """Return the set of migration versions already applied"""
+    schema_migrations.create(conn, checkfirst=True)
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def _begin_locked(engine):
+    """(connection, transaction) opened with BEGIN IMMEDIATE, as Database.run_write opens its writes.
+
+    Migrations are looked up, applied and recorded while holding SQLite's
+    write lock, so processes starting together cannot both run one. A
+    process that outwaits busy_timeout while another one migrates retries.
+    """
+    locked = engine.execution_options(write_transaction=True)
+    for attempt in range(config.SQLITE_WRITE_RETRIES + 1):
+        conn = locked.connect()
+        try:
+            return conn, conn.begin()
+        except OperationalError as e:
+            conn.close()
+            if not is_busy_error(e) or attempt == config.SQLITE_WRITE_RETRIES:
+                raise
+            time.sleep(min(config.SQLITE_RETRY_MAX_MS, config.SQLITE_RETRY_BASE_MS * 2 ** attempt) / 1000)
+
+
+@contextmanager
+def _migration_transaction(engine):
+    conn, transaction = _begin_locked(engine)
+    try:
+        yield conn
+        transaction.commit()
+    except BaseException:
+        transaction.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def pending_migrations(engine):
+    """Return the migrations that have not been applied yet"""
+    with _migration_transaction(engine) as conn:
+        done = applied_versions(conn)
+    return [m for m in MIGRATIONS if m[0] not in done]
+
+
+def run_migrations(engine):
+    """Apply pending migrations in order, each in its own transaction.
+
+    Each transaction holds the write lock from its first statement, and the
+    applied versions are read again inside it. Returns the list of
+    (version, name) pairs that were applied.
+    """
+    applied = []
+    for version, name, migrate in pending_migrations(engine):
+        with _migration_transaction(engine) as conn:
+            # Another process may have applied it since we looked
+            if version in applied_versions(conn):
+                continue
+            migrate(conn)
+            conn.execute(insert(schema_migrations).values(
+                version=version, name=name, applied_at=datetime.utcnow()
+            ))
+        applied.append((version, name))
+    return applied
+
+
+if __name__ == "__main__":
+    from database import Database
+    engine = Database(sys.argv[1] if len(sys.argv) > 1 else None).engine
+    for version, name in run_migrations(engine):
+        print(f"Applied migration {version}: {name}")
+    print(f"Schema is at version {max(m[0] for m in MIGRATIONS)}.")
@@ -1,11 +1,9 @@
 # pages/1_Dashboard.py
 
 import streamlit as st
-import pandas as pd
-from datetime import datetime
-from sqlalchemy import func, cast, String as AlchemyString
-from sqlalchemy.orm import joinedload
-from database import Customer, Item, Order, OrderItem, Transaction
+from utils.reports import recent_sales_frame, show_report
+from utils.inventory import read_summary
+from utils.profiler import profile_panel
 from utils.session import initialize_session
 initialize_session()
 
@@ -17,51 +15,34 @@ def show_dashboard():
     st.title("Inventory Dashboard")
     session = db.get_session()
     try:
-        total_products = session.query(Item).count()
-        total_items_sum = session.query(func.sum(Item.quantity)).scalar()
-        total_items = total_items_sum if total_items_sum is not None else 0
-        low_stock = session.query(Item).filter(Item.quantity <= 5).count()
+        summary = read_summary(session)
         
         col1, col2, col3 = st.columns(3)
-        col1.metric("Total Products", total_products)
-        col2.metric("Total Items in Stock", total_items)
-        col3.metric("Low Stock Items", low_stock)
+        col1.metric("Total Products", summary['total_products'])
+        col2.metric("Total Items in Stock", summary['total_units'])
+        col3.metric("Low Stock Items", summary['low_stock_items'])
         
         st.subheader("Recent Sales Transactions")
-        sales_transactions = session.query(
-            Order, Customer, OrderItem, Item, Transaction
-        ).join(
-            Customer, Order.customer_id == Customer.id
-        ).join(
-            OrderItem, Order.id == OrderItem.order_id
-        ).join(
-            Item, OrderItem.item_id == Item.id
-        ).outerjoin(
-            Transaction, cast(Order.id, AlchemyString) == Transaction.bill_no
-        ).order_by(Order.date.desc()).limit(10).all()
+        recent_sales = recent_sales_frame(session)
 
-        if sales_transactions:
-            data = []
-            for order, customer, order_item, item, transaction in sales_transactions:
-                data.append({
-                    "Order ID": order.id,
-                    "Date": order.date.strftime("%d-%m-%Y %H:%M"),
-                    "Customer Name": customer.name,
-                    "Product Name": item.name,
-                    "Quantity": order_item.quantity,
-                    "Item Total": f"PKR {order_item.quantity * order_item.price:.2f}",
-                    "Order Total Amount": f"PKR {order.total_amount:.2f}",
-                    "Payment Mode": transaction.mode if transaction else "N/A",
-                    "Amount Received": f"PKR {transaction.received:.2f}" if transaction else "PKR 0.00",
-                    "Balance Amount": f"PKR {transaction.balance:.2f}" if transaction else f"PKR {order.total_amount:.2f}",
-                })
-            st.dataframe(pd.DataFrame(data))
+        if not recent_sales.empty:
+            show_report(recent_sales)
         else:
             st.info("No recent sales transactions found.")
+
+        with st.expander("Query cache"):
+            stats = db.cache.stats()
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Hit Rate", f"{stats['hit_rate']:.0%}")
+            col2.metric("Hits / Misses", f"{stats['hits']} / {stats['misses']}")
+            col3.metric("Entries", stats['entries'])
+            col4.metric("Memory", f"{stats['bytes'] / 1048576:.1f} of {stats['max_bytes'] / 1048576:.0f} MB")
     finally:
         session.close()
 
 if st.session_state.logged_in:
     show_dashboard()
 else:
-    st.warning("Please log in to access the dashboard.")
\ No newline at end of file
+    st.warning("Please log in to access the dashboard.")
+
+profile_panel()
\ No newline at end of file
@@ -1,8 +1,16 @@
 # pages/3_Customers.py
 
 import streamlit as st
-import pandas as pd
-from database import Customer
+from datetime import datetime
+from sqlalchemy import func
+from database import Customer, CustomerBalance
+from utils.grid import data_grid
+from utils.importer import import_panel
+from utils.ledger import customer_balance, record_payment, statement, PaymentError, PAYMENT_MODES
+from utils.pickers import customer_picker
+from utils.profiler import profile_panel
+from utils.rollups import rebuild_rollups, sales_days
+from utils.reports import show_report
 from utils.session import initialize_session
 initialize_session()
 
@@ -10,135 +18,183 @@ db = st.session_state['db']
 
 
 
-def manage_customers():
-    st.title("Customer Management")
+# --- Tab sections ---
+# Each tab body is a fragment: its widgets rerun only that tab, with a session of its own
+@st.fragment
+def customers_list():
+    st.subheader("All Customers")
     session = db.get_session()
+    try:
+        data_grid(
+            "customers_grid",
+            session.query(Customer).outerjoin(CustomerBalance, CustomerBalance.customer_id == Customer.id),
+            {
+                "ID": Customer.id,
+                "Name": Customer.name,
+                "Phone": Customer.phone,
+                "Address": Customer.address,
+                "Balance": func.coalesce(CustomerBalance.balance, 0.0)
+            },
+            search_columns=[Customer.name, Customer.phone],
+            tiebreaker=Customer.id,
+            empty_message="No customers found"
+        )
+    finally:
+        session.close()
 
-    # --- Initialize session state for customer management persistence ---
-    if 'add_cust_name_value' not in st.session_state:
-        st.session_state.add_cust_name_value = ""
-    if 'add_cust_phone_value' not in st.session_state:
-        st.session_state.add_cust_phone_value = ""
-    if 'add_cust_address_value' not in st.session_state:
-        st.session_state.add_cust_address_value = ""
 
-    # For Update/Delete tab's selectbox
-    if 'selected_customer_key_value' not in st.session_state:
-        st.session_state.selected_customer_key_value = None
-    # --- End session state initialization ---
+@st.fragment
+def add_customer():
+    st.subheader("Add New Customer")
+    with st.form("add_customer_form"):
+        # Use st.session_state for initial values
+        name = st.text_input("Customer Name", value=st.session_state.add_cust_name_value, key="add_cust_name")
+        phone = st.text_input("Phone Number", value=st.session_state.add_cust_phone_value, key="add_cust_phone")
+        address = st.text_area("Address", value=st.session_state.add_cust_address_value, key="add_cust_address")
+        
+        if st.form_submit_button("Add Customer"):
+            if name and phone and address:
+                db.run_write(lambda write: write.add(Customer(
+                    name=name,
+                    phone=phone,
+                    address=address
+                )))
+                st.success("Customer added successfully!")
+                # Clear form fields after successful submission
+                st.session_state.add_cust_name_value = ""
+                st.session_state.add_cust_phone_value = ""
+                st.session_state.add_cust_address_value = ""
+                st.rerun()
+            else:
+                st.error("Please fill all customer fields.")
+        
+        # Update session state for non-form submission inputs (if any)
+        st.session_state.add_cust_name_value = name
+        st.session_state.add_cust_phone_value = phone
+        st.session_state.add_cust_address_value = address
+
 
+@st.fragment
+def edit_customer():
+    st.subheader("Update or Delete Customer")
+    session = db.get_session()
     try:
-        tab1, tab2, tab3 = st.tabs(["View Customers", "Add Customer", "Update/Delete Customer"])
+        cust_id = customer_picker(session, "Select Customer to Update/Delete", key="select_customer_update")
         
-        with tab1:
-            st.subheader("All Customers")
-            customers = session.query(Customer).order_by(Customer.id.asc()).all()
+        if cust_id:
+            customer_to_edit = session.get(Customer, cust_id)
             
-            if customers:
-                data = [{
-                    "ID": c.id,
-                    "Name": c.name,
-                    "Phone": c.phone,
-                    "Address": c.address
-                } for c in customers]
-                st.dataframe(pd.DataFrame(data))
-            else:
-                st.info("No customers found")
-        
-        with tab2:
-            st.subheader("Add New Customer")
-            with st.form("add_customer_form"):
-                # Use st.session_state for initial values
-                name = st.text_input("Customer Name", value=st.session_state.add_cust_name_value, key="add_cust_name")
-                phone = st.text_input("Phone Number", value=st.session_state.add_cust_phone_value, key="add_cust_phone")
-                address = st.text_area("Address", value=st.session_state.add_cust_address_value, key="add_cust_address")
+            with st.form(f"edit_customer_form_{cust_id}"):
+                edited_name = st.text_input("Customer Name", value=customer_to_edit.name, key=f"edit_cust_name_{cust_id}")
+                edited_phone = st.text_input("Phone Number", value=customer_to_edit.phone, key=f"edit_cust_phone_{cust_id}")
+                edited_address = st.text_area("Address", value=customer_to_edit.address, key=f"edit_cust_address_{cust_id}")
                 
-                if st.form_submit_button("Add Customer"):
-                    if name and phone and address:
-                        new_customer = Customer(
-                            name=name,
-                            phone=phone,
-                            address=address
-                        )
-                        session.add(new_customer)
-                        session.commit()
-                        st.success("Customer added successfully!")
-                        # Clear form fields after successful submission
-                        st.session_state.add_cust_name_value = ""
-                        st.session_state.add_cust_phone_value = ""
-                        st.session_state.add_cust_address_value = ""
+                col_update, col_delete = st.columns(2)
+                with col_update:
+                    if st.form_submit_button("Update Customer"):
+                        def update_customer(write):
+                            customer = write.get(Customer, cust_id)
+                            customer.name = edited_name
+                            customer.phone = edited_phone
+                            customer.address = edited_address
+                        db.run_write(update_customer)
+                        st.success("Customer updated successfully!")
                         st.rerun()
-                    else:
-                        st.error("Please fill all customer fields.")
-                
-                # Update session state for non-form submission inputs (if any)
-                st.session_state.add_cust_name_value = name
-                st.session_state.add_cust_phone_value = phone
-                st.session_state.add_cust_address_value = address
-                
-        with tab3:
-            st.subheader("Update or Delete Customer")
-            customers = session.query(Customer).order_by(Customer.id.asc()).all()
-            
-            if customers:
-                customer_options = {f"{c.name} (ID: {c.id})": c.id for c in customers}
-                
-                # Get the index of the previously selected customer if it exists in current options
-                current_customer_keys = list(customer_options.keys())
-                default_index = 0
-                if st.session_state.selected_customer_key_value in current_customer_keys:
-                    default_index = current_customer_keys.index(st.session_state.selected_customer_key_value)
-                elif customers: # If previous was deleted, or no prev selected, pick first
-                    st.session_state.selected_customer_key_value = current_customer_keys[0]
-                    default_index = 0
-                else: # No customers left
-                    st.session_state.selected_customer_key_value = None
-
-                selected_customer_key = st.selectbox(
-                    "Select Customer to Update/Delete", 
-                    options=current_customer_keys, 
-                    index=default_index, # Set default selection
-                    key="select_customer_update"
-                )
-                
-                # Update session state with the current selection for persistence
-                st.session_state.selected_customer_key_value = selected_customer_key
-                
-                if selected_customer_key and st.session_state.selected_customer_key_value: # Make sure a customer is actually selected
-                    cust_id = customer_options[st.session_state.selected_customer_key_value] # Use session state value
-                    customer_to_edit = session.query(Customer).get(cust_id)
-                    
-                    with st.form(f"edit_customer_form_{cust_id}"):
-                        edited_name = st.text_input("Customer Name", value=customer_to_edit.name, key=f"edit_cust_name_{cust_id}")
-                        edited_phone = st.text_input("Phone Number", value=customer_to_edit.phone, key=f"edit_cust_phone_{cust_id}")
-                        edited_address = st.text_area("Address", value=customer_to_edit.address, key=f"edit_cust_address_{cust_id}")
-                        
-                        col_update, col_delete = st.columns(2)
-                        with col_update:
-                            if st.form_submit_button("Update Customer"):
-                                customer_to_edit.name = edited_name
-                                customer_to_edit.phone = edited_phone
-                                customer_to_edit.address = edited_address
-                                session.commit()
-                                st.success("Customer updated successfully!")
-                                st.rerun()
-                        with col_delete:
-                            if st.form_submit_button("Delete Customer"):
-                                if st.checkbox("Confirm deletion?", key=f"confirm_delete_customer_{cust_id}"):
-                                    session.delete(customer_to_edit)
-                                    session.commit()
-                                    st.success("Customer deleted successfully!")
-                                    # Clear selected item from session state after deletion
-                                    st.session_state.selected_customer_key_value = None
-                                    st.rerun()
-                else:
-                    st.info("Please select a customer to edit or delete.")
+                with col_delete:
+                    if st.form_submit_button("Delete Customer"):
+                        if st.checkbox("Confirm deletion?", key=f"confirm_delete_customer_{cust_id}"):
+                            def delete_customer(write):
+                                # Their orders go with them, so recompute the sales rollups for those days
+                                sale_days = sales_days(write, customer_id=cust_id)
+                                write.delete(write.get(Customer, cust_id))
+                                write.flush()
+                                rebuild_rollups(write, sale_days)
+                            db.run_write(delete_customer)
+                            st.success("Customer deleted successfully!")
+                            # The picker drops the deleted ID on the next run
+                            st.rerun()
+        else:
+            st.info("No matching customers to update or delete.")
+    finally:
+        session.close()
+
+
+@st.fragment
+def import_customers():
+    st.subheader("Import Customers from CSV or Excel")
+    import_panel(db, "Customers")
+
+
+@st.fragment
+def account_statement():
+    st.subheader("Customer Account Statement")
+    session = db.get_session()
+    try:
+        statement_cust_id = customer_picker(session, "Select Customer", key="select_customer_statement")
+
+        if statement_cust_id:
+            col1, col2 = st.columns(2)
+            with col1:
+                start_date = st.date_input("Start Date", value=datetime.today().replace(day=1).date(), key="statement_start")
+            with col2:
+                end_date = st.date_input("End Date", value=datetime.today().date(), key="statement_end")
+
+            opening, entries, closing = statement(session, statement_cust_id, start_date, end_date)
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Opening Balance", f"PKR {opening:.2f}")
+            col2.metric("Closing Balance", f"PKR {closing:.2f}")
+            col3.metric("Current Balance", f"PKR {customer_balance(session, statement_cust_id):.2f}")
+
+            if not entries.empty:
+                show_report(entries)
             else:
-                st.info("No customers available to update or delete.")
+                st.info("No bills or payments in the selected period.")
+
+            st.markdown("---")
+            st.subheader("Record Payment")
+            with st.form(f"record_payment_form_{statement_cust_id}"):
+                amount = st.number_input("Amount", min_value=0.0, step=0.01, key="payment_amount")
+                mode = st.selectbox("Payment Mode", PAYMENT_MODES, key="payment_mode")
+                reference = st.text_input("Reference (cheque or receipt number)", key="payment_reference")
+
+                if st.form_submit_button("Record Payment"):
+                    try:
+                        new_balance = record_payment(db, statement_cust_id, amount, mode, reference)
+                    except PaymentError as e:
+                        st.error(str(e))
+                    else:
+                        st.success(f"Payment recorded. New balance: PKR {new_balance:.2f}")
+                        st.rerun()
+        else:
+            st.info("No matching customers.")
     finally:
         session.close()
 
+
+def manage_customers():
+    st.title("Customer Management")
+
+    # --- Initialize session state for customer management persistence ---
+    if 'add_cust_name_value' not in st.session_state:
+        st.session_state.add_cust_name_value = ""
+    if 'add_cust_phone_value' not in st.session_state:
+        st.session_state.add_cust_phone_value = ""
+    if 'add_cust_address_value' not in st.session_state:
+        st.session_state.add_cust_address_value = ""
+    # --- End session state initialization ---
+
+    # Switching tabs reruns the page, and only the open tab's body runs
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["View Customers", "Add Customer", "Update/Delete Customer", "Import Customers", "Account Statement"],
+                                           key="customers_tabs", on_change="rerun")
+    for tab, section in ((tab1, customers_list), (tab2, add_customer), (tab3, edit_customer),
+                         (tab4, import_customers), (tab5, account_statement)):
+        with tab:
+            if tab.open:
+                section()
+
 if st.session_state.logged_in:
     manage_customers()
 else:
-    st.warning("Please log in to manage customers.")
\ No newline at end of file
+    st.warning("Please log in to manage customers.")
+
+profile_panel()
\ No newline at end of file
@@ -1,10 +1,13 @@
 # pages/4_Orders.py
 
 import streamlit as st
-import pandas as pd
 from datetime import datetime
-from sqlalchemy.orm import joinedload
-from database import Customer, Item, Order, OrderItem, Transaction
+from database import Customer, Item
+from utils.pickers import customer_picker, item_picker
+from utils.orders import finalize_order, InsufficientStock, list_orders, order_rows, ORDER_STATUSES, PAGE_SIZE
+from utils.reports import typed_frame, show_report
+from utils.reservations import available, cart_holds, hold, new_cart_id, release
+from utils.profiler import profile_panel
 from utils.session import initialize_session
 initialize_session()
 
@@ -12,64 +15,93 @@ db = st.session_state['db']
 
 
 
-def manage_orders():
-    st.title("Order Management")
-    session = db.get_session()
-    try:
-        tab1, tab2 = st.tabs(["Create New Order", "View All Orders"])
+# --- Cart callbacks ---
+# They run before the fragment reruns, so the cart it then draws is already up to date
+def renew_holds(cart_id, lapsed):
+    st.session_state.order_hold_errors = [
+        f"Not enough {line['name']} left to hold {line['quantity']}."
+        for line in lapsed if not hold(db, cart_id, line['item_id'], line['quantity'])
+    ]
 
-        with tab1:
-            st.subheader("Create a New Sales Order")
-            customers = session.query(Customer).order_by(Customer.id.asc()).all()
-            products = session.query(Item).filter(Item.quantity > 0).order_by(Item.id.asc()).all()
 
-            if not customers:
-                st.warning("Please add some customers first from 'Customers' page.")
-                return
-            if not products:
-                st.warning("Please add some products with available stock first from 'Products' page.")
-                return
+def remove_line(cart_id):
+    item_id = st.session_state.remove_order_line
+    release(db, cart_id, item_id)
+    st.session_state.current_order_items = [
+        line for line in st.session_state.current_order_items if line['item_id'] != item_id
+    ]
 
-            customer_options = {f"{c.name} (ID: {c.id})": c.id for c in customers}
-            selected_customer_key = st.selectbox("Select Customer", options=list(customer_options.keys()), key="order_customer_select")
-            selected_customer_id = customer_options[selected_customer_key]
 
-            st.markdown("---")
-            st.subheader("Add Items to Order")
+def clear_order(cart_id):
+    release(db, cart_id)
+    st.session_state.current_order_items = []
 
-            if 'current_order_items' not in st.session_state:
-                st.session_state.current_order_items = []
 
-            product_choices = {f"{p.name} (Available: {p.quantity}, Price: PKR {p.selling_price:.2f})": p.id for p in products}
-            
-            if product_choices:
-                selected_product_key = st.selectbox("Select Product to Add", options=list(product_choices.keys()), key="add_item_to_order_product")
-                selected_product_id = product_choices[selected_product_key]
-                
-                selected_product = session.query(Item).get(selected_product_id)
+# --- Tab sections ---
+# Each tab body is a fragment: its widgets rerun only that tab, with a session of its own
+@st.fragment
+def create_order():
+    st.subheader("Create a New Sales Order")
+    session = db.get_session()
+    try:
+        if session.query(Customer.id).first() is None:
+            st.warning("Please add some customers first from 'Customers' page.")
+            return
+        if session.query(Item.id).filter(Item.quantity > 0).first() is None:
+            st.warning("Please add some products with available stock first from 'Products' page.")
+            return
+
+        selected_customer_id = customer_picker(session, "Select Customer", key="order_customer_select")
+
+        st.markdown("---")
+        st.subheader("Add Items to Order")
+
+        if 'current_order_items' not in st.session_state:
+            st.session_state.current_order_items = []
+        # Token for this cart's stock holds (utils/reservations.py)
+        if 'order_cart_id' not in st.session_state:
+            st.session_state.order_cart_id = new_cart_id()
+        cart_id = st.session_state.order_cart_id
 
+        selected_product_id = item_picker(
+            session,
+            "Select Product to Add",
+            key="add_item_to_order_product",
+            in_stock_only=True,
+            describe=lambda p: f"{p.name} (In stock: {p.quantity}, Price: PKR {p.selling_price:.2f})"
+        )
+        
+        if selected_product_id:
+            selected_product = session.get(Item, selected_product_id)
+            existing_item_index = -1
+            for i, item_data in enumerate(st.session_state.current_order_items):
+                if item_data['item_id'] == selected_product_id:
+                    existing_item_index = i
+                    break
+            in_cart = st.session_state.current_order_items[existing_item_index]['quantity'] if existing_item_index != -1 else 0
+
+            # Units other carts hold are not for sale
+            addable = available(session, [selected_product_id], cart_id)[selected_product_id] - in_cart
+            if addable <= 0:
+                st.info(f"No more {selected_product.name} available: the rest of the stock is in this order "
+                        f"or held for other open orders.")
+            else:
                 qty_to_add = st.number_input(
-                    f"Quantity (Max: {selected_product.quantity})", 
+                    f"Quantity (Max: {addable})", 
                     min_value=1, 
-                    max_value=selected_product.quantity, 
+                    max_value=addable, 
                     step=1, 
                     key="add_item_to_order_qty"
                 )
 
                 if st.button("Add Product to Order List", key="add_product_to_order_list"):
-                    existing_item_index = -1
-                    for i, item_data in enumerate(st.session_state.current_order_items):
-                        if item_data['item_id'] == selected_product_id:
-                            existing_item_index = i
-                            break
-
-                    if existing_item_index != -1:
-                        if st.session_state.current_order_items[existing_item_index]['quantity'] + qty_to_add > selected_product.quantity:
-                            st.error(f"Cannot add {qty_to_add} more. Only {selected_product.quantity - st.session_state.current_order_items[existing_item_index]['quantity']} available for {selected_product.name}.")
-                        else:
-                            st.session_state.current_order_items[existing_item_index]['quantity'] += qty_to_add
-                            st.session_state.current_order_items[existing_item_index]['total_price'] += (selected_product.selling_price * qty_to_add)
-                            st.success(f"{qty_to_add} x {selected_product.name} added to order list.")
+                    if not hold(db, cart_id, selected_product_id, in_cart + qty_to_add):
+                        still_available = available(session, [selected_product_id], cart_id)[selected_product_id]
+                        st.error(f"Cannot add {qty_to_add} more. Only {max(still_available - in_cart, 0)} available for {selected_product.name}; other open orders hold the rest.")
+                    elif existing_item_index != -1:
+                        st.session_state.current_order_items[existing_item_index]['quantity'] += qty_to_add
+                        st.session_state.current_order_items[existing_item_index]['total_price'] += (selected_product.selling_price * qty_to_add)
+                        st.success(f"{qty_to_add} x {selected_product.name} added to order list.")
                     else:
                         st.session_state.current_order_items.append({
                             "item_id": selected_product_id,
@@ -80,131 +112,148 @@ def manage_orders():
                             "total_price": selected_product.selling_price * qty_to_add
                         })
                         st.success(f"{qty_to_add} x {selected_product.name} added to order list.")
-            else:
-                st.info("No products with available stock to add.")
+        else:
+            st.info("No matching products with available stock to add.")
 
 
-            if st.session_state.current_order_items:
-                st.subheader("Current Order Items:")
-                order_df = pd.DataFrame(st.session_state.current_order_items)
-                order_df['Selling Price'] = order_df['selling_price_at_order'].apply(lambda x: f"PKR {x:.2f}")
-                order_df['Total Price'] = order_df['total_price'].apply(lambda x: f"PKR {x:.2f}")
-                st.dataframe(order_df[['name', 'quantity', 'Selling Price', 'Total Price']])
+        if st.session_state.current_order_items:
+            st.subheader("Current Order Items:")
+            order_df = typed_frame(st.session_state.current_order_items)
+            show_report(order_df[['name', 'quantity', 'selling_price_at_order', 'total_price']].rename(columns={
+                'name': "Product", 'quantity': "Quantity",
+                'selling_price_at_order': "Selling Price", 'total_price': "Total Price"
+            }))
 
-                total_order_amount = sum(item['total_price'] for item in st.session_state.current_order_items)
-                st.markdown(f"### Total Order Amount: **PKR {total_order_amount:.2f}**")
+            # --- Stock holds ---
+            holds = cart_holds(session, cart_id)
+            lapsed = [line for line in st.session_state.current_order_items
+                      if holds.get(line['item_id'], (0, None))[0] < line['quantity']]
+            if holds:
+                minutes_left = (min(expires_at for _, expires_at in holds.values()) - datetime.utcnow()).total_seconds() / 60
+                st.caption(f"Stock for this order is held for another {max(int(minutes_left), 0)} minute(s); adding a product renews the hold.")
+            for message in st.session_state.pop('order_hold_errors', []):
+                st.error(message)
+            if lapsed:
+                st.warning("The hold on " + ", ".join(line['name'] for line in lapsed) +
+                           " has expired; other orders may sell that stock before this one is finalized.")
+                st.button("Hold Stock Again", key="renew_order_holds", on_click=renew_holds, args=(cart_id, lapsed))
 
-                st.markdown("---")
-                st.subheader("Payment Details")
-                payment_mode = st.selectbox("Payment Mode", ["Cash", "Credit", "Cheque"], key="order_payment_mode")
-                
-                cheque_no = None
-                if payment_mode == "Cheque":
-                    cheque_no = st.text_input("Cheque Number", key="order_cheque_no")
-                
-                order_status = st.selectbox("Order Status", ["Pending", "Completed", "Cancelled"], key="order_status_select")
+            col_remove, col_remove_button, col_clear = st.columns([2, 1, 1])
+            with col_remove:
+                st.selectbox(
+                    "Remove Product", [line['item_id'] for line in st.session_state.current_order_items],
+                    format_func={line['item_id']: line['name'] for line in st.session_state.current_order_items}.get,
+                    key="remove_order_line"
+                )
+            with col_remove_button:
+                st.button("Remove from Order", key="remove_order_line_button", on_click=remove_line, args=(cart_id,))
+            with col_clear:
+                st.button("Clear Order", key="clear_order_button", on_click=clear_order, args=(cart_id,))
 
+            total_order_amount = sum(item['total_price'] for item in st.session_state.current_order_items)
+            st.markdown(f"### Total Order Amount: **PKR {total_order_amount:.2f}**")
 
-                amount_received = st.number_input("Amount Received", min_value=0.0, value=total_order_amount, step=0.01, key="order_amount_received")
-                balance_amount = total_order_amount - amount_received
-                st.info(f"Balance Amount: PKR {balance_amount:.2f}")
+            st.markdown("---")
+            st.subheader("Payment Details")
+            payment_mode = st.selectbox("Payment Mode", ["Cash", "Credit", "Cheque"], key="order_payment_mode")
+            
+            cheque_no = None
+            if payment_mode == "Cheque":
+                cheque_no = st.text_input("Cheque Number", key="order_cheque_no")
+            
+            order_status = st.selectbox("Order Status", ORDER_STATUSES, key="order_status_select")
 
-                if st.button("Finalize Order", key="finalize_order_button"):
-                    if not st.session_state.current_order_items:
-                        st.error("Please add items to the order before finalizing.")
-                    else:
-                        all_stock_available = True
-                        for item_data in st.session_state.current_order_items:
-                            product_in_stock = session.query(Item).get(item_data['item_id'])
-                            if product_in_stock and product_in_stock.quantity < item_data['quantity']:
-                                st.error(f"Error: Not enough stock for {product_in_stock.name}. Available: {product_in_stock.quantity}, Requested: {item_data['quantity']}")
-                                all_stock_available = False
-                                break
-                        
-                        if not all_stock_available:
-                            session.rollback() 
-                            st.stop()
-
-                        new_order = Order(
-                            customer_id=selected_customer_id,
-                            total_amount=total_order_amount,
-                            date=datetime.utcnow(),
-                            status=order_status
-                        )
-                        session.add(new_order)
-                        session.flush() 
-
-                        for item_data in st.session_state.current_order_items:
-                            order_item = OrderItem(
-                                order_id=new_order.id,
-                                item_id=item_data['item_id'],
-                                quantity=item_data['quantity'],
-                                price=item_data['selling_price_at_order']
-                            )
-                            session.add(order_item)
-
-                            product_in_stock = session.query(Item).get(item_data['item_id'])
-                            if product_in_stock:
-                                product_in_stock.quantity -= item_data['quantity']
-
-                        customer_details = session.query(Customer).get(selected_customer_id)
-                        customer_name_for_transaction = customer_details.name if customer_details else "N/A"
-                        customer_address_for_transaction = customer_details.address if customer_details else "N/A"
-
-                        new_transaction = Transaction(
-                            bill_no=str(new_order.id), 
-                            date=datetime.utcnow(),
-                            customer_id=selected_customer_id,
-                            party_name=customer_name_for_transaction,
-                            address=customer_address_for_transaction,
-                            mode=payment_mode,
+
+            amount_received = st.number_input("Amount Received", min_value=0.0, value=total_order_amount, step=0.01, key="order_amount_received")
+            balance_amount = total_order_amount - amount_received
+            st.info(f"Balance Amount: PKR {balance_amount:.2f}")
+
+            if st.button("Finalize Order", key="finalize_order_button"):
+                if not st.session_state.current_order_items:
+                    st.error("Please add items to the order before finalizing.")
+                else:
+                    try:
+                        new_order_id = finalize_order(
+                            db,
+                            selected_customer_id,
+                            st.session_state.current_order_items,
+                            status=order_status,
+                            payment_mode=payment_mode,
+                            amount_received=amount_received,
                             cheque_no=cheque_no,
-                            issue_amount=total_order_amount,
-                            received=amount_received,
-                            balance=balance_amount
+                            cart_id=cart_id
                         )
-                        session.add(new_transaction)
-                        
-                        session.commit()
-                        st.success(f"Order {new_order.id} finalized successfully!")
-                        st.session_state.current_order_items = []
-                        st.rerun()
-            else:
-                st.info("Add products to create an order.")
-
-
-        with tab2:
-            st.subheader("All Sales Orders")
-            orders_with_details = session.query(Order).options(
-                joinedload(Order.customer),
-                joinedload(Order.order_items).joinedload(OrderItem.item)
-            ).order_by(Order.date.asc()).all() 
-
-            if orders_with_details:
-                order_data = []
-                for order in orders_with_details:
-                    items_str = ", ".join([f"{oi.item.name} ({oi.quantity}x)" for oi in order.order_items])
-                    
-                    transaction = session.query(Transaction).filter_by(bill_no=str(order.id)).first()
-
-                    order_data.append({
-                        "Order ID": order.id,
-                        "Date": order.date.strftime("%d-%m-%Y %H:%M"), 
-                        "Customer Name": order.customer.name if order.customer else "N/A",
-                        "Items": items_str,
-                        "Total Amount": f"PKR {order.total_amount:.2f}",
-                        "Status": order.status,
-                        "Payment Mode": transaction.mode if transaction else "N/A",
-                        "Amount Received": f"PKR {transaction.received:.2f}" if transaction else "PKR 0.00",
-                        "Balance": f"PKR {transaction.balance:.2f}" if transaction else f"PKR {order.total_amount:.2f}"
-                    })
-                st.dataframe(pd.DataFrame(order_data))
-            else:
-                st.info("No orders found.")
+                    except InsufficientStock as e:
+                        for name, units_available, requested in e.shortages:
+                            st.error(f"Error: Not enough stock for {name}. Available: {units_available}, Requested: {requested}")
+                        st.stop()
+
+                    st.success(f"Order {new_order_id} finalized successfully!")
+                    st.session_state.current_order_items = []
+                    st.rerun()
+        else:
+            st.info("Add products to create an order.")
+    finally:
+        session.close()
+
+
+@st.fragment
+def order_list():
+    st.subheader("All Sales Orders")
+    session = db.get_session()
+    try:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            filter_start = st.date_input("From", value=None, key="orders_filter_start")
+        with col2:
+            filter_end = st.date_input("To", value=None, key="orders_filter_end")
+        with col3:
+            filter_status = st.selectbox("Status", ["All"] + ORDER_STATUSES, key="orders_filter_status")
+        filters = (filter_start, filter_end, filter_status)
+
+        # Stack of keyset cursors, one per page visited; reset when the filters change
+        if st.session_state.get('orders_page_filters') != filters:
+            st.session_state.orders_page_filters = filters
+            st.session_state.orders_page_cursors = [None]
+        cursors = st.session_state.orders_page_cursors
+
+        orders_page, next_cursor = list_orders(
+            session,
+            start_date=filter_start,
+            end_date=filter_end,
+            status=filter_status if filter_status != "All" else None,
+            after=cursors[-1]
+        )
+
+        if orders_page:
+            show_report(typed_frame(order_rows(orders_page)))
+        else:
+            st.info("No orders found.")
+
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            st.button("Previous", key="orders_prev_page", disabled=len(cursors) == 1, on_click=cursors.pop)
+        with col_page:
+            st.caption(f"Page {len(cursors)} ({PAGE_SIZE} orders per page)")
+        with col_next:
+            st.button("Next", key="orders_next_page", disabled=next_cursor is None,
+                      on_click=cursors.append, args=(next_cursor,))
     finally:
         session.close()
 
+
+def manage_orders():
+    st.title("Order Management")
+    # Switching tabs reruns the page, and only the open tab's body runs
+    tab1, tab2 = st.tabs(["Create New Order", "View All Orders"], key="orders_tabs", on_change="rerun")
+    for tab, section in ((tab1, create_order), (tab2, order_list)):
+        with tab:
+            if tab.open:
+                section()
+
 if st.session_state.logged_in:
     manage_orders()
 else:
-    st.warning("Please log in to manage orders.")
\ No newline at end of file
+    st.warning("Please log in to manage orders.")
+
+profile_panel()
\ No newline at end of file
@@ -1,13 +1,12 @@
 # pages/5_Sales_History.py
 
 import streamlit as st
-import pandas as pd
 from datetime import datetime
-from sqlalchemy import cast, String as AlchemyString
-from sqlalchemy.orm import joinedload
-from fpdf import FPDF
-from io import BytesIO
-from database import Customer, Item, Order, OrderItem, Transaction
+from utils.export import EXPORT_FORMATS
+from utils.jobs import jobs_panel, submit
+from utils.pickers import customer_picker, item_picker
+from utils.reports import sales_detail_frame, sales_totals, daily_sales_frame, show_report
+from utils.profiler import profile_panel
 from utils.session import initialize_session
 initialize_session()
 
@@ -15,180 +14,106 @@ db = st.session_state['db']
 
 
 
-# Helper function for creating sales PDF
-def create_pdf(data_frame, total_rev, total_prof, start, end):
+# --- Sections ---
+# Each filter and the report are fragments: changing one filter reruns only
+# that filter, not the other pickers' searches or the jobs panel. The report
+# reads the filters from session state when it is generated or queued.
+@st.fragment
+def period_filter():
+    col1, col2 = st.columns(2)
+    with col1:
+        st.date_input("Start Date", value=datetime.today().replace(day=1).date(), key="sales_hist_start")
+    with col2:
+        st.date_input("End Date", value=datetime.today().date(), key="sales_hist_end")
+
+
+@st.fragment
+def customer_filter():
+    session = db.get_session()
     try:
-        pdf = FPDF()
-        pdf.set_auto_page_break(auto=True, margin=15)
-        pdf.add_page()
-        
-        # Title
-        pdf.set_font("Arial", 'B', 16)
-        pdf.cell(0, 10, "Sales Report", 0, 1, 'C')
-        pdf.set_font("Arial", '', 12)
-        pdf.cell(0, 10, f"From {start.strftime('%d-%m-%Y')} to {end.strftime('%d-%m-%Y')}", 0, 1, 'C')
-        pdf.ln(10)
-
-        # Column widths
-        col_widths = [12, 12, 15, 25, 25, 25, 8, 16, 16, 15, 15] 
-        headers = ["Bill No", "Order ID", "Date", "Customer Name", "Customer Phone", "Product Name", "Qty", "Item Total", "Order Total", "Paid", "Balance"]
-
-        # Header
-        pdf.set_font("Arial", 'B', 8)
-        for i, header in enumerate(headers):
-            pdf.cell(col_widths[i], 8, header, 1, 0, 'C')
-        pdf.ln()
-
-        # Data
-        pdf.set_font("Arial", '', 7)
-        for _, row in data_frame.iterrows():
-            pdf.cell(col_widths[0], 8, str(row["Bill No"]), 1, 0, 'C')
-            pdf.cell(col_widths[1], 8, str(row["Order ID"]), 1, 0, 'C')
-            pdf.cell(col_widths[2], 8, row["Order Date"].split(' ')[0], 1, 0, 'C') 
-            pdf.cell(col_widths[3], 8, row["Customer Name"], 1, 0, 'C')
-            pdf.cell(col_widths[4], 8, row["Customer Phone"], 1, 0, 'C')
-            pdf.cell(col_widths[5], 8, row["Product Name"], 1, 0, 'C')
-            pdf.cell(col_widths[6], 8, str(row["Quantity Sold"]), 1, 0, 'C')
-            pdf.cell(col_widths[7], 8, row["Total Item Revenue"].replace("PKR ", ""), 1, 0, 'C')
-            pdf.cell(col_widths[8], 8, row["Order Total Amount"].replace("PKR ", ""), 1, 0, 'C')
-            pdf.cell(col_widths[9], 8, row["Amount Received"].replace("PKR ", ""), 1, 0, 'C')
-            pdf.cell(col_widths[10], 8, row["Balance Amount"].replace("PKR ", ""), 1, 0, 'C')
-            pdf.ln()
-
-       
-
-        buffer = BytesIO()
-        buffer.write(pdf.output(dest='B')) 
-        buffer.seek(0)
-        return buffer.getvalue()
-    except Exception as e:
-        st.error(f"Error generating PDF: {str(e)}")
-        return None
+        customer_picker(session, "Filter by Customer", key="sales_hist_customer", allow_none=True)
+    finally:
+        session.close()
 
-def show_sales_history():
-    st.title("Comprehensive Sales History")
-    session = st.session_state['db'].get_session() 
+
+@st.fragment
+def product_filter():
+    session = db.get_session()
     try:
-        st.subheader("Filter Sales Data")
-        col1, col2 = st.columns(2)
-        with col1:
-            start_date = st.date_input("Start Date", value=datetime.today().replace(day=1).date(), key="sales_hist_start")
-        with col2:
-            end_date = st.date_input("End Date", value=datetime.today().date(), key="sales_hist_end")
-
-        customer_list = session.query(Customer).order_by(Customer.name.asc()).all()
-        customer_options = {"All Customers": None}
-        customer_options.update({c.name: c.id for c in customer_list})
-        selected_customer_name = st.selectbox("Filter by Customer", options=list(customer_options.keys()), key="sales_hist_customer")
-        selected_customer_id = customer_options[selected_customer_name]
-
-        product_list = session.query(Item).order_by(Item.name.asc()).all()
-        product_options = {"All Products": None}
-        product_options.update({i.name: i.id for i in product_list})
-        selected_product_name = st.selectbox("Filter by Product", options=list(product_options.keys()), key="sales_hist_product")
-        selected_product_id = product_options[selected_product_name]
-
-        payment_mode_options = ["All", "Cash", "Credit", "Cheque"]
-        selected_payment_mode = st.selectbox("Filter by Payment Mode", options=payment_mode_options, key="sales_hist_payment_mode")
-
-        if st.button("Generate Sales Report", key="generate_sales_report_button"):
-            query = session.query(
-                Order, Customer, OrderItem, Item, Transaction
-            ).join(
-                Customer, Order.customer_id == Customer.id
-            ).join(
-                OrderItem, Order.id == OrderItem.order_id
-            ).join(
-                Item, OrderItem.item_id == Item.id
-            ).outerjoin(
-                Transaction, cast(Order.id, AlchemyString) == Transaction.bill_no
-            ).filter(
-                Order.date >= datetime.combine(start_date, datetime.min.time()),
-                Order.date <= datetime.combine(end_date, datetime.max.time())
-            )
-
-            if selected_customer_id:
-                query = query.filter(Customer.id == selected_customer_id)
-            if selected_product_id:
-                query = query.filter(Item.id == selected_product_id)
-            if selected_payment_mode != "All":
-                query = query.filter(Transaction.mode == selected_payment_mode.lower())
-
-            sales_records = query.order_by(Order.date.asc()).all() 
-
-            if sales_records:
-                detailed_sales_data = []
-                for order, customer, order_item, item, transaction in sales_records:
-                    profit_on_item = (order_item.price - item.cost_price) * order_item.quantity
-                    
-                    detailed_sales_data.append({
-                        "Bill No": transaction.bill_no if transaction else "N/A",
-                        "Order ID": order.id,
-                        "Order Date": order.date.strftime("%d-%m-%Y %H:%M:%S"),
-                        "Customer Name": customer.name,
-                        "Customer Phone": customer.phone, 
-                        "Customer Address": customer.address, 
-                        "Product Name": item.name,
-                        "Quantity Sold": order_item.quantity,
-                        "Total Item Revenue": f"PKR {order_item.quantity * order_item.price:.2f}",
-                        "Order Total Amount": f"PKR {order.total_amount:.2f}",
-                        "Payment Mode": transaction.mode if transaction else "N/A",
-                        "Amount Received": f"PKR {transaction.received:.2f}" if transaction else "PKR 0.00",
-                        "Balance Amount": f"PKR {transaction.balance:.2f}" if transaction else f"PKR {order.total_amount:.2f}",
-                        "Profit (Internal)": profit_on_item 
-                    })
-                
-                df_sales = pd.DataFrame(detailed_sales_data)
-                
-                display_cols = [
-                    "Bill No", "Order ID", "Order Date", "Customer Name", "Customer Phone", 
-                    "Customer Address", "Product Name", "Quantity Sold", "Total Item Revenue", 
-                    "Order Total Amount", "Payment Mode", "Amount Received", "Balance Amount"
-                ]
-                st.dataframe(df_sales[display_cols])
-
-                total_revenue = df_sales['Total Item Revenue'].str.replace('PKR ', '').astype(float).sum()
-                total_profit = df_sales['Profit (Internal)'].sum() 
+        item_picker(session, "Filter by Product", key="sales_hist_product", allow_none=True)
+    finally:
+        session.close()
+
+
+@st.fragment
+def sales_report():
+    payment_mode_options = ["All", "Cash", "Credit", "Cheque"]
+    selected_payment_mode = st.selectbox("Filter by Payment Mode", options=payment_mode_options, key="sales_hist_payment_mode")
+
+    start_date = st.session_state.sales_hist_start
+    end_date = st.session_state.sales_hist_end
+    filters = dict(
+        customer_id=st.session_state.get("sales_hist_customer"),
+        product_id=st.session_state.get("sales_hist_product"),
+        payment_mode=selected_payment_mode if selected_payment_mode != "All" else None
+    )
+
+    # --- Export ---
+    # A background job streams the filtered lines to a file, without loading
+    # the report below, so any date range can be exported.
+    with st.expander("Export Sales Data (CSV / Parquet)"):
+        export_format = st.radio("Format", list(EXPORT_FORMATS), horizontal=True, key="sales_export_format")
+        if st.button(f"Queue Sales Export ({export_format})", key="sales_export_button"):
+            submit(db, 'sales_export', st.session_state.current_user, format=export_format,
+                   start_date=start_date, end_date=end_date, filters=filters)
+            st.rerun()  # The whole page, so the jobs panel shows the new job
+
+    col_report, col_pdf = st.columns(2)
+    with col_pdf:
+        # The PDF is rendered by a worker; changing the filters meanwhile does not cancel it
+        if st.button("Queue Sales Report (PDF)", key="queue_sales_pdf_button"):
+            submit(db, 'sales_pdf', st.session_state.current_user,
+                   start_date=start_date, end_date=end_date, filters=filters)
+            st.rerun()
+
+    if col_report.button("Generate Sales Report", key="generate_sales_report_button"):
+        session = db.get_session()
+        try:
+            df_sales = sales_detail_frame(session, start_date, end_date, **filters)
+
+            if not df_sales.empty:
+                show_report(df_sales, datetime_format="DD-MM-YYYY HH:mm:ss")
+
+                total_revenue, total_profit = sales_totals(session, start_date, end_date, **filters)
                 
                 st.markdown(f"### Summary for Selected Period:")
                 st.info(f"Total Revenue: **PKR {total_revenue:.2f}**")
                 st.success(f"Total Profit: **PKR {total_profit:.2f}**")
                 
                 st.subheader("Revenue and Profit by Date")
-                df_sales['Total Item Revenue_Numeric'] = df_sales['Total Item Revenue'].str.replace('PKR ', '').astype(float)
-                df_sales['Profit on Item_Numeric'] = df_sales['Profit (Internal)'] 
-                df_sales['Order Date_Daily'] = pd.to_datetime(df_sales['Order Date'], format="%d-%m-%Y %H:%M:%S").dt.date 
-                
-                daily_summary = df_sales.groupby('Order Date_Daily').agg(
-                    Total_Revenue=('Total Item Revenue_Numeric', 'sum'),
-                    Total_Profit=('Profit on Item_Numeric', 'sum')
-                ).reset_index()
-
-                daily_summary['Total_Revenue'] = pd.to_numeric(daily_summary['Total_Revenue'])
-                daily_summary['Total_Profit'] = pd.to_numeric(daily_summary['Total_Profit'])
-
-                st.line_chart(daily_summary.set_index('Order Date_Daily')[['Total_Revenue', 'Total_Profit']])
-
-                st.markdown("---")
-                st.subheader("Generate Printout (PDF)") 
-
-                pdf_output = create_pdf(df_sales, total_revenue, total_profit, start_date, end_date)
-                # --- ADDED CHECK HERE ---
-                if pdf_output: 
-                    st.download_button(
-                        label="Download Sales Report (PDF)",
-                        data=pdf_output,
-                        file_name=f"sales_report_{start_date.strftime('%d%m%Y')}_to_{end_date.strftime('%d%m%Y')}.pdf",
-                        mime="application/pdf"
-                    )
-                else:
-                    st.error("Failed to generate PDF for the sales report.") # Optional more specific error
+                st.line_chart(daily_sales_frame(session, start_date, end_date, **filters))
             else:
                 st.info("No sales records found for the selected criteria.")
-    finally:
-        session.close()
+        finally:
+            session.close()
+
+
+def show_sales_history():
+    st.title("Comprehensive Sales History")
+    st.subheader("Filter Sales Data")
+    period_filter()
+    customer_filter()
+    product_filter()
+    sales_report()
+
+    # --- Background jobs ---
+    st.markdown("---")
+    st.subheader("Printouts and Exports")
+    jobs_panel(db, ['sales_pdf', 'sales_export'])
 
 if st.session_state.logged_in:
     show_sales_history()
 else:
-    st.warning("Please log in to view sales history.")
\ No newline at end of file
+    st.warning("Please log in to view sales history.")
+
+profile_panel()
\ No newline at end of file
@@ -0,0 +1,197 @@
+# utils/analytics.py
+"""Optional DuckDB read path for the analytical reports.
+
+With INVENTORY_ANALYTICS_ENGINE=duckdb, the scan-heavy report queries
+(sales detail over a date range, bills) are still built and compiled by
+SQLAlchemy, but run by an embedded DuckDB instead of a pooled SQLite
+connection. DuckDB scans and aggregates column-at-a-time, in parallel.
+Indexed lookups (one customer's or product's sales) and the rollup reads
+stay on SQLite, where the indexes are, and so do stock levels, which must
+never lag a sale.
+
+DuckDB reads from one of two sources:
+
+* a snapshot (the default, INVENTORY_ANALYTICS_SNAPSHOT=analytics.duckdb):
+  the report tables are copied into a DuckDB file, so reports scan columnar
+  storage and never open the OLTP file. The copy is rebuilt in the
+  background once it is older than INVENTORY_ANALYTICS_SNAPSHOT_MAX_AGE
+  seconds, so reports can lag writes by that much;
+* live (INVENTORY_ANALYTICS_SNAPSHOT=''): the SQLite file, attached
+  read-only through DuckDB's sqlite extension. Reports see every committed
+  write, but each query re-reads the rows it needs from the SQLite pages,
+  so only the large group-bys come out ahead of the ORM.
+
+Results still go through the shared query cache, keyed by the snapshot
+they were read from, so a refresh is never hidden behind older answers.
+Without the duckdb package or its sqlite extension (installed on first use,
+which needs network access), or for a database that is not SQLite, the ORM
+path is used.
+
+    python -m utils.analytics snapshot [db_url]   # build the snapshot now
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from sqlalchemy.engine import make_url
+import config
+from utils.query_cache import cached_all
+
+# Tables the analytical reports read; the snapshot copies exactly these
+SNAPSHOT_TABLES = ('customers', 'items', 'orders', 'order_items', 'transactions')
+ATTACHED_NAME = 'inventory'
+
+_log = logging.getLogger(__name__)
+
+
+class DuckDBReader:
+    """Runs compiled report queries on DuckDB, over the live SQLite file or a snapshot of it"""
+
+    def __init__(self, sqlite_path, snapshot_path=None, snapshot_max_age=300):
+        import duckdb
+        self._duckdb = duckdb
+        self.sqlite_path = os.path.abspath(sqlite_path)
+        self.snapshot_path = os.path.abspath(snapshot_path) if snapshot_path else None
+        self.snapshot_max_age = snapshot_max_age
+        self.snapshot_built = None  # time.time() of the snapshot in use
+        self._conn = None
+        self._lock = threading.Lock()  # guards swapping self._conn
+        self._building = threading.Lock()  # held while a snapshot is being built
+
+    # --- Sources ---
+    @staticmethod
+    def _load_sqlite_extension(conn):
+        conn.execute("INSTALL sqlite")  # once per machine, downloaded; a no-op afterwards
+        conn.execute("LOAD sqlite")
+
+    def check(self):
+        """Raise duckdb.Error unless the sqlite extension can be installed and loaded"""
+        conn = self._duckdb.connect()
+        try:
+            self._load_sqlite_extension(conn)
+        finally:
+            conn.close()
+
+    def _attach(self, conn, alias):
+        self._load_sqlite_extension(conn)
+        conn.execute(f"ATTACH '{self.sqlite_path}' AS {alias} (TYPE sqlite, READ_ONLY)")
+
+    def _open_live(self):
+        conn = self._duckdb.connect()
+        self._attach(conn, ATTACHED_NAME)
+        return conn
+
+    def refresh_snapshot(self):
+        """Copy the report tables into a new snapshot file and switch queries over to it"""
+        started = time.time()
+        # DuckDB hands out the database already open under a path, so every
+        # build is opened under a name of its own, then moved into place
+        building = f"{self.snapshot_path}.{os.getpid()}.{time.monotonic_ns()}.building"
+        conn = self._duckdb.connect(building)
+        try:
+            self._attach(conn, 'source')
+            for table in SNAPSHOT_TABLES:
+                conn.execute(f"CREATE TABLE {table} AS SELECT * FROM source.{table}")
+        finally:
+            conn.close()
+        snapshot = self._duckdb.connect(building, read_only=True)
+        # Replacing the file leaves queries still reading the old one undisturbed
+        os.replace(building, self.snapshot_path)
+        with self._lock:
+            self._conn, self.snapshot_built = snapshot, started
+        _log.info("Analytics snapshot of %s rebuilt in %.1fs", self.sqlite_path, time.time() - started)
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh_snapshot()
+        except Exception:
+            _log.exception("Analytics snapshot refresh failed; keeping the previous one")
+        finally:
+            self._building.release()
+
+    def _cursor(self):
+        """A cursor of its own for the calling thread; DuckDB connections are not shared between threads"""
+        if self.snapshot_path is None:
+            with self._lock:
+                if self._conn is None:
+                    self._conn = self._open_live()
+                cursor = self._conn.cursor()
+            # Cursors start in DuckDB's own catalog, not the one the connection switched to
+            cursor.execute(f"USE {ATTACHED_NAME}")
+            return cursor
+
+        if self._conn is None:
+            # The first report waits for the snapshot; later ones never do
+            with self._building:
+                if self._conn is None:
+                    self.refresh_snapshot()
+        elif time.time() - self.snapshot_built > self.snapshot_max_age and self._building.acquire(blocking=False):
+            threading.Thread(target=self._refresh_in_background, daemon=True).start()
+        with self._lock:
+            return self._conn.cursor()
+
+    # --- Queries ---
+    def all(self, query):
+        """Rows of a (column, not entity) ORM query, computed by DuckDB"""
+        compiled = query.statement.compile(dialect=query.session.get_bind().dialect)
+        params = [compiled.params[name] for name in compiled.positiontup or ()]
+        cursor = self._cursor()
+        try:
+            return cursor.execute(str(compiled), params).fetchall()
+        finally:
+            cursor.close()
+
+
+def reader_for(db_url, engine=None, snapshot_path=None, snapshot_max_age=None):
+    """A DuckDBReader for the database if the DuckDB engine is configured and usable, else None"""
+    if (engine or config.ANALYTICS_ENGINE) != 'duckdb':
+        return None
+    url = make_url(db_url)
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        _log.warning("The DuckDB analytics engine needs a SQLite database file; using the ORM for reports.")
+        return None
+    try:
+        reader = DuckDBReader(
+            url.database,
+            snapshot_path=config.ANALYTICS_SNAPSHOT if snapshot_path is None else snapshot_path,
+            snapshot_max_age=config.ANALYTICS_SNAPSHOT_MAX_AGE if snapshot_max_age is None else snapshot_max_age,
+        )
+    except ImportError:
+        _log.warning("INVENTORY_ANALYTICS_ENGINE=duckdb but the duckdb package is not installed; "
+                     "using the ORM for reports.")
+        return None
+    try:
+        reader.check()
+    except reader._duckdb.Error as e:
+        _log.warning("DuckDB cannot load its sqlite extension (%s); using the ORM for reports.", e)
+        return None
+    return reader
+
+
+def install(reader, session_factory):
+    """Make `reader` available to report_all() through sessions from `session_factory`"""
+    info = dict(session_factory.kw.get('info') or {})
+    info['analytics'] = reader
+    session_factory.configure(info=info)
+
+
+def report_all(query):
+    """cached_all(query), computed by DuckDB when the analytics engine is on"""
+    reader = query.session.info.get('analytics')
+    if reader is None:
+        return cached_all(query)
+    return cached_all(query, load=lambda: reader.all(query), source=('duckdb', reader.snapshot_built))
+
+
+if __name__ == "__main__":
+    from database import Database
+    if len(sys.argv) < 2 or sys.argv[1] != 'snapshot':
+        sys.exit("Usage: python -m utils.analytics snapshot [db_url]")
+    db_url = sys.argv[2] if len(sys.argv) > 2 else config.DATABASE_URL
+    Database(db_url).migrate()
+    reader = reader_for(db_url, engine='duckdb', snapshot_path=config.ANALYTICS_SNAPSHOT or 'analytics.duckdb')
+    if reader is None:
+        sys.exit(1)
+    reader.refresh_snapshot()
+    print(f"Wrote {reader.snapshot_path}")
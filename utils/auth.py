@@ -0,0 +1,128 @@
+# utils/auth.py
+"""Password hashing and login checks.
+
+bcrypt runs on a small shared thread pool (AUTH_WORKERS threads per server
+process) instead of in the page script's thread. bcrypt releases the GIL,
+so a burst of logins at shift start is limited to that many cores and
+everyone else's page reruns keep going.
+
+New hashes use BCRYPT_ROUNDS. A stored hash with a lower cost is re-hashed
+at the current cost after a successful login. After LOGIN_MAX_FAILURES
+failed attempts on one username within LOGIN_FAILURE_WINDOW seconds, further
+attempts are refused without running bcrypt at all.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from sqlalchemy import update
+import config
+from database import User
+
+_pool = ThreadPoolExecutor(max_workers=max(config.AUTH_WORKERS, 1), thread_name_prefix="auth")
+
+
+class LoginThrottled(Exception):
+    """Raised when a username has too many recent failed logins"""
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"Too many failed attempts; try again in {retry_after} seconds")
+
+
+class FailureThrottle:
+    """Sliding-window count of failed logins per username, held in memory"""
+
+    def __init__(self, max_failures, window, max_tracked=10000):
+        self.max_failures = max_failures
+        self.window = window
+        self.max_tracked = max_tracked
+        self._failures = {}  # username -> deque of failure times
+        self._lock = threading.Lock()
+
+    def _recent(self, username, now):
+        failures = self._failures.get(username)
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        return failures
+
+    def check(self, username):
+        """Raise LoginThrottled if `username` is over its failure budget"""
+        now = time.monotonic()
+        with self._lock:
+            failures = self._recent(username, now)
+            if failures and len(failures) >= self.max_failures:
+                raise LoginThrottled(int(failures[0] + self.window - now) + 1)
+
+    def record_failure(self, username):
+        now = time.monotonic()
+        with self._lock:
+            if username not in self._failures and len(self._failures) >= self.max_tracked:
+                self._prune(now)
+            failures = self._recent(username, now)
+            if failures is None:
+                failures = self._failures[username] = deque()
+            failures.append(now)
+
+    def reset(self, username):
+        with self._lock:
+            self._failures.pop(username, None)
+
+    def _prune(self, now):
+        for username in list(self._failures):
+            if not self._recent(username, now):
+                del self._failures[username]
+
+
+_throttle = FailureThrottle(config.LOGIN_MAX_FAILURES, config.LOGIN_FAILURE_WINDOW)
+
+
+# --- Hashing ---
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(password, hashed_password):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+def hash_cost(hashed_password):
+    """The cost factor stored in a bcrypt hash ($2b$12$... -> 12)"""
+    return int(hashed_password.split('$')[2])
+
+
+def hash_password(password, rounds=None):
+    """Hash on the auth pool at `rounds` (default BCRYPT_ROUNDS)"""
+    return _pool.submit(_hash, password, rounds or config.BCRYPT_ROUNDS).result()
+
+
+def check_password(password, hashed_password):
+    """Verify on the auth pool"""
+    return _pool.submit(_check, password, hashed_password).result()
+
+
+# --- Login ---
+def authenticate(db, username, password, throttle=_throttle):
+    """Return True if the credentials match, upgrading the stored hash's cost if needed.
+
+    Raises LoginThrottled, before any hashing, when the username has had too
+    many recent failures. Unknown usernames count as failures too.
+    """
+    throttle.check(username)
+
+    session = db.get_session()
+    try:
+        user = session.query(User).filter_by(username=username).first()
+        if user is None or not check_password(password, user.password):
+            throttle.record_failure(username)
+            return False
+
+        throttle.reset(username)
+        if hash_cost(user.password) < config.BCRYPT_ROUNDS:
+            upgraded, user_id = hash_password(password), user.id
+            db.run_write(lambda write: write.execute(
+                update(User).where(User.id == user_id).values(password=upgraded)))
+        return True
+    finally:
+        session.close()
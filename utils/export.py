@@ -0,0 +1,68 @@
+# utils/export.py
+"""Streaming export of sales history lines to CSV or Parquet.
+
+The sales join is read with `yield_per`, so rows arrive from the database
+in fixed-size partitions, and each partition is written out and dropped
+before the next is fetched. Memory stays flat however long the date range
+is. Exports run as background jobs (utils/jobs.py), which write straight to
+the job's output file and offer it on the Sales History page.
+"""
+import pandas as pd
+from utils.reports import SALES_DETAIL_COLUMNS, sales_detail_query
+
+EXPORT_CHUNK_SIZE = 5000
+
+# Format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def iter_sales_chunks(session, start_date, end_date, chunk_size=EXPORT_CHUNK_SIZE, **filters):
+    """Yield the filtered sales lines as typed DataFrames of at most `chunk_size` rows"""
+    statement = sales_detail_query(session, start_date, end_date, **filters).statement
+    result = session.execute(statement.execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        yield pd.DataFrame(partition, columns=list(SALES_DETAIL_COLUMNS))
+
+
+def write_csv(chunks, out):
+    header = True
+    for chunk in chunks:
+        out.write(chunk.to_csv(index=False, header=header, date_format="%Y-%m-%d %H:%M:%S").encode("utf-8"))
+        header = False
+    if header:
+        out.write(",".join(SALES_DETAIL_COLUMNS).encode("utf-8") + b"\n")
+
+
+def write_parquet(chunks, out):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export needs the pyarrow package; export as CSV instead.")
+
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(out, table.schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+        if writer is None:
+            empty = pd.DataFrame(columns=list(SALES_DETAIL_COLUMNS))
+            pq.write_table(pa.Table.from_pandas(empty, preserve_index=False), out)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+WRITERS = {"CSV": write_csv, "Parquet": write_parquet}
+
+
+def export_file_name(export_format, start_date, end_date):
+    extension, _ = EXPORT_FORMATS[export_format]
+    return f"sales_export_{start_date.strftime('%d%m%Y')}_to_{end_date.strftime('%d%m%Y')}.{extension}"
@@ -0,0 +1,68 @@
+# utils/grid.py
+"""Server-side paginated, searchable and sortable table for Streamlit pages.
+
+Search, sort and paging are pushed down into SQL, so only the rows on the
+current page are loaded, and only the columns being shown. Counts and pages
+go through the shared query cache.
+"""
+import math
+import streamlit as st
+from sqlalchemy import or_
+from utils.query_cache import cached_all, cached_count
+from utils.reports import typed_frame, column_config as typed_column_config
+
+DEFAULT_PAGE_SIZE = 25
+
+
+def data_grid(key, query, columns, search_columns=(), tiebreaker=None, page_size=DEFAULT_PAGE_SIZE,
+              column_config=None, empty_message="No rows found"):
+    """Render one page of `query` as a dataframe.
+
+    `columns` maps display labels to column expressions; the first one is
+    the default sort. `search_columns` are matched with a case-insensitive
+    substring search. `tiebreaker` (usually the primary key) keeps the page
+    order stable when the sort column has duplicates. Money and dates get
+    the shared report formats; `column_config` entries override them. Widget
+    state lives under `key`. Returns the total number of matching rows.
+    """
+    labels = list(columns)
+
+    col_search, col_sort, col_dir = st.columns([3, 2, 1])
+    with col_search:
+        search = st.text_input("Search", key=f"{key}_search", disabled=not search_columns)
+    with col_sort:
+        sort_label = st.selectbox("Sort by", labels, key=f"{key}_sort")
+    with col_dir:
+        descending = st.toggle("Descending", key=f"{key}_desc")
+
+    if search and search_columns:
+        query = query.filter(or_(*[column.ilike(f"%{search}%") for column in search_columns]))
+
+    total = cached_count(query.order_by(None))
+    if total == 0:
+        st.info(empty_message if not search else f"Nothing matches '{search}'.")
+        return 0
+
+    # Clamp a page number left over from a wider search before the widget reads it
+    pages = math.ceil(total / page_size)
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+
+    sort_column = columns[sort_label]
+    order = [sort_column.desc() if descending else sort_column.asc()]
+    if tiebreaker is not None:
+        order.append(tiebreaker.desc() if descending else tiebreaker.asc())
+
+    page = st.session_state.get(page_key, 1)
+    rows = cached_all(query.with_entities(*columns.values()).order_by(*order).limit(page_size).offset((page - 1) * page_size))
+    frame = typed_frame(rows, labels)
+    st.dataframe(frame, column_config={**typed_column_config(frame), **(column_config or {})}, hide_index=True)
+
+    col_page, col_info = st.columns([1, 3])
+    with col_page:
+        st.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+    with col_info:
+        first = (page - 1) * page_size + 1
+        st.caption(f"Showing {first}-{first + len(rows) - 1} of {total}")
+    return total
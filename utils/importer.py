@@ -0,0 +1,251 @@
+# utils/importer.py
+"""Bulk import of products and customers from CSV or Excel files.
+
+Uploads are read in chunks of CHUNK_SIZE rows and never held in memory as
+a whole. Each chunk is validated with column-wide pandas checks, then
+upserted in one short transaction: rows whose key (product name, or
+customer name plus phone) already exists are updated, the rest are
+inserted, each with a single executemany. Because every chunk commits on
+its own, an import that fails part way can simply be run again.
+
+Optional columns (a product's reorder level and reorder quantity) may be
+left out of the file or blank in a row: a new row then gets the column's
+default and an existing one keeps its value.
+
+Rejected rows are collected with their row number in the file and the reason, and
+can be downloaded as a CSV error file.
+"""
+import pandas as pd
+import streamlit as st
+from sqlalchemy import func, insert, select, tuple_, update
+from database import Customer, Item
+
+CHUNK_SIZE = 1000
+
+# Field -> kind; kind is text, int or money. Text limits follow the column sizes.
+# Optional fields are numeric and may be missing or blank.
+IMPORTERS = {
+    "Products": {
+        "model": Item,
+        "fields": {"name": "text", "quantity": "int", "cost_price": "money", "selling_price": "money"},
+        "optional": {"reorder_level": "int", "reorder_quantity": "int"},
+        "keys": ("name",),
+        "max_lengths": {"name": 100},
+    },
+    "Customers": {
+        "model": Customer,
+        "fields": {"name": "text", "phone": "text", "address": "text"},
+        "keys": ("name", "phone"),
+        "max_lengths": {"name": 100, "phone": 20},
+    },
+}
+
+
+def _normalize_header(name):
+    return str(name).strip().lower().replace(" ", "_")
+
+
+# --- Reading ---
+def _csv_chunks(upload, chunk_size):
+    reader = pd.read_csv(upload, dtype=str, keep_default_na=False, chunksize=chunk_size)
+    for chunk in reader:
+        yield chunk, upload.tell() / max(upload.size, 1)
+
+
+def _excel_chunks(upload, chunk_size):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ValueError("Excel import needs the openpyxl package; upload a CSV file instead.")
+
+    workbook = openpyxl.load_workbook(upload, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        total = max((sheet.max_row or 1) - 1, 1)
+        batch, done = [], 0
+        for row in rows:
+            batch.append(["" if value is None else str(value) for value in row])
+            if len(batch) == chunk_size:
+                done += len(batch)
+                yield pd.DataFrame(batch, columns=header), done / total
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header), 1.0
+    finally:
+        workbook.close()
+
+
+def read_chunks(upload, chunk_size=CHUNK_SIZE):
+    """Yield (DataFrame of raw strings, fraction of the file read) per chunk"""
+    if upload.name.lower().endswith((".xlsx", ".xlsm")):
+        chunks = _excel_chunks(upload, chunk_size)
+    else:
+        chunks = _csv_chunks(upload, chunk_size)
+    for chunk, progress in chunks:
+        chunk.columns = [_normalize_header(c) for c in chunk.columns]
+        yield chunk, min(progress, 1.0)
+
+
+# --- Validation ---
+def validate_chunk(chunk, spec, first_row):
+    """Split a chunk into (clean typed frame, list of error dicts)"""
+    errors = []
+    rows = pd.RangeIndex(first_row, first_row + len(chunk))
+    chunk = chunk.set_axis(rows)
+    bad = pd.Series(False, index=rows)
+    clean = pd.DataFrame(index=rows)
+    optional = {field: kind for field, kind in spec.get("optional", {}).items() if field in chunk.columns}
+
+    for field, kind in {**spec["fields"], **optional}.items():
+        raw = chunk[field].astype(str).str.strip()
+        if kind == "text":
+            value = raw
+            reasons = pd.Series("", index=rows).mask(value == "", "is required")
+            limit = spec["max_lengths"].get(field)
+            if limit:
+                reasons = reasons.mask((reasons == "") & (value.str.len() > limit), f"is longer than {limit} characters")
+        else:
+            value = pd.to_numeric(raw, errors="coerce")
+            reasons = pd.Series("", index=rows).mask(value.isna(), "is not a number")
+            if field in optional:
+                reasons = reasons.mask(raw == "", "")
+            reasons = reasons.mask((reasons == "") & (value < 0), "is negative")
+            if kind == "int":
+                reasons = reasons.mask((reasons == "") & value.notna() & (value % 1 != 0), "is not a whole number")
+        failed = reasons != ""
+        for row in rows[failed.to_numpy()]:
+            errors.append({"row": row, "field": field, "value": chunk.at[row, field], "error": f"{field} {reasons[row]}"})
+        bad |= failed
+        clean[field] = value
+    errors.sort(key=lambda error: error["row"])
+
+    clean = clean[~bad]
+    for field, kind in spec["fields"].items():
+        if kind == "int":
+            clean[field] = clean[field].astype("int64")
+    for field, kind in optional.items():
+        if kind == "int":
+            clean[field] = clean[field].astype("Int64")
+    return clean, errors
+
+
+# --- Writing ---
+def _existing_ids(session, model, keys, clean):
+    """Map each key in the chunk to the id of the row it updates (the oldest, if duplicated)"""
+    key_columns = [getattr(model, k) for k in keys]
+    values = list(clean[list(keys)].itertuples(index=False, name=None))
+    if len(keys) == 1:
+        match = key_columns[0].in_([v[0] for v in values])
+    else:
+        match = tuple_(*key_columns).in_(values)
+    rows = session.execute(
+        select(*key_columns, func.min(model.id)).where(match).group_by(*key_columns)
+    ).all()
+    return {tuple(row[:-1]): row[-1] for row in rows}
+
+
+def upsert_chunk(session, spec, clean):
+    """Insert or update the chunk's rows; returns (inserted, updated). The caller commits."""
+    model, keys = spec["model"], spec["keys"]
+    clean = clean.drop_duplicates(subset=list(keys), keep="last")
+    existing = _existing_ids(session, model, keys, clean)
+
+    new_rows, changed_rows = [], []
+    for record in clean.to_dict("records"):
+        # A blank optional value is left out: the default on insert, unchanged on update
+        for field in spec.get("optional", ()):
+            if field in record and pd.isna(record[field]):
+                del record[field]
+        row_id = existing.get(tuple(record[k] for k in keys))
+        if row_id is None:
+            new_rows.append(record)
+        else:
+            changed_rows.append(dict(record, id=row_id))
+
+    if new_rows:
+        session.execute(insert(model), new_rows)
+    if changed_rows:
+        session.execute(update(model), changed_rows)
+    return len(new_rows), len(changed_rows)
+
+
+def import_file(db, kind, upload, chunk_size=CHUNK_SIZE, on_progress=None):
+    """Import an uploaded CSV or Excel file of `kind` ("Products" or "Customers").
+
+    Returns a dict with rows, inserted, updated and failed counts and the
+    list of row errors. Raises ValueError if required columns are missing.
+    """
+    spec = IMPORTERS[kind]
+    result = {"rows": 0, "inserted": 0, "updated": 0, "failed": 0, "errors": []}
+    first_row = 2  # row 1 is the header
+    for chunk, progress in read_chunks(upload, chunk_size):
+        missing = [f for f in spec["fields"] if f not in chunk.columns]
+        if missing:
+            raise ValueError(f"Missing column(s): {', '.join(missing)}")
+
+        clean, errors = validate_chunk(chunk, spec, first_row)
+        if not clean.empty:
+            # One write transaction per chunk, so other writers get the lock in between
+            inserted, updated = db.run_write(lambda session: upsert_chunk(session, spec, clean))
+            result["inserted"] += inserted
+            result["updated"] += updated
+        result["errors"].extend(errors)
+        result["rows"] += len(chunk)
+        result["failed"] += len(chunk) - len(clean)
+        first_row += len(chunk)
+        if on_progress:
+            on_progress(progress, result)
+    return result
+
+
+def error_file(errors):
+    """CSV bytes listing each rejected row's number, field, value and reason"""
+    return pd.DataFrame(errors, columns=["row", "field", "value", "error"]).to_csv(index=False).encode("utf-8")
+
+
+def template_file(kind):
+    """CSV bytes with just the header row for `kind`, optional columns included"""
+    return (",".join([*IMPORTERS[kind]["fields"], *IMPORTERS[kind].get("optional", ())]) + "\n").encode("utf-8")
+
+
+# --- UI ---
+def import_panel(db, kind):
+    """Upload widget, progress bar and result summary for importing `kind`"""
+    fields = ", ".join(IMPORTERS[kind]["fields"])
+    optional = ", ".join(IMPORTERS[kind].get("optional", ()))
+    if optional:
+        fields += f"; optional: {optional} (blank keeps the default or current value)"
+    st.caption(f"Columns: {fields}. Existing {kind.lower()} with the same "
+               f"{' and '.join(IMPORTERS[kind]['keys'])} are updated; the rest are added.")
+    st.download_button("Download CSV Template", data=template_file(kind), file_name=f"{kind.lower()}_template.csv",
+                       mime="text/csv", key=f"{kind}_import_template", on_click="ignore")
+
+    upload = st.file_uploader("CSV or Excel file", type=["csv", "xlsx", "xlsm"], key=f"{kind}_import_file")
+    if upload is None or not st.button(f"Import {kind}", key=f"{kind}_import_button"):
+        return
+
+    progress_bar = st.progress(0.0, text="Starting import...")
+
+    def on_progress(fraction, result):
+        progress_bar.progress(fraction, text=f"{result['rows']} rows read, {result['failed']} rejected")
+
+    try:
+        result = import_file(db, kind, upload, on_progress=on_progress)
+    except ValueError as e:
+        st.error(str(e))
+        return
+    except Exception as e:
+        st.error(f"Import stopped: {str(e)}. Rows already imported were kept; re-running the file is safe.")
+        return
+
+    progress_bar.progress(1.0, text="Import finished")
+    st.success(f"{result['inserted']} added, {result['updated']} updated, {result['failed']} rejected "
+               f"out of {result['rows']} rows.")
+    if result["errors"]:
+        st.download_button("Download Error File", data=error_file(result["errors"]),
+                           file_name=f"{kind.lower()}_import_errors.csv", mime="text/csv",
+                           key=f"{kind}_import_errors", on_click="ignore")
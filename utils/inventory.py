@@ -0,0 +1,90 @@
+# utils/inventory.py
+"""Dashboard stock totals backed by the inventory_summary table.
+
+The single summary row is kept current by triggers on `items` (see
+migrations 4 and 7), so any insert, stock or reorder level change or delete
+updates it inside the writer's own transaction and the dashboard reads three numbers instead of
+scanning the catalog.
+
+    python -m utils.inventory verify [db_url]    # exit 1 if the totals drifted
+    python -m utils.inventory rebuild [db_url]   # recompute from scratch
+"""
+import sys
+from sqlalchemy import select, insert, update, func
+from database import Database, InventorySummary, Item
+
+SUMMARY_ID = 1
+SUMMARY_FIELDS = ('total_products', 'total_units', 'low_stock_items')
+
+
+def _computed_totals():
+    """Scalar subqueries that compute each total from the items table"""
+    return {
+        'total_products': select(func.count(Item.id)).scalar_subquery(),
+        'total_units': select(func.coalesce(func.sum(Item.quantity), 0)).scalar_subquery(),
+        'low_stock_items': select(func.count(Item.id)).where(Item.quantity <= Item.reorder_level).scalar_subquery(),
+    }
+
+
+def read_summary(session):
+    """Return the maintained totals as a dict"""
+    row = session.execute(
+        select(*[getattr(InventorySummary, f) for f in SUMMARY_FIELDS]).where(InventorySummary.id == SUMMARY_ID)
+    ).one_or_none()
+    if row is None:
+        return compute_summary(session)
+    return dict(zip(SUMMARY_FIELDS, row))
+
+
+def compute_summary(session):
+    """Recompute the totals from the items table"""
+    totals = _computed_totals()
+    row = session.execute(select(*[totals[f] for f in SUMMARY_FIELDS])).one()
+    return dict(zip(SUMMARY_FIELDS, row))
+
+
+def ensure_summary_row(conn):
+    """Insert the summary row, zeroed, if it is missing"""
+    exists = conn.execute(select(InventorySummary.id).where(InventorySummary.id == SUMMARY_ID)).first()
+    if exists is None:
+        conn.execute(insert(InventorySummary).values(id=SUMMARY_ID, total_products=0, total_units=0, low_stock_items=0))
+
+
+def rebuild_summary(conn):
+    """Overwrite the summary row with freshly computed totals.
+
+    A single UPDATE with subqueries, so the totals are consistent with the
+    items table at the moment it runs. Works on a Connection or a Session;
+    the caller commits.
+    """
+    ensure_summary_row(conn)
+    conn.execute(update(InventorySummary).where(InventorySummary.id == SUMMARY_ID).values(**_computed_totals()))
+
+
+def verify_summary(session):
+    """Return {field: (maintained, actual)} for every total that has drifted"""
+    maintained = read_summary(session)
+    actual = compute_summary(session)
+    return {f: (maintained[f], actual[f]) for f in SUMMARY_FIELDS if maintained[f] != actual[f]}
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'verify'
+    db = Database(sys.argv[2] if len(sys.argv) > 2 else None)
+    db.migrate()
+    session = db.get_session()
+    try:
+        if command == 'rebuild':
+            rebuild_summary(session)
+            session.commit()
+            print("Inventory summary rebuilt:", read_summary(session))
+        elif command == 'verify':
+            drift = verify_summary(session)
+            for field, (maintained, actual) in drift.items():
+                print(f"{field}: summary has {maintained}, items table has {actual}")
+            print("Inventory summary is consistent." if not drift else "Run 'rebuild' to repair.")
+            sys.exit(1 if drift else 0)
+        else:
+            sys.exit(f"Unknown command '{command}', expected 'verify' or 'rebuild'")
+    finally:
+        session.close()
@@ -0,0 +1,417 @@
+# utils/jobs.py
+"""Background jobs for the PDF reports and sales exports.
+
+A page queues a job as a row in the jobs table and returns at once. Worker
+processes claim queued jobs oldest first, write the output to
+JOB_OUTPUT_DIR and mark the job done. The page polls its user's jobs and
+offers the file for download. Reports therefore no longer run inside a
+page rerun, so touching a widget does not throw the work away, and several
+month-end reports run at once on the workers instead of on the cashiers'
+server threads.
+
+The app starts JOB_WORKERS workers alongside itself (see utils/session.py).
+With JOB_WORKERS=0 they can be run separately, as many as needed, even on
+another machine sharing the database:
+
+    python -m utils.jobs worker [db_url]   # run one worker until stopped
+    python -m utils.jobs list [db_url]     # show the 20 most recent jobs
+
+A claim is a conditional UPDATE, so two workers never run the same job.
+Running jobs write a heartbeat every few seconds. A job whose heartbeat is
+older than JOB_STALE_SECONDS lost its worker and is queued again, up to
+JOB_MAX_ATTEMPTS runs in all. Queuing a job the user already has queued,
+running or finished within JOB_REUSE_SECONDS, with the same parameters,
+returns that job instead. Finished jobs and their files are deleted
+after JOB_RETENTION_HOURS. Workers also delete expired stock holds (see
+utils/reservations.py).
+"""
+import atexit
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+import streamlit as st
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.engine import make_url
+import config
+from database import Database, Job
+from utils.export import EXPORT_FORMATS, WRITERS, export_file_name, iter_sales_chunks
+from utils.pdf import sales_report_pdf, transaction_report_pdf
+from utils.reports import sales_detail_frame, transaction_summary_frame
+from utils.reservations import sweep_expired
+
+ACTIVE_STATUSES = ('queued', 'running')
+HEARTBEAT_SECONDS = 2
+PANEL_JOBS = 5  # recent jobs listed per panel
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_log = logging.getLogger(__name__)
+
+
+# --- Job kinds ---
+# Each runner gets (session, params, out, status), writes the file to the
+# binary file `out` and returns (download file name, MIME type). Calling
+# status(progress=..., message=...) updates what the page shows.
+def _dates(params):
+    return date.fromisoformat(params['start_date']), date.fromisoformat(params['end_date'])
+
+
+def _period(start, end):
+    return f"{start.strftime('%d%m%Y')}_to_{end.strftime('%d%m%Y')}"
+
+
+def run_sales_pdf(session, params, out, status):
+    start, end = _dates(params)
+    status(message="Reading sales lines")
+    frame = sales_detail_frame(session, start, end, **params['filters'])
+    status(progress=0.0, message=f"Rendering {len(frame):,} lines")
+    out.write(sales_report_pdf(frame, start, end, progress=lambda fraction: status(progress=fraction)))
+    return f"sales_report_{_period(start, end)}.pdf", "application/pdf"
+
+
+def run_transaction_pdf(session, params, out, status):
+    start, end = _dates(params)
+    status(message="Reading transactions")
+    frame = transaction_summary_frame(session, start, end)
+    status(progress=0.0, message=f"Rendering {len(frame):,} transactions")
+    out.write(transaction_report_pdf(frame, start, end, progress=lambda fraction: status(progress=fraction)))
+    return f"transaction_summary_{_period(start, end)}.pdf", "application/pdf"
+
+
+def run_sales_export(session, params, out, status):
+    start, end = _dates(params)
+    export_format = params['format']
+
+    def counted(chunks):
+        written = 0
+        for chunk in chunks:
+            yield chunk
+            written += len(chunk)
+            status(message=f"{written:,} lines written")
+
+    WRITERS[export_format](counted(iter_sales_chunks(session, start, end, **params['filters'])), out)
+    return export_file_name(export_format, start, end), EXPORT_FORMATS[export_format][1]
+
+
+# Kind -> (label shown on the page, runner)
+JOB_KINDS = {
+    'sales_pdf': ("Sales Report (PDF)", run_sales_pdf),
+    'transaction_pdf': ("Transaction Summary (PDF)", run_transaction_pdf),
+    'sales_export': ("Sales Export", run_sales_export),
+}
+
+
+# --- Queueing ---
+def reusable_job(session, kind, requested_by, params, now=None):
+    """The user's newest identical job that is queued, running, or done within JOB_REUSE_SECONDS, or None.
+
+    `params` is the JSON the job was queued with.
+    """
+    fresh_since = (now or datetime.utcnow()) - timedelta(seconds=config.JOB_REUSE_SECONDS)
+    return session.query(Job).filter(
+        Job.requested_by == requested_by, Job.kind == kind, Job.params == params,
+        or_(Job.status.in_(ACTIVE_STATUSES), and_(Job.status == 'done', Job.finished_at >= fresh_since))
+    ).order_by(Job.id.desc()).first()
+
+
+def submit(db, kind, requested_by=None, **params):
+    """Queue a job and return its id; dates in `params` are stored as ISO strings.
+
+    Asking again for a report already queued, running or just finished
+    returns that job's id instead of rendering it once more.
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind '{kind}'")
+    params = json.dumps(params, default=str, sort_keys=True)
+
+    def write(session):
+        existing = reusable_job(session, kind, requested_by, params)
+        if existing is not None and (existing.status != 'done' or os.path.exists(existing.result_path)):
+            return existing.id
+        job = Job(kind=kind, params=params, requested_by=requested_by, message="Waiting for a worker")
+        session.add(job)
+        session.flush()
+        return job.id
+
+    return db.run_write(write)
+
+
+def recent_jobs(session, requested_by, kinds, limit=PANEL_JOBS):
+    """A user's most recent jobs of `kinds`, newest first.
+
+    Read straight from the database, not the query cache: the workers'
+    commits happen in other processes and never invalidate it.
+    """
+    return session.query(Job).filter(Job.requested_by == requested_by, Job.kind.in_(kinds)).order_by(
+        Job.id.desc()).limit(limit).all()
+
+
+# --- Running ---
+class _JobStatus:
+    """Progress and message of the running job, written with a heartbeat every HEARTBEAT_SECONDS"""
+
+    def __init__(self, db, job_id):
+        self.db = db
+        self.job_id = job_id
+        self.progress = None
+        self.message = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, daemon=True, name=f"job-{job_id}-heartbeat")
+
+    def __call__(self, progress=None, message=None):
+        if progress is not None:
+            self.progress = progress
+        if message is not None:
+            self.message = message
+
+    def _beat(self):
+        while not self._stop.wait(HEARTBEAT_SECONDS):
+            try:
+                _update(self.db, self.job_id, progress=self.progress, message=self.message,
+                        heartbeat_at=datetime.utcnow())
+            except Exception:
+                _log.exception("Heartbeat of job %s failed", self.job_id)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _update(db, job_id, **values):
+    """Set `values` on a job this worker is running; False if it no longer is"""
+    return bool(db.run_write(lambda session: session.execute(
+        update(Job).where(Job.id == job_id, Job.status == 'running').values(**values)
+        .execution_options(synchronize_session=False)
+    ).rowcount))
+
+
+def queued_ids(session, limit=5):
+    """Ids of the oldest queued jobs, through ix_jobs_status"""
+    return session.execute(select(Job.id).where(Job.status == 'queued').order_by(Job.id).limit(limit)).scalars().all()
+
+
+def claim_next(db, worker):
+    """Mark the oldest queued job as running and return (id, kind, params), or None if there is none"""
+    # Reading first keeps idle workers from taking the write lock on every poll
+    session = db.get_session()
+    try:
+        queued = queued_ids(session)
+    finally:
+        session.close()
+    for job_id in queued:
+        now = datetime.utcnow()
+        claimed = db.run_write(lambda write: write.execute(
+            update(Job).where(Job.id == job_id, Job.status == 'queued').values(
+                status='running', started_at=now, heartbeat_at=now, attempts=Job.attempts + 1,
+                progress=None, message=f"Started by {worker}"
+            ).returning(Job.id, Job.kind, Job.params).execution_options(synchronize_session=False)
+        ).first())
+        if claimed is not None:
+            return claimed
+    return None
+
+
+def run_job(db, job_id, kind, params, output_dir):
+    """Run one claimed job to completion, recording the file or the error on its row"""
+    _, runner = JOB_KINDS[kind]
+    partial = os.path.join(output_dir, f"job_{job_id}.part")
+    session = db.get_session()
+    try:
+        with _JobStatus(db, job_id) as status, open(partial, 'wb') as out:
+            file_name, mime = runner(session, json.loads(params), out, status)
+        result_path = os.path.join(output_dir, f"job_{job_id}{os.path.splitext(file_name)[1]}")
+        os.replace(partial, result_path)
+        _update(db, job_id, status='done', progress=1.0, message=None, finished_at=datetime.utcnow(),
+                result_path=result_path, file_name=file_name, mime=mime)
+    except Exception as e:
+        _log.exception("Job %s (%s) failed", job_id, kind)
+        _update(db, job_id, status='failed', message=None, finished_at=datetime.utcnow(), error=str(e))
+    finally:
+        session.close()
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+def requeue_stale(db, now=None):
+    """Queue running jobs whose worker stopped sending heartbeats again, or fail them after JOB_MAX_ATTEMPTS"""
+    now = now or datetime.utcnow()
+    stale = (Job.status == 'running') & (Job.heartbeat_at < now - timedelta(seconds=config.JOB_STALE_SECONDS))
+
+    def write(session):
+        session.execute(update(Job).where(stale, Job.attempts < config.JOB_MAX_ATTEMPTS).values(
+            status='queued', message="Queued again: its worker stopped responding"
+        ).execution_options(synchronize_session=False))
+        session.execute(update(Job).where(stale).values(
+            status='failed', finished_at=now, message=None, error="The worker running this job stopped responding."
+        ).execution_options(synchronize_session=False))
+
+    db.run_write(write)
+
+
+def purge_finished(db, output_dir, now=None):
+    """Delete jobs that finished more than JOB_RETENTION_HOURS ago, with their files"""
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=config.JOB_RETENTION_HOURS)
+
+    def write(session):
+        expired = session.query(Job).filter(Job.status.in_(('done', 'failed')), Job.finished_at < cutoff).all()
+        for job in expired:
+            session.delete(job)
+        return [job.result_path for job in expired]
+
+    result_paths = db.run_write(write)
+    for path in result_paths:
+        if path and os.path.exists(path):
+            os.remove(path)
+    return len(result_paths)
+
+
+def worker_loop(db_url=None, output_dir=None, poll_seconds=None, stop=None):
+    """Claim and run jobs until `stop` is set, the process is terminated, or the app that started it exits"""
+    db = Database(db_url, query_cache_bytes=0)
+    output_dir = output_dir or config.JOB_OUTPUT_DIR
+    poll_seconds = config.JOB_POLL_SECONDS if poll_seconds is None else poll_seconds
+    stop = stop or threading.Event()
+    worker = f"worker {os.getpid()}"
+    parent = int(os.environ.get('INVENTORY_JOB_PARENT_PID', 0))
+    os.makedirs(output_dir, exist_ok=True)
+    last_maintenance = last_sweep = 0.0
+
+    while not stop.is_set():
+        if parent and os.getppid() != parent:
+            break  # The app that started this worker is gone
+        if time.monotonic() - last_maintenance > config.JOB_STALE_SECONDS:
+            requeue_stale(db)
+            purge_finished(db, output_dir)
+            last_maintenance = time.monotonic()
+        if time.monotonic() - last_sweep > config.RESERVATION_SWEEP_SECONDS:
+            sweep_expired(db)
+            last_sweep = time.monotonic()
+
+        claimed = claim_next(db, worker)
+        if claimed is None:
+            stop.wait(poll_seconds)
+            continue
+        job_id, kind, params = claimed
+        try:
+            run_job(db, job_id, kind, params, output_dir)
+        except SystemExit:
+            # Stopped mid-job: hand it straight back instead of waiting for it to go stale
+            _update(db, job_id, status='queued', attempts=Job.attempts - 1, message="Queued again: worker stopped")
+            raise
+    db.engine.dispose()
+
+
+def start_workers(db_url, count):
+    """Start `count` worker processes for this app process; they are terminated when it exits"""
+    url = make_url(db_url)
+    if count <= 0:
+        return []
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        _log.warning("Background jobs need a database file the workers can open; no workers started.")
+        return []
+    env = dict(os.environ, INVENTORY_DATABASE_URL=url.render_as_string(hide_password=False),
+               INVENTORY_JOB_PARENT_PID=str(os.getpid()),
+               PYTHONPATH=os.pathsep.join(filter(None, [PROJECT_DIR, os.environ.get('PYTHONPATH')])))
+    processes = [subprocess.Popen([sys.executable, '-m', 'utils.jobs', 'worker'], env=env) for _ in range(count)]
+    atexit.register(stop_workers, processes)
+    return processes
+
+
+def stop_workers(processes, timeout=10):
+    for process in processes:
+        if process.poll() is None:
+            process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+# --- Page panel ---
+def _show_job(job):
+    label, _ = JOB_KINDS[job.kind]
+    st.markdown(f"**{label}** #{job.id}, requested {job.created_at.strftime('%d-%m-%Y %H:%M')}")
+    if job.status == 'queued':
+        st.caption(job.message or "Queued")
+    elif job.status == 'running':
+        if job.progress is not None:
+            st.progress(min(job.progress, 1.0), text=job.message or "Running")
+        else:
+            st.caption(job.message or "Running")
+    elif job.status == 'failed':
+        st.error(f"Failed: {job.error}")
+    elif job.result_path and os.path.exists(job.result_path):
+        st.download_button(
+            label=f"Download {job.file_name}",
+            data=lambda path=job.result_path: open(path, 'rb'),
+            file_name=job.file_name,
+            mime=job.mime,
+            key=f"job_download_{job.id}",
+            on_click="ignore"
+        )
+    else:
+        st.caption("The file has expired; queue the job again.")
+
+
+def _job_list(db, requested_by, kinds):
+    session = db.get_session()
+    try:
+        jobs = recent_jobs(session, requested_by, kinds)
+    finally:
+        session.close()
+    if not jobs:
+        st.caption("No reports or exports queued yet.")
+    for job in jobs:
+        _show_job(job)
+    return jobs
+
+
+def jobs_panel(db, kinds):
+    """The current user's recent jobs of `kinds`, refreshed every JOB_UI_POLL_SECONDS while any is unfinished"""
+    requested_by = st.session_state.get('current_user')
+    session = db.get_session()
+    try:
+        unfinished = session.query(Job.id).filter(Job.requested_by == requested_by, Job.kind.in_(kinds),
+                                                  Job.status.in_(ACTIVE_STATUSES)).first() is not None
+    finally:
+        session.close()
+    if unfinished:
+        # Only the panel reruns while polling; the rest of the page keeps its state
+        st.fragment(_job_list, run_every=config.JOB_UI_POLL_SECONDS)(db, requested_by, kinds)
+    else:
+        _job_list(db, requested_by, kinds)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'worker'
+    db_url = sys.argv[2] if len(sys.argv) > 2 else None
+    if command == 'worker':
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        Database(db_url).migrate()
+        try:
+            worker_loop(db_url)
+        except KeyboardInterrupt:
+            pass
+    elif command == 'list':
+        db = Database(db_url)
+        db.migrate()
+        session = db.get_session()
+        try:
+            for job in session.query(Job).order_by(Job.id.desc()).limit(20):
+                print(f"#{job.id} {job.kind} {job.status} attempts={job.attempts} by={job.requested_by} "
+                      f"created={job.created_at:%Y-%m-%d %H:%M:%S} {job.error or job.message or job.file_name or ''}")
+        finally:
+            session.close()
+    else:
+        sys.exit(f"Unknown command '{command}', expected 'worker' or 'list'")
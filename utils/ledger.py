@@ -0,0 +1,237 @@
+# utils/ledger.py
+"""Customer account ledger: balances, statements and receivables aging.
+
+Every bill and every payment is posted as a ledger entry carrying the
+customer's balance after it, and customer_balances holds each customer's
+current balance. Both are written in the same transaction as the bill or
+payment itself (see finalize_order and record_payment), so a balance is one
+row read and a statement needs only the entries in its own date range.
+
+Aging applies payments to the oldest bills first, so a customer's balance
+is made up of their most recent bills. The report therefore reads one row
+per customer with a balance, plus the bills from the last 90 days. Whatever
+those bills do not cover is over 90 days old.
+
+    python -m utils.ledger verify [db_url]    # exit 1 if any balance drifted
+    python -m utils.ledger rebuild [db_url]   # recompute balances from the entries
+"""
+import sys
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, case, delete, func, insert, literal, select, union_all, update
+from database import Customer, CustomerBalance, Database, LedgerEntry, Transaction
+from utils.queries import day_bounds
+from utils.query_cache import cached_all
+from utils.reports import typed_frame
+
+PAYMENT_MODES = ["Cash", "Cheque", "Bank Transfer"]
+# (label, newest age in days, oldest age in days); anything older is "90+ Days"
+AGING_BUCKETS = (("0-30 Days", 0, 30), ("31-60 Days", 31, 60), ("61-90 Days", 61, 90))
+OVERDUE_BUCKET = "90+ Days"
+# Balances smaller than this are rounding left over from float money
+ZERO_BALANCE = 0.005
+
+STATEMENT_COLUMNS = {
+    "Date": LedgerEntry.date,
+    "Entry": LedgerEntry.entry_type,
+    "Reference": LedgerEntry.reference,
+    "Payment Mode": LedgerEntry.mode,
+    "Debit": LedgerEntry.debit,
+    "Credit": LedgerEntry.credit,
+    "Balance": LedgerEntry.balance,
+}
+
+
+class PaymentError(ValueError):
+    """Raised when a payment cannot be recorded"""
+
+
+# --- Posting ---
+def post_entry(session, customer_id, date, entry_type, debit=0.0, credit=0.0, order_id=None, reference=None,
+               mode=None):
+    """Post one entry and move the customer's balance by debit - credit; the caller commits.
+
+    The balance row is updated first, so concurrent writers are serialized on
+    it and each entry records the balance its own change produced.
+    """
+    change = debit - credit
+    balance = session.execute(
+        update(CustomerBalance)
+        .where(CustomerBalance.customer_id == customer_id)
+        .values(balance=CustomerBalance.balance + change, last_entry_date=date)
+        .returning(CustomerBalance.balance)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if balance is None:
+        session.execute(insert(CustomerBalance).values(customer_id=customer_id, balance=change, last_entry_date=date))
+        balance = change
+
+    session.execute(insert(LedgerEntry).values(
+        customer_id=customer_id,
+        date=date,
+        entry_type=entry_type,
+        order_id=order_id,
+        reference=reference,
+        mode=mode,
+        debit=debit,
+        credit=credit,
+        balance=balance
+    ))
+    return balance
+
+
+def record_payment(db, customer_id, amount, mode, reference=None, date=None):
+    """Record a payment on account in its own transaction and return the new balance"""
+    if amount <= 0:
+        raise PaymentError("Payment amount must be greater than zero.")
+    date = date or datetime.utcnow()
+
+    def write(session):
+        if session.get(Customer, customer_id) is None:
+            raise PaymentError(f"Customer #{customer_id} does not exist.")
+        return post_entry(session, customer_id, date, "Payment", credit=amount, reference=reference or None, mode=mode)
+
+    return db.run_write(write)
+
+
+# --- Reading ---
+def customer_balance(session, customer_id):
+    """Current balance of one customer (0.0 if nothing was ever posted)"""
+    rows = cached_all(session.query(CustomerBalance.balance).filter(CustomerBalance.customer_id == customer_id))
+    return float(rows[0][0]) if rows else 0.0
+
+
+def statement(session, customer_id, start_date, end_date):
+    """(opening balance, entries frame, closing balance) for one customer over an inclusive date range"""
+    start, end = day_bounds(start_date, end_date)
+    entries = session.query(LedgerEntry).filter(LedgerEntry.customer_id == customer_id)
+
+    before = cached_all(entries.filter(LedgerEntry.date < start).with_entities(LedgerEntry.balance)
+                        .order_by(LedgerEntry.date.desc(), LedgerEntry.id.desc()).limit(1))
+    opening = float(before[0][0]) if before else 0.0
+
+    rows = cached_all(entries.filter(LedgerEntry.date >= start, LedgerEntry.date <= end).with_entities(
+        *[expr.label(label) for label, expr in STATEMENT_COLUMNS.items()]
+    ).order_by(LedgerEntry.date.asc(), LedgerEntry.id.asc()))
+    frame = typed_frame(rows, STATEMENT_COLUMNS)
+    closing = float(frame["Balance"].iloc[-1]) if not frame.empty else opening
+    return opening, frame, closing
+
+
+def aging_frame(session, as_of=None):
+    """Receivables per customer split by age, oldest bills paid first"""
+    today = (as_of or datetime.utcnow()).date()
+    labels = [label for label, _, _ in AGING_BUCKETS]
+    oldest = [datetime.combine(today - timedelta(days=days), datetime.min.time()) for _, _, days in AGING_BUCKETS]
+
+    balances = cached_all(session.query(
+        Customer.id.label("Customer ID"),
+        Customer.name.label("Customer Name"),
+        Customer.phone.label("Phone"),
+        CustomerBalance.balance.label("Balance")
+    ).join(CustomerBalance, CustomerBalance.customer_id == Customer.id).filter(
+        CustomerBalance.balance > ZERO_BALANCE
+    ).order_by(CustomerBalance.balance.desc()))
+    frame = pd.DataFrame(balances, columns=["Customer ID", "Customer Name", "Phone", "Balance"])
+
+    # Billed per customer in each bucket, over the last 90 days only
+    bucket_sums = []
+    for i, label in enumerate(labels):
+        in_bucket = LedgerEntry.date >= oldest[i]
+        if i:
+            in_bucket = and_(in_bucket, LedgerEntry.date < oldest[i - 1])
+        bucket_sums.append(func.sum(case((in_bucket, LedgerEntry.debit), else_=0.0)).label(label))
+    # Pick the recent entries through ix_ledger_entries_date first; left to
+    # itself the planner walks the whole ledger in customer order to group it
+    recent_ids = session.query(LedgerEntry.id).filter(LedgerEntry.date >= oldest[-1])
+    recent = pd.DataFrame(cached_all(session.query(LedgerEntry.customer_id.label("Customer ID"), *bucket_sums).filter(
+        LedgerEntry.id.in_(recent_ids),
+        LedgerEntry.entry_type == "Bill"
+    ).group_by(LedgerEntry.customer_id)), columns=["Customer ID"] + labels)
+    frame = frame.merge(recent, on="Customer ID", how="left").fillna({label: 0.0 for label in labels})
+
+    # The balance is covered by the newest bills first; the rest is overdue
+    remaining = frame["Balance"].to_numpy(dtype=float)
+    for label in labels:
+        allocated = np.minimum(remaining, frame[label].to_numpy(dtype=float))
+        frame[label] = allocated
+        remaining = remaining - allocated
+    frame[OVERDUE_BUCKET] = remaining
+    return frame
+
+
+# --- Maintenance ---
+def backfill_ledger(conn):
+    """Post every bill, and the payment taken with it, from the transactions table.
+
+    For databases that predate the ledger (migration 8): running balances
+    come from one window function over the new entries. Works on a
+    Connection or a Session; the caller commits.
+    """
+    # Each bill sorts just before the payment taken with it
+    bills = select(
+        Transaction.customer_id, Transaction.date, literal("Bill").label("entry_type"), Transaction.order_id,
+        Transaction.bill_no.label("reference"), literal(None).label("mode"),
+        Transaction.issue_amount.label("debit"), literal(0.0).label("credit"), (Transaction.id * 2).label("seq")
+    )
+    payments = select(
+        Transaction.customer_id, Transaction.date, literal("Payment").label("entry_type"), Transaction.order_id,
+        Transaction.bill_no.label("reference"), Transaction.mode,
+        literal(0.0).label("debit"), Transaction.received.label("credit"), (Transaction.id * 2 + 1).label("seq")
+    ).where(Transaction.received > 0)
+    entries = union_all(bills, payments).subquery()
+    running = func.sum(entries.c.debit - entries.c.credit).over(
+        partition_by=entries.c.customer_id, order_by=(entries.c.date, entries.c.seq)
+    )
+    columns = ['customer_id', 'date', 'entry_type', 'order_id', 'reference', 'mode', 'debit', 'credit']
+    conn.execute(insert(LedgerEntry).from_select(
+        columns + ['balance'],
+        select(*[entries.c[c] for c in columns], running).order_by(entries.c.date, entries.c.seq)
+    ))
+    rebuild_balances(conn)
+
+
+def rebuild_balances(conn):
+    """Recompute every customer's balance from their ledger entries; the caller commits"""
+    conn.execute(delete(CustomerBalance))
+    conn.execute(insert(CustomerBalance).from_select(
+        ['customer_id', 'balance', 'last_entry_date'],
+        select(LedgerEntry.customer_id, func.sum(LedgerEntry.debit - LedgerEntry.credit), func.max(LedgerEntry.date))
+        .group_by(LedgerEntry.customer_id)
+    ))
+
+
+def verify_balances(session):
+    """Return {customer_id: (maintained, actual)} for every balance that drifted from its entries"""
+    actual = dict(session.execute(
+        select(LedgerEntry.customer_id, func.sum(LedgerEntry.debit - LedgerEntry.credit)).group_by(LedgerEntry.customer_id)
+    ).all())
+    maintained = dict(session.execute(select(CustomerBalance.customer_id, CustomerBalance.balance)).all())
+    return {
+        customer_id: (maintained.get(customer_id, 0.0), actual.get(customer_id, 0.0))
+        for customer_id in set(actual) | set(maintained)
+        if abs(maintained.get(customer_id, 0.0) - actual.get(customer_id, 0.0)) > ZERO_BALANCE
+    }
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'verify'
+    db = Database(sys.argv[2] if len(sys.argv) > 2 else None)
+    db.migrate()
+    session = db.get_session()
+    try:
+        if command == 'rebuild':
+            rebuild_balances(session)
+            session.commit()
+            print(f"Rebuilt {session.query(CustomerBalance).count()} customer balances from the ledger.")
+        elif command == 'verify':
+            drift = verify_balances(session)
+            for customer_id, (maintained, actual) in sorted(drift.items()):
+                print(f"customer {customer_id}: balance is {maintained:.2f}, ledger entries add up to {actual:.2f}")
+            print("Customer balances are consistent." if not drift else "Run 'rebuild' to repair.")
+            sys.exit(1 if drift else 0)
+        else:
+            sys.exit(f"Unknown command '{command}', expected 'verify' or 'rebuild'")
+    finally:
+        session.close()
@@ -0,0 +1,188 @@
+# utils/orders.py
+"""Order services: finalizing new orders and listing existing ones.
+
+Finalizing takes stock with conditional UPDATEs inside one short write
+transaction, so two counters selling the last units cannot both succeed.
+Units other carts hold (utils/reservations.py) are not for sale; the
+order's own cart's holds are consumed by it.
+
+Orders are listed newest first and paged with a keyset on (date, id), so
+fetching page 500 costs the same as page 1. A page is loaded in a fixed
+number of queries however many orders it holds: one for the orders with
+their customer and transaction, and one for their line items and products.
+"""
+from datetime import datetime
+from sqlalchemy import and_, or_, update, insert, bindparam
+from sqlalchemy.orm import joinedload, selectinload
+from database import Customer, Item, Order, OrderItem, Transaction
+from utils.ledger import post_entry
+from utils.reservations import available, available_to_sell, release_cart
+from utils.rollups import post_order
+
+PAGE_SIZE = 50
+ORDER_STATUSES = ["Pending", "Completed", "Cancelled"]
+
+
+class InsufficientStock(Exception):
+    """Raised when an order asks for more units of an item than are in stock"""
+
+    def __init__(self, shortages):
+        # [(item name, units available, units requested), ...]
+        self.shortages = shortages
+        super().__init__("; ".join(f"{name}: {available} available, {requested} requested"
+                                   for name, available, requested in shortages))
+
+
+# Takes stock only if enough is left once other carts' holds are set aside;
+# the affected row count says whether it did.
+# Run as plain Core DML: ORM bulk UPDATE would key the rows by primary key.
+_take_stock = update(Item).where(
+    Item.id == bindparam('line_item_id'),
+    available_to_sell(bindparam('hold_now'), bindparam('hold_cart')) >= bindparam('line_quantity')
+).values(quantity=Item.quantity - bindparam('line_quantity')).execution_options(dml_strategy='core_only')
+
+
+def _shortages(session, requested, cart_id):
+    names = dict(session.query(Item.id, Item.name).filter(Item.id.in_(requested)))
+    free = available(session, requested, cart_id)
+    shortages = []
+    for item_id, quantity in requested.items():
+        if item_id not in names:
+            shortages.append((f"Item #{item_id}", 0, quantity))
+        elif free[item_id] < quantity:
+            shortages.append((names[item_id], max(free[item_id], 0), quantity))
+    return shortages
+
+
+def finalize_order(db, customer_id, lines, status, payment_mode, amount_received, cheque_no=None, cart_id=None):
+    """Create an order, its line items and its bill, and take the stock, atomically.
+
+    `lines` are cart entries with item_id, quantity, selling_price_at_order
+    and total_price. Runs as one short write transaction (Database.run_write,
+    retried if the database stays locked): one executemany of
+    conditional stock UPDATEs, then bulk inserts, then the bill and any
+    payment taken are posted to the customer's ledger and the order is added
+    to the daily sales rollups. Units held by carts other than `cart_id`
+    cannot be taken, and `cart_id`'s holds are released with the order.
+    Raises InsufficientStock, with nothing written, if any line could not
+    be filled. Returns the new order's ID. All writes go through the
+    session so the query cache sees them.
+    """
+    requested = {}
+    for line in lines:
+        requested[line['item_id']] = requested.get(line['item_id'], 0) + line['quantity']
+    total_amount = sum(line['total_price'] for line in lines)
+    now = datetime.utcnow()
+
+    def write(session):
+        customer = session.get(Customer, customer_id)
+
+        result = session.execute(
+            _take_stock,
+            [{'line_item_id': item_id, 'line_quantity': quantity, 'hold_now': now, 'hold_cart': cart_id}
+             for item_id, quantity in requested.items()]
+        )
+        if result.rowcount != len(requested):
+            session.rollback()
+            return None
+
+        order = Order(customer_id=customer_id, total_amount=total_amount, date=now, status=status)
+        session.add(order)
+        session.flush()
+        order_id = order.id
+
+        session.execute(insert(OrderItem), [{
+            'order_id': order_id,
+            'item_id': line['item_id'],
+            'quantity': line['quantity'],
+            'price': line['selling_price_at_order']
+        } for line in lines])
+
+        session.add(Transaction(
+            bill_no=str(order_id),
+            order_id=order_id,
+            date=now,
+            customer_id=customer_id,
+            party_name=customer.name if customer else "N/A",
+            address=customer.address if customer else "N/A",
+            mode=payment_mode,
+            cheque_no=cheque_no,
+            issue_amount=total_amount,
+            received=amount_received,
+            balance=total_amount - amount_received
+        ))
+        post_entry(session, customer_id, now, "Bill", debit=total_amount, order_id=order_id, reference=str(order_id))
+        if amount_received > 0:
+            post_entry(session, customer_id, now, "Payment", credit=amount_received, order_id=order_id,
+                       reference=cheque_no or str(order_id), mode=payment_mode)
+        post_order(session, customer_id, now, payment_mode,
+                   [(line['item_id'], line['quantity'], line['selling_price_at_order']) for line in lines])
+        if cart_id is not None:
+            release_cart(session, cart_id)
+        return order_id
+
+    order_id = db.run_write(write)
+    if order_id is None:
+        session = db.get_session()
+        try:
+            raise InsufficientStock(_shortages(session, requested, cart_id))
+        finally:
+            session.close()
+    return order_id
+
+
+def order_page_query(session, start_date=None, end_date=None, status=None, after=None, page_size=PAGE_SIZE):
+    """Query for one page of orders.
+
+    `after` is the (date, id) cursor of the last order on the previous page.
+    One extra row is fetched so the caller can tell whether a next page exists.
+    """
+    query = session.query(Order).options(
+        joinedload(Order.customer),
+        joinedload(Order.transaction),
+        selectinload(Order.order_items).joinedload(OrderItem.item)
+    )
+
+    if start_date:
+        query = query.filter(Order.date >= datetime.combine(start_date, datetime.min.time()))
+    if end_date:
+        query = query.filter(Order.date <= datetime.combine(end_date, datetime.max.time()))
+    if status:
+        query = query.filter(Order.status == status)
+    if after:
+        after_date, after_id = after
+        query = query.filter(or_(
+            Order.date < after_date,
+            and_(Order.date == after_date, Order.id < after_id)
+        ))
+
+    return query.order_by(Order.date.desc(), Order.id.desc()).limit(page_size + 1)
+
+
+def list_orders(session, start_date=None, end_date=None, status=None, after=None, page_size=PAGE_SIZE):
+    """Return (orders, next_cursor) for one page; next_cursor is None on the last page"""
+    orders = order_page_query(session, start_date, end_date, status, after, page_size).all()
+    if len(orders) > page_size:
+        orders = orders[:page_size]
+        last = orders[-1]
+        return orders, (last.date, last.id)
+    return orders, None
+
+
+def order_rows(orders):
+    """Flatten a page of orders into typed display rows"""
+    rows = []
+    for order in orders:
+        transaction = order.transaction
+        rows.append({
+            "Order ID": order.id,
+            "Date": order.date,
+            "Customer Name": order.customer.name if order.customer else "N/A",
+            "Items": ", ".join([f"{oi.item.name} ({oi.quantity}x)" for oi in order.order_items]),
+            "Total Amount": order.total_amount,
+            "Status": order.status,
+            "Payment Mode": transaction.mode if transaction else "N/A",
+            "Amount Received": transaction.received if transaction else 0.0,
+            "Balance": transaction.balance if transaction else order.total_amount
+        })
+    return rows
@@ -0,0 +1,183 @@
+# utils/pdf.py
+"""Table renderer for the PDF reports.
+
+Columns are formatted a whole column at a time straight from the typed
+DataFrame, and each row is drawn with plain text and one rule instead of
+one bordered `cell()` per value, which is several times faster on large
+reports. The header row is repeated at the top of every page.
+
+The reports are rendered by the background job workers (utils/jobs.py),
+never in a page rerun.
+"""
+import pandas as pd
+from fpdf import FPDF
+
+ROW_HEIGHT = 6
+FONT = "Helvetica"
+PROGRESS_EVERY = 1000  # rows between progress callbacks
+
+# (header, DataFrame column, width in mm, kind); kind is text, money or date
+SALES_PDF_COLUMNS = [
+    ("Bill No", "Bill No", 12, "text"),
+    ("Order ID", "Order ID", 12, "text"),
+    ("Date", "Order Date", 15, "date"),
+    ("Customer Name", "Customer Name", 25, "text"),
+    ("Customer Phone", "Customer Phone", 25, "text"),
+    ("Product Name", "Product Name", 25, "text"),
+    ("Qty", "Quantity Sold", 8, "text"),
+    ("Item Total", "Total Item Revenue", 16, "money"),
+    ("Order Total", "Order Total Amount", 16, "money"),
+    ("Paid", "Amount Received", 15, "money"),
+    ("Balance", "Balance Amount", 15, "money"),
+]
+
+TRANSACTION_PDF_COLUMNS = [
+    ("Trans ID", "Transaction ID", 14, "text"),
+    ("Bill No", "Bill No", 10, "text"),
+    ("Date", "Date", 15, "date"),
+    ("Customer", "Customer Name", 23, "text"),
+    ("Address", "Customer Address", 50, "text"),
+    ("Mode", "Payment Mode", 11, "text"),
+    ("Issued", "Issue Amount", 12, "money"),
+    ("Received", "Received Amount", 15, "money"),
+    ("Balance", "Balance Amount", 12, "money"),
+]
+
+
+def _format_column(series, kind):
+    if kind == "money":
+        return [f"{value:.2f}" for value in series.to_numpy()]
+    if kind == "date":
+        # An empty report's date column comes back untyped
+        return pd.to_datetime(series).dt.strftime("%d-%m-%Y").fillna("").tolist()
+    return series.astype(str).tolist()
+
+
+class _TableWriter:
+    """Draws rows of pre-formatted strings, centred in fixed-width columns"""
+
+    def __init__(self, pdf, columns):
+        self.pdf = pdf
+        self.headers = [header for header, _, _, _ in columns]
+        self.widths = [width for _, _, width, _ in columns]
+        self.left = pdf.l_margin
+        self.right = self.left + sum(self.widths)
+        self.page_top = None
+        self._char_widths = {}
+
+    def _measure(self, text):
+        """String width from cached per-character widths; get_string_width() is slow per call"""
+        font_key = (self.pdf.font_style, self.pdf.font_size_pt)
+        widths = self._char_widths.setdefault(font_key, {})
+        total = 0
+        for char in text:
+            width = widths.get(char)
+            if width is None:
+                width = widths[char] = self.pdf.get_string_width(char)
+            total += width
+        return total
+
+    def _fit(self, text, width):
+        """Truncate to the column width and return (text, x offset)"""
+        shown = text
+        text_width = self._measure(shown)
+        while shown and text_width > width - 1:
+            shown = shown[:-1]
+            text_width = self._measure(shown)
+        return shown, (width - text_width) / 2
+
+    def _row(self, values):
+        pdf = self.pdf
+        y = pdf.get_y()
+        x = self.left
+        baseline = y + ROW_HEIGHT / 2 + pdf.font_size / 2.8
+        for value, width in zip(values, self.widths):
+            shown, offset = self._fit(value, width)
+            if shown:
+                pdf.text(x + offset, baseline, shown)
+            x += width
+        pdf.line(self.left, y + ROW_HEIGHT, self.right, y + ROW_HEIGHT)
+        pdf.set_y(y + ROW_HEIGHT)
+
+    def _close_page(self):
+        """Vertical rules for the part of the table on the current page"""
+        bottom = self.pdf.get_y()
+        x = self.left
+        for width in [0] + self.widths:
+            x += width
+            self.pdf.line(x, self.page_top, x, bottom)
+
+    def header(self):
+        pdf = self.pdf
+        self.page_top = pdf.get_y()
+        pdf.line(self.left, self.page_top, self.right, self.page_top)
+        pdf.set_font(FONT, 'B', 8)
+        self._row(self.headers)
+        pdf.set_font(FONT, '', 7)
+
+    def rows(self, rows, progress=None):
+        pdf = self.pdf
+        for done, values in enumerate(rows, 1):
+            if pdf.will_page_break(ROW_HEIGHT):
+                self._close_page()
+                pdf.add_page()
+                self.header()
+            self._row(values)
+            if progress and done % PROGRESS_EVERY == 0:
+                progress(done)
+        self._close_page()
+
+
+def table_pdf(title, subtitle, columns, data_frame, summary_lines=(), progress=None):
+    """Render `data_frame` as a titled table and return the PDF bytes.
+
+    `progress(fraction)` is called every PROGRESS_EVERY rows.
+    """
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+
+    pdf.set_font(FONT, 'B', 16)
+    pdf.cell(0, 10, title, new_x="LMARGIN", new_y="NEXT", align='C')
+    pdf.set_font(FONT, '', 12)
+    pdf.cell(0, 10, subtitle, new_x="LMARGIN", new_y="NEXT", align='C')
+    pdf.ln(10)
+
+    formatted = [_format_column(data_frame[field], kind) for _, field, _, kind in columns]
+    writer = _TableWriter(pdf, columns)
+    writer.header()
+    total = max(len(data_frame), 1)
+    writer.rows(zip(*formatted), progress and (lambda done: progress(done / total)))
+
+    if summary_lines:
+        pdf.ln(10)
+        pdf.set_font(FONT, 'B', 12)
+        for line in summary_lines:
+            pdf.cell(0, 10, line, new_x="LMARGIN", new_y="NEXT", align='R')
+
+    return bytes(pdf.output())
+
+
+def _period(start, end):
+    return f"From {start.strftime('%d-%m-%Y')} to {end.strftime('%d-%m-%Y')}"
+
+
+def sales_report_pdf(data_frame, start, end, progress=None):
+    """The sales history printout for sales_detail_frame() rows"""
+    return table_pdf("Sales Report", _period(start, end), SALES_PDF_COLUMNS, data_frame, progress=progress)
+
+
+def transaction_report_pdf(data_frame, start, end, progress=None):
+    """The transaction summary printout for transaction_summary_frame() rows, with totals"""
+    return table_pdf(
+        "Transaction Summary Report",
+        _period(start, end),
+        TRANSACTION_PDF_COLUMNS,
+        data_frame,
+        summary_lines=(
+            f"Total Issued: PKR {data_frame['Issue Amount'].sum():.2f}",
+            f"Total Received: PKR {data_frame['Received Amount'].sum():.2f}",
+            f"Total Balance: PKR {data_frame['Balance Amount'].sum():.2f}"
+        ),
+        progress=progress
+    )
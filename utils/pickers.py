@@ -0,0 +1,115 @@
+# utils/pickers.py
+"""Search-backed pickers for products and customers.
+
+Instead of a selectbox holding every row of the table, a picker is a search
+box plus a selectbox of the top matches from the FTS5 indexes created in
+migration 6. The selectbox options are record IDs and the pages work with
+the returned ID, never with a formatted label.
+"""
+import streamlit as st
+from sqlalchemy import Integer, text
+from sqlalchemy.sql import table, column
+from database import Customer, Item
+
+DEFAULT_LIMIT = 20
+
+items_fts = table('items_fts', column('rowid', Integer), column('rank'))
+customers_fts = table('customers_fts', column('rowid', Integer), column('rank'))
+
+
+def _match_expression(term):
+    """Turn free text into an FTS5 query: every word must prefix-match"""
+    words = [w.replace('"', '') for w in (term or "").split()]
+    return " ".join(f'"{w}"*' for w in words if w)
+
+
+def _search(query, entity, fts, term, limit):
+    match = _match_expression(term)
+    if not match:
+        return query.order_by(entity.name.asc(), entity.id.asc()).limit(limit).all()
+
+    results = query.join(
+        fts, fts.c.rowid == entity.id
+    ).filter(
+        text(f"{fts.name} MATCH :match").bindparams(match=match)
+    ).order_by(fts.c.rank).limit(limit).all()
+
+    # A bare number may also be a record ID
+    if term.strip().isdigit():
+        exact = query.filter(entity.id == int(term)).first()
+        if exact is not None and exact not in results:
+            results = [exact] + results[:limit - 1]
+    return results
+
+
+def search_items(session, term, limit=DEFAULT_LIMIT, in_stock_only=False):
+    """Top matching items by name (or ID); browses by name when the term is empty"""
+    return _search(_item_query(session, in_stock_only), Item, items_fts, term, limit)
+
+
+def search_customers(session, term, limit=DEFAULT_LIMIT):
+    """Top matching customers by name or phone (or ID); browses by name when the term is empty"""
+    return _search(session.query(Customer), Customer, customers_fts, term, limit)
+
+
+def _item_query(session, in_stock_only):
+    query = session.query(Item)
+    if in_stock_only:
+        query = query.filter(Item.quantity > 0)
+    return query
+
+
+def _picker(label, key, matches, load, describe, allow_none, none_label):
+    """Selectbox over the IDs of `matches`; keeps the current pick while it is still valid"""
+    options = [record.id for record in matches]
+    labels = {record.id: describe(record) for record in matches}
+
+    selected = st.session_state.get(key)
+    if selected is not None and selected not in labels:
+        current = load(selected)
+        if current is not None:
+            options.insert(0, current.id)
+            labels[current.id] = describe(current)
+    if allow_none:
+        options.insert(0, None)
+        labels[None] = none_label
+
+    if not options:
+        return None
+    if st.session_state.get(key) not in labels:
+        st.session_state[key] = options[0]
+
+    return st.selectbox(label, options=options, format_func=labels.get, key=key, label_visibility="collapsed")
+
+
+def _on_new_search(key, term, matches, allow_none):
+    """Select the best match whenever the search text changes"""
+    term_key = f"{key}_last_search"
+    if st.session_state.get(term_key) != term:
+        st.session_state[term_key] = term
+        if term and matches:
+            st.session_state[key] = matches[0].id
+        elif allow_none:
+            st.session_state[key] = None
+
+
+def item_picker(session, label, key, in_stock_only=False, describe=None, allow_none=False,
+                none_label="All Products", limit=DEFAULT_LIMIT):
+    """Search box plus selectbox for an item; returns the selected item ID or None"""
+    describe = describe or (lambda p: f"{p.name} (ID: {p.id})")
+    term = st.text_input(label, key=f"{key}_search", placeholder="Type a product name or ID")
+    matches = search_items(session, term, limit, in_stock_only)
+    _on_new_search(key, term, matches, allow_none)
+    load = lambda item_id: _item_query(session, in_stock_only).filter(Item.id == item_id).first()
+    return _picker(label, key, matches, load, describe, allow_none, none_label)
+
+
+def customer_picker(session, label, key, describe=None, allow_none=False,
+                    none_label="All Customers", limit=DEFAULT_LIMIT):
+    """Search box plus selectbox for a customer; returns the selected customer ID or None"""
+    describe = describe or (lambda c: f"{c.name} - {c.phone} (ID: {c.id})")
+    term = st.text_input(label, key=f"{key}_search", placeholder="Type a name, phone number or ID")
+    matches = search_customers(session, term, limit)
+    _on_new_search(key, term, matches, allow_none)
+    load = lambda customer_id: session.get(Customer, customer_id)
+    return _picker(label, key, matches, load, describe, allow_none, none_label)
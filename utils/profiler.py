@@ -0,0 +1,198 @@
+# utils/profiler.py
+"""Opt-in per-rerun query profiler (set INVENTORY_PROFILE_QUERIES=1).
+
+Cursor-execute hooks on the shared engine record every statement a page
+rerun issues: its SQL, parameters, time and the rows fetched from it. A
+rerun starts in initialize_session() and ends in profile_panel() at the
+bottom of the page, which shows statement count, SQL time, rows and script
+time in a collapsible sidebar panel.
+
+The panel also shows the lock wait of this process's write transactions
+(Database.write_stats).
+
+Statements run REPEAT_THRESHOLD or more times with different parameters in
+one rerun are flagged, since that is usually a query inside a loop (N+1).
+Statements slower than SLOW_QUERY_MS are appended to SLOW_QUERY_LOG.
+
+Streamlit runs each rerun on its own script thread, so the profile being
+recorded is kept per thread. Reruns of a single st.fragment skip both ends
+and are not recorded; benchmarks/page_interactions.py counts them.
+"""
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+from sqlalchemy import event
+import config
+
+REPEAT_THRESHOLD = 3
+SQL_PREVIEW_CHARS = 160
+
+_local = threading.local()
+_slow_log = logging.getLogger("inventory.slow_queries")
+
+
+class RerunProfile:
+    """Statements recorded during one script run"""
+
+    def __init__(self, page):
+        self.page = page
+        self.started = time.perf_counter()
+        self.script_seconds = None
+        self.statements = []  # dicts: sql, params, seconds, rows
+
+    @property
+    def sql_seconds(self):
+        return sum(s['seconds'] for s in self.statements)
+
+    @property
+    def rows(self):
+        return sum(s['rows'] for s in self.statements)
+
+    def repeated(self, threshold=REPEAT_THRESHOLD):
+        """(sql, executions, distinct parameter sets, seconds) for statements run with varying parameters"""
+        groups = defaultdict(list)
+        for statement in self.statements:
+            groups[statement['sql']].append(statement)
+        repeated = []
+        for sql, runs in groups.items():
+            distinct = len({repr(r['params']) for r in runs})
+            if distinct >= threshold:
+                repeated.append((sql, len(runs), distinct, sum(r['seconds'] for r in runs)))
+        return sorted(repeated, key=lambda r: r[1], reverse=True)
+
+    def slowest(self, limit=5):
+        return sorted(self.statements, key=lambda s: s['seconds'], reverse=True)[:limit]
+
+
+class _CountingCursor:
+    """DBAPI cursor proxy that counts the rows fetched into a statement record"""
+
+    def __init__(self, cursor, record):
+        self._cursor = cursor
+        self._record = record
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._record['rows'] += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._record['rows'] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._record['rows'] += len(rows)
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+# --- Engine hooks ---
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_local, 'profile', None) is not None:
+        conn.info.setdefault('profile_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = getattr(_local, 'profile', None)
+    started = conn.info.get('profile_started')
+    if profile is None or not started:
+        return
+    record = {
+        'sql': statement,
+        'params': parameters,
+        'seconds': time.perf_counter() - started.pop(),
+        'rows': cursor.rowcount if cursor.description is None and cursor.rowcount > 0 else 0,
+    }
+    profile.statements.append(record)
+    if cursor.description is not None and context is not None:
+        context.cursor = _CountingCursor(cursor, record)
+
+
+def install_profiler(engine):
+    """Attach the profiler hooks to `engine` and open the slow-query log"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    if not _slow_log.handlers:
+        handler = logging.FileHandler(config.SLOW_QUERY_LOG, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _slow_log.addHandler(handler)
+        _slow_log.setLevel(logging.INFO)
+        _slow_log.propagate = False
+
+
+# --- Rerun lifecycle ---
+def begin_rerun(page):
+    """Start recording for the current script thread, closing any run that never reached its panel"""
+    if getattr(_local, 'profile', None) is not None:
+        finish_rerun()
+    _local.profile = RerunProfile(page)
+
+
+def finish_rerun():
+    """Stop recording, log the slow statements and return the profile (None if none was running)"""
+    profile = getattr(_local, 'profile', None)
+    _local.profile = None
+    if profile is None:
+        return None
+    profile.script_seconds = time.perf_counter() - profile.started
+    now = datetime.now().isoformat(timespec="seconds")
+    for statement in profile.statements:
+        milliseconds = statement['seconds'] * 1000
+        if milliseconds >= config.SLOW_QUERY_MS:
+            _slow_log.info(f"{now} page={profile.page} ms={milliseconds:.1f} rows={statement['rows']} "
+                           f"sql={' '.join(statement['sql'].split())!r} params={repr(statement['params'])[:300]}")
+    return profile
+
+
+def _preview(sql):
+    sql = " ".join(sql.split())
+    return sql if len(sql) <= SQL_PREVIEW_CHARS else sql[:SQL_PREVIEW_CHARS] + "..."
+
+
+def profile_panel():
+    """Close the current rerun's profile and show it in the sidebar; does nothing unless profiling is on"""
+    if not config.PROFILE_QUERIES:
+        return
+    profile = finish_rerun()
+    if profile is None:
+        return
+
+    with st.sidebar.expander(f"Query Profiler: {len(profile.statements)} statements", expanded=False):
+        col1, col2 = st.columns(2)
+        col1.metric("Statements", len(profile.statements))
+        col2.metric("SQL Time", f"{profile.sql_seconds * 1000:.1f} ms")
+        col1.metric("Rows Fetched", profile.rows)
+        col2.metric("Script Time", f"{profile.script_seconds * 1000:.0f} ms")
+
+        repeated = profile.repeated()
+        if repeated:
+            st.warning(f"{len(repeated)} statement(s) ran with {REPEAT_THRESHOLD}+ different parameter sets "
+                       "in this rerun (possible N+1 query).")
+            st.dataframe(pd.DataFrame([{
+                "Statement": _preview(sql), "Executions": runs, "Parameter Sets": distinct, "Total ms": seconds * 1000
+            } for sql, runs, distinct, seconds in repeated]), hide_index=True)
+
+        if profile.statements:
+            st.caption("Slowest statements")
+            st.dataframe(pd.DataFrame([{
+                "Statement": _preview(s['sql']), "ms": s['seconds'] * 1000, "Rows": s['rows']
+            } for s in profile.slowest()]), hide_index=True)
+        db = st.session_state.get('db')
+        if db is not None:
+            writes = db.write_stats.snapshot()
+            st.caption(f"Write transactions in this server process: {writes['writes']}, "
+                       f"{writes['retries']} retried, {writes['failures']} failed; lock wait "
+                       f"p50 {writes['p50_wait'] * 1000:.1f} ms, p95 {writes['p95_wait'] * 1000:.1f} ms, "
+                       f"max {writes['max_wait'] * 1000:.1f} ms")
+        st.caption(f"Statements over {config.SLOW_QUERY_MS:.0f} ms are logged to {os.path.abspath(config.SLOW_QUERY_LOG)}")
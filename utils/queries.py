@@ -0,0 +1,84 @@
+# utils/queries.py
+"""Query builders shared by the pages and the query plan check.
+
+Each function returns an unexecuted Query so the pages and
+`utils/query_plans.py` always look at exactly the same SQL.
+"""
+from datetime import datetime
+from database import Customer, Item, Order, OrderItem, Transaction
+
+
+def day_bounds(start_date, end_date):
+    """Turn an inclusive date range into datetime bounds"""
+    return datetime.combine(start_date, datetime.min.time()), datetime.combine(end_date, datetime.max.time())
+
+
+# --- Dashboard ---
+def recent_sales_query(session, limit=10):
+    # Pick the latest orders through ix_orders_date first; without this the
+    # planner is free to drive the join from a full scan of order_items.
+    latest_order_ids = session.query(Order.id).order_by(Order.date.desc()).limit(limit).scalar_subquery()
+    return session.query(
+        Order, Customer, OrderItem, Item, Transaction
+    ).join(
+        Customer, Order.customer_id == Customer.id
+    ).join(
+        OrderItem, Order.id == OrderItem.order_id
+    ).join(
+        Item, OrderItem.item_id == Item.id
+    ).outerjoin(
+        Transaction, Order.transaction
+    ).filter(
+        Order.id.in_(latest_order_ids)
+    ).order_by(Order.date.desc()).limit(limit)
+
+
+# --- Sales History ---
+def sales_lines_query(session, start_date, end_date, customer_id=None, product_id=None, payment_mode=None):
+    """Filtered order lines joined to their order, customer, item and bill.
+
+    Unordered; the report engine picks the columns with with_entities().
+    """
+    start, end = day_bounds(start_date, end_date)
+    query = session.query(
+        Order, Customer, OrderItem, Item, Transaction
+    ).join(
+        Customer, Order.customer_id == Customer.id
+    ).join(
+        OrderItem, Order.id == OrderItem.order_id
+    ).join(
+        Item, OrderItem.item_id == Item.id
+    ).outerjoin(
+        Transaction, Order.transaction
+    ).filter(
+        Order.date >= start,
+        Order.date <= end
+    )
+
+    if customer_id:
+        query = query.filter(Customer.id == customer_id)
+    if product_id:
+        query = query.filter(Item.id == product_id)
+    if payment_mode:
+        query = query.filter(Transaction.mode == payment_mode)
+
+    return query
+
+
+# --- Reports ---
+def stock_levels_query(session):
+    return session.query(Item).order_by(Item.quantity.asc(), Item.id.asc())
+
+
+def low_stock_query(session):
+    # Same condition as ix_items_reorder, so SQLite reads the reorder queue
+    # index instead of the whole items table
+    return session.query(Item).filter(Item.quantity <= Item.reorder_level).order_by(Item.quantity.asc())
+
+
+def transaction_summary_query(session, start_date, end_date):
+    start, end = day_bounds(start_date, end_date)
+    return session.query(Transaction).filter(
+        Transaction.date >= start,
+        Transaction.date <= end
+    ).order_by(Transaction.date.asc())
@@ -0,0 +1,287 @@
+# utils/query_cache.py
+"""Shared cache for read query results, invalidated per table on commit.
+
+Entries are keyed by the compiled SQL and its parameters and tagged with the
+tables the statement reads. Every table has a version number; session hooks
+installed on the `Database` session factory note which tables a session
+writes (ORM flushes and DML run through `session.execute`) and bump their
+versions when it commits, which drops exactly the entries that read them.
+A rollback discards the noted tables without bumping anything.
+
+Server processes share one database, so the versions are also kept in the
+table_versions table (migration 12): a committing session bumps the rows of
+the tables it wrote in the same transaction, and every lookup first asks
+whether anything was committed since the last one (PRAGMA data_version on a
+connection of the cache's own, or on other databases by reading the table)
+and drops what another process's commits made stale.
+
+Only writes made through a `Database` session are seen. Raw connection
+writes and the migration and rebuild CLIs do not invalidate the cache.
+
+Results are shared between every browser session in the process, so only
+column queries are cached (ORM instances are bound to one session) and
+callers must not mutate what they get back.
+"""
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+import pandas as pd
+from sqlalchemy import Table, Column, Integer, String, MetaData, event, inspect, insert, select, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.expression import TableClause
+
+# Tables written by triggers (migrations 4 and 6) when their source changes
+TRIGGER_TARGETS = {
+    'items': ('inventory_summary', 'items_fts'),
+    'customers': ('customers_fts',),
+}
+
+_WRITTEN = 'query_cache_written_tables'
+SIZE_SAMPLE_ROWS = 200
+
+version_metadata = MetaData()
+
+table_versions = Table(
+    'table_versions', version_metadata,
+    Column('table_name', String(64), primary_key=True),
+    Column('version', Integer, nullable=False),
+)
+
+
+def _with_trigger_targets(tables):
+    tables = set(tables)
+    for table in list(tables):
+        tables.update(TRIGGER_TARGETS.get(table, ()))
+    return tables
+
+
+def _sizeof(value):
+    """Rough size in bytes of a cached result"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, list) and len(value) > SIZE_SAMPLE_ROWS:
+        # Rows of one result are alike; measure an even sample and scale up
+        sample = value[::len(value) // SIZE_SAMPLE_ROWS][:SIZE_SAMPLE_ROWS]
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in sample) * len(value) // len(sample)
+    if isinstance(value, (list, tuple)) or hasattr(value, '_fields'):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+class SharedVersions:
+    """Table versions in the table_versions table, seen by the caches of every process on the database"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._sqlite_path = engine.url.database if engine.url.get_backend_name() == 'sqlite' else None
+        self._watch = None  # SQLite: a connection of our own, polled for PRAGMA data_version
+        self._data_version = None
+        self._lock = threading.Lock()
+
+    def bump(self, connection, tables):
+        """Add one to each table's version, inside the writer's transaction"""
+        tables = sorted(tables)
+        bumped = connection.execute(update(table_versions).where(table_versions.c.table_name.in_(tables)).values(
+            version=table_versions.c.version + 1
+        )).rowcount
+        if bumped < len(tables):
+            known = set(connection.execute(select(table_versions.c.table_name).where(
+                table_versions.c.table_name.in_(tables)
+            )).scalars())
+            connection.execute(insert(table_versions), [{'table_name': t, 'version': 1}
+                                                        for t in tables if t not in known])
+
+    def changed(self):
+        """{table: version} if anything may have been committed since the last call, else None"""
+        with self._lock:
+            try:
+                if self._sqlite_path is None:
+                    with self.engine.connect() as conn:
+                        return dict(conn.execute(select(table_versions)).all())
+                if self._watch is None:
+                    self._watch = sqlite3.connect(self._sqlite_path, check_same_thread=False)
+                data_version = self._watch.execute("PRAGMA data_version").fetchone()[0]
+                if data_version == self._data_version:
+                    return None
+                versions = dict(self._watch.execute("SELECT table_name, version FROM table_versions").fetchall())
+                self._data_version = data_version
+                return versions
+            except (sqlite3.OperationalError, DBAPIError):
+                return None  # Not migrated yet
+
+
+class QueryCache:
+    """LRU cache of query results with per-table versions and a memory cap"""
+
+    def __init__(self, max_bytes, shared=None):
+        self.max_bytes = max_bytes
+        self.shared = shared  # SharedVersions, when other processes write the same database
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (tables, versions, value, size)
+        self._versions = {}
+        self._shared_seen = {}  # table_versions as last read
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _snapshot(self, tables):
+        return tuple(self._versions.get(table, 0) for table in tables)
+
+    def _drop(self, key):
+        _, _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get_or_load(self, key, tables, load):
+        """Return the cached result for `key`, or call `load()` and cache it"""
+        tables = tuple(sorted(tables))
+        self._sync()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == self._snapshot(entry[0]):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            # Taken before loading, so a commit that lands mid-load leaves the entry stale
+            versions = self._snapshot(tables)
+
+        value = load()
+        size = _sizeof(value)
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if size <= self.max_bytes and versions == self._snapshot(tables):
+                self._entries[key] = (tables, versions, value, size)
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    self._drop(next(iter(self._entries)))
+                    self.evictions += 1
+        return value
+
+    def _bump(self, tables):
+        for table in tables:
+            self._versions[table] = self._versions.get(table, 0) + 1
+        for key in [k for k, entry in self._entries.items() if tables.intersection(entry[0])]:
+            self._drop(key)
+
+    def invalidate(self, tables):
+        """Bump the version of each table (and its trigger targets) and drop the entries reading them"""
+        bumped = _with_trigger_targets(tables)
+        with self._lock:
+            self._bump(bumped)
+
+    def _sync(self):
+        """Invalidate the tables whose shared versions moved since they were last read"""
+        if self.shared is None:
+            return
+        versions = self.shared.changed()
+        if not versions:
+            return
+        with self._lock:
+            self._bump({table for table, version in versions.items() if self._shared_seen.get(table) != version})
+            self._shared_seen = versions
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    # --- Session hooks ---
+    def install(self, session_factory):
+        """Track the tables each session writes and invalidate them when it commits"""
+        session_factory.configure(info={'query_cache': self})
+        event.listen(session_factory, 'after_flush', self._after_flush)
+        event.listen(session_factory, 'do_orm_execute', self._on_execute)
+        event.listen(session_factory, 'before_commit', self._before_commit)
+        event.listen(session_factory, 'after_commit', self._after_commit)
+        event.listen(session_factory, 'after_soft_rollback', self._after_rollback)
+
+    @staticmethod
+    def _note(session, tables):
+        session.info.setdefault(_WRITTEN, set()).update(tables)
+
+    def _after_flush(self, session, flush_context):
+        tables = set()
+        for instance in set(session.new) | set(session.deleted):
+            tables.update(t.name for t in inspect(instance).mapper.tables)
+        for instance in session.dirty:
+            if session.is_modified(instance, include_collections=False):
+                tables.update(t.name for t in inspect(instance).mapper.tables)
+        self._note(session, tables)
+
+    def _on_execute(self, orm_execute_state):
+        if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+            self._note(orm_execute_state.session, [orm_execute_state.statement.table.name])
+
+    def _before_commit(self, session):
+        if self.shared is None:
+            return
+        session.flush()  # Commit would flush after this hook, noting tables too late
+        if not session.info.get(_WRITTEN):
+            return
+        # On the connection, not the session, so the bump is not noted as a write itself
+        self.shared.bump(session.connection(), _with_trigger_targets(session.info[_WRITTEN]))
+
+    def _after_commit(self, session):
+        tables = session.info.pop(_WRITTEN, None)
+        if tables:
+            self.invalidate(tables)
+
+    def _after_rollback(self, session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop(_WRITTEN, None)
+
+
+# --- Query helpers ---
+def tables_read(statement):
+    """Names of the tables (and FTS tables) a statement reads"""
+    return {element.name for element in visitors.iterate(statement) if isinstance(element, TableClause)}
+
+
+def _returns_instances(query):
+    return any(d['entity'] is not None and d['type'] is d['entity'] for d in query.column_descriptions)
+
+
+def _cached(query, kind, load, source=None):
+    cache = query.session.info.get('query_cache')
+    if cache is None:
+        return load()
+    statement = query.statement
+    compiled = statement.compile(dialect=query.session.get_bind().dialect)
+    key = (kind, source, str(compiled), repr(sorted(compiled.params.items())))
+    return cache.get_or_load(key, tables_read(statement), load)
+
+
+def cached_all(query, load=None, source=None):
+    """query.all() (or `load()`, computing the same rows) through the shared cache; entity queries are run uncached.
+
+    `source` is added to the key when `load()` reads somewhere other than the
+    tables the query names, such as a snapshot taken at some point.
+    """
+    if _returns_instances(query):
+        return query.all()
+    return _cached(query, 'all', load or query.all, source)
+
+
+def cached_count(query):
+    """query.count() through the shared cache"""
+    return _cached(query, 'count', query.count)
@@ -0,0 +1,107 @@
+# utils/query_plans.py
+"""EXPLAIN QUERY PLAN check for the page queries.
+
+Runs every query the Dashboard, Orders, Sales History and Reports pages,
+the customer statement, the stock holds and the job workers issue under `EXPLAIN QUERY PLAN` and reports
+any table that SQLite reads with a plain full scan instead of through an
+index.
+
+    python -m utils.query_plans [db_url]
+
+Without a URL the check runs against a fresh, fully migrated temporary
+database. Exits with status 1 if any query scans a table.
+"""
+import os
+import re
+import sys
+import tempfile
+from datetime import date, datetime
+from sqlalchemy import event
+from database import Database
+from utils import jobs, ledger, queries, reports, reservations
+from utils.orders import order_page_query
+from utils.inventory import read_summary
+
+# "SCAN orders" is a full table scan; "SCAN orders USING INDEX ..." walks
+# an index in order and is what a LIMIT / ORDER BY on an indexed column wants.
+_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+
+_today = date.today()
+
+PAGE_QUERIES = {
+    "Dashboard: stock totals": lambda s: read_summary(s),
+    "Dashboard: recent sales": lambda s: queries.recent_sales_query(s).all(),
+    "Orders: first page": lambda s: order_page_query(s).all(),
+    "Orders: next page": lambda s: order_page_query(s, after=(datetime.combine(_today, datetime.min.time()), 1)).all(),
+    "Orders: date range page": lambda s: order_page_query(s, start_date=_today, end_date=_today).all(),
+    "Sales History: detail rows": lambda s: reports.sales_detail_query(s, _today, _today).all(),
+    "Sales History: customer filter": lambda s: reports.sales_detail_query(s, _today, _today, customer_id=1).all(),
+    "Sales History: product filter": lambda s: reports.sales_detail_query(s, _today, _today, product_id=1).all(),
+    "Sales History: payment mode filter": lambda s: reports.sales_detail_query(s, _today, _today, payment_mode="Cash").all(),
+    "Sales History: totals": lambda s: reports.sales_totals_query(s, _today, _today).all(),
+    "Sales History: daily totals": lambda s: reports.daily_sales_query(s, _today, _today).all(),
+    "Reports: stock levels": lambda s: queries.stock_levels_query(s).all(),
+    "Reports: low stock": lambda s: queries.low_stock_query(s).all(),
+    "Reports: transaction summary": lambda s: queries.transaction_summary_query(s, _today, _today).all(),
+    "Customers: account statement": lambda s: ledger.statement(s, 1, _today, _today),
+    "Orders: available to sell": lambda s: reservations.available(s, [1, 2], "cart"),
+    "Orders: cart holds": lambda s: reservations.cart_holds(s, "cart"),
+    "Jobs: next queued": lambda s: jobs.queued_ids(s),
+    "Jobs: user's recent jobs": lambda s: jobs.recent_jobs(s, "admin", list(jobs.JOB_KINDS)),
+    "Jobs: identical job to reuse": lambda s: jobs.reusable_job(s, "sales_pdf", "admin", "{}"),
+}
+
+
+def explain(db, run_query):
+    """Return the EXPLAIN QUERY PLAN detail lines of every statement `run_query(session)` issues"""
+    plans = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            plans.append([row[3] for row in cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()])
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    session = db.get_session()
+    try:
+        run_query(session)
+    finally:
+        session.close()
+        event.remove(db.engine, "before_cursor_execute", capture)
+    return [line for plan in plans for line in plan]
+
+
+def find_scans(plan):
+    """Return the plan lines that are full table scans"""
+    return [line for line in plan if _SCAN.match(line)]
+
+
+def check_query_plans(db):
+    """Map each page query name to its list of full-scan plan lines"""
+    return {name: find_scans(explain(db, run)) for name, run in PAGE_QUERIES.items()}
+
+
+def main(argv):
+    tmp_dir = None
+    if len(argv) > 1:
+        db_url = argv[1]
+    else:
+        tmp_dir = tempfile.TemporaryDirectory()
+        db_url = f"sqlite:///{os.path.join(tmp_dir.name, 'plan_check.db')}"
+
+    db = Database(db_url)
+    db.migrate()
+    failures = 0
+    for name, scans in check_query_plans(db).items():
+        if scans:
+            failures += 1
+            print(f"FAIL  {name}: " + "; ".join(scans))
+        else:
+            print(f"ok    {name}")
+    db.engine.dispose()
+    if tmp_dir:
+        tmp_dir.cleanup()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,197 @@
+# utils/reports.py
+"""Report engine shared by every page that shows a table.
+
+Totals and per-day figures come from the daily sales rollups when one
+answers the filters (see utils/rollups.py), otherwise from a GROUP BY over
+the order lines. The unfiltered scans (sales detail, bills) go through
+utils.analytics, which runs them on DuckDB when that engine is
+configured. Report rows go straight
+from SQL result rows into typed frames: float money, datetime64 dates and
+categorical payment modes and statuses. Nothing is formatted as text until
+show_report() renders the frame with column_config. Query results come from
+the shared query cache.
+"""
+import pandas as pd
+import streamlit as st
+from sqlalchemy import func
+from database import Customer, Item, Order, OrderItem, Transaction
+from utils.queries import (low_stock_query, recent_sales_query, sales_lines_query, stock_levels_query,
+                           transaction_summary_query)
+from utils import rollups
+from utils.analytics import report_all
+from utils.query_cache import cached_all
+
+MONEY_FORMAT = "PKR %.2f"
+DATETIME_FORMAT = "DD-MM-YYYY HH:mm"
+CATEGORY_COLUMNS = ("Payment Mode", "Status")
+
+line_revenue = OrderItem.quantity * OrderItem.price
+line_profit = (OrderItem.price - Item.cost_price) * OrderItem.quantity
+
+SALES_DETAIL_COLUMNS = {
+    "Bill No": func.coalesce(Transaction.bill_no, "N/A"),
+    "Order ID": Order.id,
+    "Order Date": Order.date,
+    "Customer Name": Customer.name,
+    "Customer Phone": Customer.phone,
+    "Customer Address": Customer.address,
+    "Product Name": Item.name,
+    "Quantity Sold": OrderItem.quantity,
+    "Total Item Revenue": line_revenue,
+    "Order Total Amount": Order.total_amount,
+    "Payment Mode": func.coalesce(Transaction.mode, "N/A"),
+    "Amount Received": func.coalesce(Transaction.received, 0.0),
+    "Balance Amount": func.coalesce(Transaction.balance, Order.total_amount),
+}
+
+RECENT_SALES_COLUMNS = {
+    "Order ID": Order.id,
+    "Date": Order.date,
+    "Customer Name": Customer.name,
+    "Product Name": Item.name,
+    "Quantity": OrderItem.quantity,
+    "Item Total": line_revenue,
+    "Order Total Amount": Order.total_amount,
+    "Payment Mode": func.coalesce(Transaction.mode, "N/A"),
+    "Amount Received": func.coalesce(Transaction.received, 0.0),
+    "Balance Amount": func.coalesce(Transaction.balance, Order.total_amount),
+}
+
+STOCK_COLUMNS = {
+    "ID": Item.id,
+    "Name": Item.name,
+    "Quantity": Item.quantity,
+    "Cost Price": Item.cost_price,
+    "Selling Price": Item.selling_price,
+    "Reorder Level": Item.reorder_level,
+}
+
+LOW_STOCK_COLUMNS = {
+    "ID": Item.id,
+    "Name": Item.name,
+    "Quantity": Item.quantity,
+    "Reorder Level": Item.reorder_level,
+    # The item's usual order, or just enough to lift it back above its level
+    "Order Quantity": func.coalesce(Item.reorder_quantity, Item.reorder_level - Item.quantity + 1),
+}
+
+TRANSACTION_COLUMNS = {
+    "Transaction ID": Transaction.id,
+    "Bill No": Transaction.bill_no,
+    "Date": Transaction.date,
+    "Customer Name": Transaction.party_name,
+    "Customer Address": Transaction.address,
+    "Payment Mode": Transaction.mode,
+    "Issue Amount": Transaction.issue_amount,
+    "Received Amount": Transaction.received,
+    "Balance Amount": Transaction.balance,
+}
+
+
+# --- Frames and rendering ---
+def typed_frame(rows, columns=None):
+    """DataFrame from result rows (or row dicts); payment modes and statuses become categoricals"""
+    frame = pd.DataFrame(rows, columns=list(columns) if columns is not None else None)
+    for name in CATEGORY_COLUMNS:
+        if name in frame:
+            frame[name] = frame[name].astype("category")
+    return frame
+
+
+def column_config(frame, datetime_format=DATETIME_FORMAT):
+    """Render-time formats by dtype: float columns are money, datetimes are shown day first"""
+    config = {}
+    for name, dtype in frame.dtypes.items():
+        if pd.api.types.is_float_dtype(dtype):
+            config[name] = st.column_config.NumberColumn(format=MONEY_FORMAT)
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            config[name] = st.column_config.DatetimeColumn(format=datetime_format)
+    return config
+
+
+def show_report(frame, datetime_format=DATETIME_FORMAT, **kwargs):
+    """st.dataframe with the shared column formats"""
+    st.dataframe(frame, column_config=column_config(frame, datetime_format), hide_index=True, **kwargs)
+
+
+def _labelled(query, columns):
+    return query.with_entities(*[expr.label(label) for label, expr in columns.items()])
+
+
+# --- Queries ---
+def sales_detail_query(session, start_date, end_date, **filters):
+    return _labelled(sales_lines_query(session, start_date, end_date, **filters), SALES_DETAIL_COLUMNS).order_by(Order.date.asc(), Order.id.asc(), OrderItem.id.asc())
+
+
+def sales_totals_query(session, start_date, end_date, **filters):
+    return sales_lines_query(session, start_date, end_date, **filters).with_entities(
+        func.coalesce(func.sum(line_revenue), 0.0),
+        func.coalesce(func.sum(line_profit), 0.0)
+    )
+
+
+def daily_sales_query(session, start_date, end_date, **filters):
+    day = func.date(Order.date)
+    return sales_lines_query(session, start_date, end_date, **filters).with_entities(
+        day.label("Date"),
+        func.sum(line_revenue).label("Total_Revenue"),
+        func.sum(line_profit).label("Total_Profit")
+    ).group_by(day).order_by(day)
+
+
+# --- Results ---
+def sales_detail_frame(session, start_date, end_date, **filters):
+    """One typed row per order line"""
+    query = sales_detail_query(session, start_date, end_date, **filters)
+    # One customer's or product's lines are an index lookup, which SQLite does best
+    selective = filters.get('customer_id') or filters.get('product_id')
+    rows = cached_all(query) if selective else report_all(query)
+    return typed_frame(rows, SALES_DETAIL_COLUMNS)
+
+
+def sales_totals(session, start_date, end_date, **filters):
+    """(total revenue, total profit) for the filtered lines"""
+    query = rollups.totals_query(session, start_date, end_date, **filters)
+    if query is None:
+        query = sales_totals_query(session, start_date, end_date, **filters)
+    (revenue, profit), = cached_all(query)
+    return float(revenue), float(profit)
+
+
+def daily_sales_frame(session, start_date, end_date, **filters):
+    """Revenue and profit per day, indexed by datetime"""
+    query = rollups.daily_totals_query(session, start_date, end_date, **filters)
+    if query is None:
+        query = daily_sales_query(session, start_date, end_date, **filters)
+    rows = cached_all(query)
+    frame = pd.DataFrame(rows, columns=["Date", "Total_Revenue", "Total_Profit"])
+    frame["Date"] = pd.to_datetime(frame["Date"])
+    return frame.set_index("Date")
+
+
+def transaction_summary_frame(session, start_date, end_date):
+    """One typed row per bill in the date range"""
+    rows = report_all(_labelled(transaction_summary_query(session, start_date, end_date), TRANSACTION_COLUMNS))
+    return typed_frame(rows, TRANSACTION_COLUMNS)
+
+
+def payment_mode_summary(session, start_date, end_date):
+    """Bill count and billed total per payment mode, from the daily rollup"""
+    rows = cached_all(rollups.payment_mode_query(session, start_date, end_date))
+    return typed_frame(rows, ["Payment Mode", "Count", "Total_Amount"])
+
+
+def recent_sales_frame(session, limit=10):
+    """Lines of the latest orders, newest first"""
+    rows = cached_all(_labelled(recent_sales_query(session, limit), RECENT_SALES_COLUMNS))
+    return typed_frame(rows, RECENT_SALES_COLUMNS)
+
+
+def stock_levels_frame(session):
+    """Every item, lowest stock first"""
+    return typed_frame(cached_all(_labelled(stock_levels_query(session), STOCK_COLUMNS)), STOCK_COLUMNS)
+
+
+def low_stock_frame(session):
+    """Items at or below their reorder level, with how many to order"""
+    return typed_frame(cached_all(_labelled(low_stock_query(session), LOW_STOCK_COLUMNS)), LOW_STOCK_COLUMNS)
@@ -0,0 +1,154 @@
+# utils/reservations.py
+"""Time-limited stock holds for the carts being built on the Orders page.
+
+Adding a line to a cart holds its units in the stock_reservations table
+until the order is finalized, the line is removed or the hold expires
+RESERVATION_TTL_SECONDS after the cart was last touched. Every add renews
+the expiry of the whole cart. Two counters therefore cannot both put the
+last units in a cart: the second one is told at once, not at checkout.
+
+Available-to-sell is the item's quantity minus the unexpired holds of the
+other carts, computed in the same query as the item through
+ix_stock_reservations_item. Expired holds are ignored by every query, so
+deleting them is only housekeeping: a cart deletes its own and the item's
+when it adds a line, and the job workers sweep the rest every
+RESERVATION_SWEEP_SECONDS.
+
+    python -m utils.reservations list [db_url]    # show the active holds
+    python -m utils.reservations sweep [db_url]   # delete expired holds
+"""
+import sys
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, or_, select, update
+import config
+from database import Database, Item, StockReservation
+
+
+def new_cart_id():
+    """Random token identifying one cart's holds"""
+    return uuid.uuid4().hex
+
+
+def held_elsewhere(now, cart_id=None):
+    """Units of the enclosing query's item held by unexpired holds of carts other than `cart_id`.
+
+    A correlated subquery on Item.id; `now` and `cart_id` may be values or
+    bind parameters.
+    """
+    return func.coalesce(
+        select(func.sum(StockReservation.quantity)).where(
+            StockReservation.item_id == Item.id,
+            StockReservation.expires_at > now,
+            StockReservation.cart_id != func.coalesce(cart_id, '')
+        ).correlate(Item).scalar_subquery(),
+        0
+    )
+
+
+def available_to_sell(now, cart_id=None):
+    """Item.quantity less what other carts hold, as a column expression"""
+    return Item.quantity - held_elsewhere(now, cart_id)
+
+
+def available(session, item_ids, cart_id=None, now=None):
+    """{item ID: units available to `cart_id`, its own holds included} for the given items, in one query.
+
+    Without a cart, every hold counts against the item.
+    """
+    now = now or datetime.utcnow()
+    return dict(session.execute(
+        select(Item.id, available_to_sell(now, cart_id)).where(Item.id.in_(list(item_ids)))
+    ).all())
+
+
+def cart_holds(session, cart_id, now=None):
+    """{item ID: (units, expires_at)} for the unexpired holds of one cart"""
+    now = now or datetime.utcnow()
+    rows = session.execute(
+        select(StockReservation.item_id, StockReservation.quantity, StockReservation.expires_at).where(
+            StockReservation.cart_id == cart_id, StockReservation.expires_at > now
+        )
+    ).all()
+    return {item_id: (quantity, expires_at) for item_id, quantity, expires_at in rows}
+
+
+def hold(db, cart_id, item_id, quantity, now=None):
+    """Hold `quantity` units of an item in all for a cart and renew the cart's expiry.
+
+    Runs as one write transaction, so two carts cannot both take the last
+    units. Returns True, or False with the cart's holds unchanged if fewer
+    than `quantity` units are available to it.
+    """
+    now = now or datetime.utcnow()
+    expires_at = now + timedelta(seconds=config.RESERVATION_TTL_SECONDS)
+
+    def write(session):
+        # Lapsed holds must not come back to life when the cart is renewed below
+        session.execute(delete(StockReservation).where(
+            or_(StockReservation.cart_id == cart_id, StockReservation.item_id == item_id),
+            StockReservation.expires_at <= now
+        ))
+        free = session.execute(
+            select(available_to_sell(now, cart_id)).where(Item.id == item_id)
+        ).scalar()
+        if free is None or quantity > free:
+            return False
+
+        current = session.execute(select(StockReservation).where(
+            StockReservation.cart_id == cart_id, StockReservation.item_id == item_id
+        )).scalar()
+        if current is None:
+            session.add(StockReservation(cart_id=cart_id, item_id=item_id, quantity=quantity, created_at=now,
+                                         expires_at=expires_at))
+        else:
+            current.quantity = quantity
+        session.execute(update(StockReservation).where(StockReservation.cart_id == cart_id).values(
+            expires_at=expires_at
+        ).execution_options(synchronize_session=False))
+        return True
+
+    return db.run_write(write)
+
+
+def release(db, cart_id, item_id=None):
+    """Drop a cart's hold on one item, or on everything when `item_id` is None; returns the holds dropped"""
+    condition = StockReservation.cart_id == cart_id
+    if item_id is not None:
+        condition = condition & (StockReservation.item_id == item_id)
+    return db.run_write(lambda session: session.execute(delete(StockReservation).where(condition)).rowcount)
+
+
+def release_cart(session, cart_id):
+    """Drop all of a cart's holds inside the caller's write transaction"""
+    session.execute(delete(StockReservation).where(StockReservation.cart_id == cart_id))
+
+
+def sweep_expired(db, now=None):
+    """Delete every expired hold, through ix_stock_reservations_expires; returns how many"""
+    now = now or datetime.utcnow()
+    return db.run_write(lambda session: session.execute(
+        delete(StockReservation).where(StockReservation.expires_at <= now)
+    ).rowcount)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+    db = Database(sys.argv[2] if len(sys.argv) > 2 else None)
+    db.migrate()
+    if command == 'list':
+        session = db.get_session()
+        try:
+            rows = session.query(StockReservation, Item.name).join(Item, Item.id == StockReservation.item_id).filter(
+                StockReservation.expires_at > datetime.utcnow()
+            ).order_by(StockReservation.cart_id, StockReservation.item_id).all()
+            for reservation, name in rows:
+                print(f"cart={reservation.cart_id} item={reservation.item_id} ({name}) units={reservation.quantity} "
+                      f"expires={reservation.expires_at:%Y-%m-%d %H:%M:%S}")
+            print(f"{len(rows)} active hold(s).")
+        finally:
+            session.close()
+    elif command == 'sweep':
+        print(f"Deleted {sweep_expired(db)} expired hold(s).")
+    else:
+        sys.exit(f"Unknown command '{command}', expected 'list' or 'sweep'")
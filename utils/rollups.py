@@ -0,0 +1,227 @@
+# utils/rollups.py
+"""Daily sales rollups behind the sales charts and payment mode summaries.
+
+Three tables hold order count (lines for items), units, revenue and cost
+per day: by item, by customer and by payment mode. finalize_order adds each
+new order to them in its own transaction, so a chart over several years
+reads a few rows per day instead of every order line.
+
+Cost is taken at the item's cost price when the order is finalized. Days
+rebuilt from the order lines (the backfill, and the days refreshed when a
+product or customer is deleted) use the current cost price.
+
+    python -m utils.rollups verify [db_url]    # exit 1 if any day drifted
+    python -m utils.rollups rebuild [db_url]   # recompute from the order lines
+"""
+import sys
+from datetime import date, datetime, timedelta
+from sqlalchemy import and_, delete, distinct, func, insert, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from database import (Database, DailyCustomerSales, DailyItemSales, DailyPaymentModeSales, Item, Order, OrderItem,
+                      Transaction)
+
+MEASURES = ('count', 'quantity', 'revenue', 'cost')
+NO_BILL_MODE = "N/A"
+
+line_revenue = OrderItem.quantity * OrderItem.price
+line_cost = OrderItem.quantity * Item.cost_price
+
+
+def _upsert(session, model, keys, rows):
+    """Add `rows` to the matching rollup rows, creating the missing ones"""
+    dialect_insert = postgresql.insert if session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+    statement = dialect_insert(model)
+    statement = statement.on_conflict_do_update(
+        index_elements=keys,
+        set_={measure: getattr(model, measure) + statement.excluded[measure] for measure in MEASURES}
+    )
+    session.execute(statement, rows)
+
+
+# --- Posting ---
+def post_order(session, customer_id, ordered_at, payment_mode, lines):
+    """Add one finalized order to the rollups; the caller commits.
+
+    `lines` are (item_id, quantity, price) tuples. Reads the items' current
+    cost prices, then runs one upsert per rollup table.
+    """
+    day = ordered_at.date()
+    costs = dict(session.execute(
+        select(Item.id, Item.cost_price).where(Item.id.in_({item_id for item_id, _, _ in lines}))
+    ).all())
+
+    by_item = {}
+    for item_id, quantity, price in lines:
+        totals = by_item.setdefault(item_id, {'item_id': item_id, 'day': day, 'count': 0, 'quantity': 0,
+                                              'revenue': 0.0, 'cost': 0.0})
+        totals['count'] += 1
+        totals['quantity'] += quantity
+        totals['revenue'] += quantity * price
+        totals['cost'] += quantity * costs.get(item_id, 0.0)
+    _upsert(session, DailyItemSales, ['item_id', 'day'], list(by_item.values()))
+
+    order_totals = {
+        'day': day,
+        'count': 1,
+        'quantity': sum(row['quantity'] for row in by_item.values()),
+        'revenue': sum(row['revenue'] for row in by_item.values()),
+        'cost': sum(row['cost'] for row in by_item.values()),
+    }
+    _upsert(session, DailyCustomerSales, ['customer_id', 'day'], [dict(order_totals, customer_id=customer_id)])
+    _upsert(session, DailyPaymentModeSales, ['day', 'mode'], [dict(order_totals, mode=payment_mode or NO_BILL_MODE)])
+
+
+# --- Rebuilding ---
+def _sources():
+    """(model, INSERT ... SELECT columns, grouped select) recomputing each rollup from the order lines"""
+    day = func.date(Order.date)
+    lines = select().select_from(OrderItem).join(Order, Order.id == OrderItem.order_id).join(
+        Item, Item.id == OrderItem.item_id
+    )
+    totals = (func.sum(OrderItem.quantity), func.sum(line_revenue), func.sum(line_cost))
+    by_item = lines.add_columns(OrderItem.item_id, day, func.count(OrderItem.id), *totals).group_by(
+        OrderItem.item_id, day)
+    by_customer = lines.add_columns(Order.customer_id, day, func.count(distinct(Order.id)), *totals).group_by(
+        Order.customer_id, day)
+    mode = func.coalesce(Transaction.mode, NO_BILL_MODE)
+    by_mode = lines.outerjoin(Transaction, Transaction.order_id == Order.id).add_columns(
+        day, mode, func.count(distinct(Order.id)), *totals).group_by(day, mode)
+    return [
+        (DailyItemSales, ['item_id', 'day', *MEASURES], by_item),
+        (DailyCustomerSales, ['customer_id', 'day', *MEASURES], by_customer),
+        (DailyPaymentModeSales, ['day', 'mode', *MEASURES], by_mode),
+    ]
+
+
+def rebuild_rollups(conn, days=None):
+    """Recompute the rollups from the order lines, for every day or only `days`.
+
+    Works on a Connection or a Session; the caller commits.
+    """
+    if days is not None:
+        days = sorted(set(days))
+        if not days:
+            return
+        # Day by day date ranges, so the order lines are found through ix_orders_date
+        in_days = or_(*[and_(Order.date >= datetime.combine(d, datetime.min.time()),
+                             Order.date < datetime.combine(d + timedelta(days=1), datetime.min.time()))
+                        for d in days])
+    for model, columns, source in _sources():
+        if days is None:
+            conn.execute(delete(model))
+        else:
+            conn.execute(delete(model).where(model.day.in_(days)))
+            source = source.where(in_days)
+        conn.execute(insert(model).from_select(columns, source))
+
+
+def sales_days(session, item_id=None, customer_id=None):
+    """Days with sales of one item or to one customer, to refresh after deleting it"""
+    query = select(func.date(Order.date)).distinct().join(OrderItem, OrderItem.order_id == Order.id)
+    if item_id is not None:
+        query = query.where(OrderItem.item_id == item_id)
+    if customer_id is not None:
+        query = query.where(Order.customer_id == customer_id)
+    return [date.fromisoformat(d) if isinstance(d, str) else d for d in session.execute(query).scalars()]
+
+
+def verify_rollups(session):
+    """Return {table: days whose count, units or revenue differ from the order lines}.
+
+    Cost is not compared: rollups keep the cost price at the time of sale.
+    """
+    drift = {}
+    for model, columns, source in _sources():
+        day_at = columns.index('day')
+
+        def by_key(rows):
+            # Keys as strings: SQLite's date() gives text, the Date columns give dates
+            return {tuple(str(v) for v in row[:2]): row[2:5] for row in rows}
+
+        expected = by_key(session.execute(source))
+        actual = by_key(session.execute(select(*[getattr(model, c) for c in columns])))
+        days = {key[day_at] for key in set(expected) | set(actual)
+                if key not in expected or key not in actual
+                or any(abs(want - got) > 0.005 for want, got in zip(expected[key], actual[key]))}
+        if days:
+            drift[model.__tablename__] = sorted(days)
+    return drift
+
+
+# --- Reading ---
+def _rollup_for(customer_id=None, product_id=None, payment_mode=None):
+    """(rollup model, filter) answering a sales filter, or None when it combines several"""
+    chosen = [f for f in (customer_id, product_id, payment_mode) if f]
+    if len(chosen) > 1:
+        return None
+    if customer_id:
+        return DailyCustomerSales, DailyCustomerSales.customer_id == customer_id
+    if product_id:
+        return DailyItemSales, DailyItemSales.item_id == product_id
+    if payment_mode:
+        return DailyPaymentModeSales, DailyPaymentModeSales.mode == payment_mode
+    # Every order is in the payment mode rollup, and it has the fewest rows per day
+    return DailyPaymentModeSales, None
+
+
+def _in_range(session, model, condition, start_date, end_date, *columns):
+    query = session.query(*columns).filter(model.day >= start_date, model.day <= end_date)
+    return query.filter(condition) if condition is not None else query
+
+
+def daily_totals_query(session, start_date, end_date, **filters):
+    """(Date, Total_Revenue, Total_Profit) per day from a rollup, or None if no rollup answers the filters"""
+    rollup = _rollup_for(**filters)
+    if rollup is None:
+        return None
+    model, condition = rollup
+    return _in_range(
+        session, model, condition, start_date, end_date,
+        model.day.label("Date"),
+        func.sum(model.revenue).label("Total_Revenue"),
+        func.sum(model.revenue - model.cost).label("Total_Profit")
+    ).group_by(model.day).order_by(model.day)
+
+
+def totals_query(session, start_date, end_date, **filters):
+    """(revenue, profit) over the range from a rollup, or None if no rollup answers the filters"""
+    rollup = _rollup_for(**filters)
+    if rollup is None:
+        return None
+    model, condition = rollup
+    return _in_range(session, model, condition, start_date, end_date,
+                     func.coalesce(func.sum(model.revenue), 0.0),
+                     func.coalesce(func.sum(model.revenue - model.cost), 0.0))
+
+
+def payment_mode_query(session, start_date, end_date):
+    """Orders and revenue per payment mode over the range, for billed orders"""
+    model = DailyPaymentModeSales
+    return _in_range(
+        session, model, model.mode != NO_BILL_MODE, start_date, end_date,
+        model.mode.label("Payment Mode"),
+        func.sum(model.count).label("Count"),
+        func.sum(model.revenue).label("Total_Amount")
+    ).group_by(model.mode).order_by(model.mode)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'verify'
+    db = Database(sys.argv[2] if len(sys.argv) > 2 else None)
+    db.migrate()
+    session = db.get_session()
+    try:
+        if command == 'rebuild':
+            rebuild_rollups(session)
+            session.commit()
+            print("Daily sales rollups rebuilt from the order lines.")
+        elif command == 'verify':
+            drift = verify_rollups(session)
+            for table, days in drift.items():
+                print(f"{table}: {len(days)} day(s) differ, first {days[0]}, last {days[-1]}")
+            print("Daily sales rollups are consistent." if not drift else "Run 'rebuild' to repair.")
+            sys.exit(1 if drift else 0)
+        else:
+            sys.exit(f"Unknown command '{command}', expected 'verify' or 'rebuild'")
+    finally:
+        session.close()
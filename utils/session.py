@@ -1,12 +1,36 @@
 # utils/session.py
+import sys
 import streamlit as st
+import config
 from database import Database
+from utils.jobs import start_workers
+from utils.profiler import begin_rerun, install_profiler
+
+
+@st.cache_resource
+def get_database():
+    """One Database (engine and connection pool) per server process, migrated once"""
+    db = Database()
+    db.migrate()
+    if config.PROFILE_QUERIES:
+        install_profiler(db.engine)
+    return db
+
+
+@st.cache_resource
+def get_job_workers():
+    """The background job worker processes, started once per server process"""
+    return start_workers(config.DATABASE_URL, config.JOB_WORKERS)
+
 
 def initialize_session():
     if 'db' not in st.session_state:
-        st.session_state['db'] = Database('sqlite:///inventory.db')
-        st.session_state['db'].create_tables()
+        st.session_state['db'] = get_database()
+        get_job_workers()
     if 'logged_in' not in st.session_state:
         st.session_state.logged_in = False
     if 'current_user' not in st.session_state:
         st.session_state.current_user = None
+    if config.PROFILE_QUERIES:
+        # Named after the calling page script; the rerun ends in profile_panel()
+        begin_rerun(sys._getframe(1).f_globals.get('__file__', '?').rsplit('/', 1)[-1])